@@ -8,15 +8,67 @@ except ImportError:
     TREE_SITTER_AVAILABLE = False
     print("Warning: Tree-sitter not available. Using fallback parsing methods.")
 
+import os
 import pathlib
+import re
 import typing
 import datetime
 import json
+import array
+import bisect
 import collections
-from typing import Dict, List, Optional, Any, Union
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import mmap
+import multiprocessing
+import pickle
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import tokenize
+import zlib
+from typing import Dict, List, Optional, Any, Tuple, Union
+
+# Modules shared by the agents live in agents/shared
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+from agents.shared.git_objects import GitObjectReader
+from agents.shared.graph_analytics import analyze_dependency_graph
+from agents.shared.loader import call_agent_function
+
+# Version of the parse_file output format. It is part of every parse cache key,
+# so bump it whenever extraction logic or the element/relationship shape changes.
+ANALYZER_VERSION = "1.5.0"
+
+## Source file discovery
+# File extension -> analyzer language (mirrors tree_sitter_parsers in config/config.json)
+LANGUAGE_EXTENSIONS: Dict[str, str] = {
+    ".py": "python", ".pyw": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript",
+    ".java": "java",
+    ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".hxx": "cpp", ".c++": "cpp",
+    ".c": "c", ".h": "c"
+}
+
+# Directories never descended into during analysis
+IGNORED_DIRECTORIES = {".git", ".svn", ".hg", "__pycache__", "node_modules"}
+
+# Files that become modules in the module hierarchy, and directories it skips
+MODULE_FILE_SUFFIXES = (".py", ".js", ".ts", ".java", ".cpp", ".c")
+MODULE_SKIPPED_DIRECTORIES = frozenset({".git", "__pycache__", "node_modules"})
 
 ## Data Classes for Code Analysis
 class CodeElement:
+    __slots__ = ("element_id", "element_type", "name", "file_path", "start_line", "end_line", "language",
+                 "signature", "documentation", "complexity_score", "dependencies", "parameters", "return_type",
+                 "decorators", "visibility", "is_async", "is_deprecated", "source_code")
+    
     def __init__(self):
         self.element_id: str = ""
         self.element_type: str = ""  # 'function', 'class', 'method', 'module', 'variable'
@@ -38,6 +90,9 @@ class CodeElement:
         self.source_code: str = ""
 
 class CodeRelationship:
+    __slots__ = ("relationship_type", "source_element", "target_element", "line_number", "context",
+                 "confidence", "is_direct")
+    
     def __init__(self):
         self.relationship_type: str = ""  # 'calls', 'inherits', 'imports', 'contains', 'uses'
         self.source_element: str = ""     # ID of source element
@@ -58,7 +113,7 @@ class FileAnalysis:
         self.complexity_score: float = 0.0
         self.lines_of_code: int = 0
         self.parsed_at: datetime.datetime = datetime.datetime.now()
-        self.tree_sitter_tree: str = ""   # Serialized parse tree
+        self.tree_sitter_tree: str = ""   # Serialized parse tree (only with keep_parse_tree)
 
 class Module:
     def __init__(self):
@@ -85,6 +140,1089 @@ class RepositoryAnalysis:
         self.documentation_coverage: float = 0.0
         self.test_coverage: float = 0.0
 
+## Single-pass Tree-sitter Visitor Tables
+# Element node types per language: node type -> (extractor method, complexity weights
+# language or None for a fixed 1.0, collects call dependencies, opens a scope)
+ELEMENT_HANDLERS: Dict[str, Dict[str, Tuple[str, Optional[str], bool, bool]]] = {
+    "python": {
+        "function_definition": ("extract_python_function", "python", True, True),
+        "class_definition": ("extract_python_class", "python", False, True),
+        "assignment": ("extract_python_variable", None, False, False)
+    },
+    "javascript": {
+        "function_declaration": ("extract_js_function", "javascript", True, True),
+        "class_declaration": ("extract_js_class", None, False, True),
+        "variable_declaration": ("extract_js_variable", None, False, False)
+    }
+}
+
+# Relationship node types per language: node type -> (relationship type, name
+# extractor method, confidence, source: 'scope', 'scope_required' or 'file')
+RELATIONSHIP_HANDLERS: Dict[str, Dict[str, Tuple[str, str, float, str]]] = {
+    "python": {
+        "call": ("calls", "extract_call_name", 0.8, "scope"),
+        "import_from_statement": ("imports", "extract_import_module", 0.9, "file"),
+        "attribute": ("uses", "extract_attribute_name", 0.7, "scope_required")
+    },
+    "javascript": {
+        "call_expression": ("calls", "extract_js_call_name", 0.8, "scope"),
+        "import_statement": ("imports", "extract_js_import_module", 0.9, "file")
+    }
+}
+
+# Complexity contribution of each construct, per language
+COMPLEXITY_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "python": {
+        "if_statement": 1.0, "for_statement": 1.0, "while_statement": 1.0, "try_statement": 1.0,
+        "elif_clause": 0.5, "except_clause": 1.0, "and_expression": 1.0, "or_expression": 1.0
+    },
+    "javascript": {
+        "if_statement": 1.0, "for_statement": 1.0, "while_statement": 1.0, "switch_statement": 1.0,
+        "case_clause": 0.5, "binary_expression": 1.0, "logical_expression": 1.0
+    }
+}
+COMPLEXITY_NODE_TYPES = frozenset(node_type for weights in COMPLEXITY_WEIGHTS.values() for node_type in weights)
+
+# Node types averaged into the file complexity score: True adds the (Python-weighted)
+# complexity of the node, False only counts towards the average
+SCORED_NODE_TYPES: Dict[str, bool] = {
+    "function_definition": True,
+    "class_definition": True,
+    "method_definition": False
+}
+
+def iter_subtree(node: Any):
+    """Yield a node and all of its descendants in pre-order, without recursion"""
+    cursor = node.walk()
+    depth = 0
+    while True:
+        yield cursor.node
+        if cursor.goto_first_child():
+            depth += 1
+            continue
+        while depth > 0 and not cursor.goto_next_sibling():
+            cursor.goto_parent()
+            depth -= 1
+        if depth == 0:
+            return
+
+def weighted_complexity(construct_counts: Dict[str, int], language: str) -> float:
+    """Complexity of a scope from its construct counts (base complexity 1.0)"""
+    weights = COMPLEXITY_WEIGHTS[language]
+    return 1.0 + sum(weights.get(node_type, 0.0) * count for node_type, count in construct_counts.items())
+
+class _VisitFrame:
+    """Open element or scored node during a visit_tree pass"""
+    __slots__ = ("depth", "construct_counts", "calls", "element", "weights_language", "collects_calls", "scored", "scope")
+    
+    def __init__(self, depth: int, element: Optional[Dict[str, Any]], weights_language: Optional[str],
+                 collects_calls: bool, scored: Optional[bool], scope: Optional[str]):
+        self.depth = depth
+        self.construct_counts: Dict[str, int] = {}
+        self.calls: set = set()
+        self.element = element
+        self.weights_language = weights_language
+        self.collects_calls = collects_calls
+        self.scored = scored
+        self.scope = scope
+
+## Regex Fallback Patterns
+# One combined alternation per language, so the fallback parser scans each file once.
+# Named groups: the outer group names the construct, inner groups carry its parts.
+REGEX_FALLBACK_PATTERNS: Dict[str, "re.Pattern[str]"] = {
+    "python": re.compile(
+        r'(?P<function>def\s+(?P<function_name>\w+)\s*\([^)]*\):)'
+        r'|(?P<class>class\s+(?P<class_name>\w+)\s*(\([^)]*\))?:)'
+        r'|(?P<import>(?:from\s+(?P<import_from>\S+)\s+)?import\s+(?P<import_names>[^\n#]+))'
+    ),
+    "javascript": re.compile(
+        r'(?P<function>function\s+(?P<function_name>\w+)\s*\([^)]*\)\s*{)'
+        r'|(?P<class>class\s+(?P<class_name>\w+)\s*{)'
+        r"|(?P<import>import\s+(?:{[^}]+}|[\w*\s,]+)\s+from\s+['\"](?P<import_from>[^'\"]+)['\"])"
+    )
+}
+
+# Element constructs per language: construct -> (id prefix, element type, signature suffix, return type).
+# Elements are emitted grouped by construct in this order.
+REGEX_ELEMENT_KINDS: Dict[str, Dict[str, Tuple[str, str, str, str]]] = {
+    "python": {
+        "function": ("func", "function", ":", "Any"),
+        "class": ("class", "class", ":", "class")
+    },
+    "javascript": {
+        "function": ("func", "function", "{", "any"),
+        "class": ("class", "class", "{", "class")
+    }
+}
+
+NEWLINE_PATTERN = re.compile(r'\n')
+
+def newline_offsets(source_code: str) -> List[int]:
+    """Offsets of every newline in a file, for line lookups by binary search"""
+    return [match.start() for match in NEWLINE_PATTERN.finditer(source_code)]
+
+def line_at(offsets: List[int], position: int) -> int:
+    """1-based line number of a character position"""
+    return bisect.bisect_left(offsets, position) + 1
+
+## Fallback Complexity Scanning
+# Decision points counted for cyclomatic complexity (1 + decisions per scope)
+PYTHON_DECISION_KEYWORDS = frozenset({"if", "elif", "for", "while", "except", "and", "or"})
+PYTHON_DECISION_PATTERN = re.compile(r'\b(?:if|elif|for|while|except|and|or)\b')  # for untokenizable files
+C_FAMILY_DECISION_KEYWORDS = frozenset({"if", "for", "while", "case", "catch"})
+C_FAMILY_CONTROL_KEYWORDS = frozenset({"if", "for", "while", "switch", "catch", "with", "return"})
+# Words allowed between a parameter list and the function body: "f() const {", "f() throws E {"
+C_FAMILY_SIGNATURE_SUFFIXES = frozenset({"throws", "const", "override", "noexcept", "final"})
+
+# Comments and string literals are matched (and skipped) so keywords inside them never count
+C_FAMILY_TOKEN_PATTERN = re.compile(
+    r'(?P<comment>//[^\n]*|/\*.*?\*/)'
+    r'|(?P<string>"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)'
+    r'|(?P<name>[A-Za-z_$][\w$]*)'
+    r'|(?P<operator>=>|&&|\|\||[{}()=;,])'
+    r'|(?P<newline>\n)',
+    re.DOTALL
+)
+
+class _ComplexityScope:
+    """Function or class whose decision points are being counted"""
+    __slots__ = ("name", "kind", "start_line", "end_line", "decisions", "depth")
+    
+    def __init__(self, name: str, kind: str, start_line: int, depth: int):
+        self.name = name
+        self.kind = kind
+        self.start_line = start_line
+        self.end_line = start_line
+        self.decisions = 0
+        self.depth = depth
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "type": self.kind,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+            "complexity": 1.0 + self.decisions
+        }
+
+def python_complexity_profile(source_code: str) -> Dict[str, Any]:
+    """Cyclomatic complexity of a Python file and of each def/class, from one tokenize pass
+    
+    A scope's decisions include those of scopes nested in it, as in visit_tree.
+    Raises tokenize.TokenError / SyntaxError for source that cannot be tokenized.
+    """
+    decisions = 0
+    scopes: List[_ComplexityScope] = []
+    open_scopes: List[_ComplexityScope] = []
+    pending: Optional[_ComplexityScope] = None  # def/class whose header line has not ended
+    header_ended: Optional[_ComplexityScope] = None  # header ended; INDENT opens a block body
+    indent_depth = 0
+    previous_name = ""
+    last_line = 0
+    
+    for token in tokenize.generate_tokens(io.StringIO(source_code).readline):
+        token_type, value = token.type, token.string
+        
+        if header_ended is not None and token_type not in (tokenize.NL, tokenize.COMMENT):
+            if token_type != tokenize.INDENT:
+                # One-line body: "def f(): return 1"
+                header_ended.end_line = last_line
+                open_scopes.remove(header_ended)
+            header_ended = None
+        
+        if token_type == tokenize.NAME:
+            if value in PYTHON_DECISION_KEYWORDS:
+                decisions += 1
+                for scope in open_scopes:
+                    scope.decisions += 1
+            elif previous_name in ("def", "class") and pending is None:
+                kind = "function" if previous_name == "def" else "class"
+                pending = _ComplexityScope(value, kind, token.start[0], indent_depth)
+                scopes.append(pending)
+                open_scopes.append(pending)
+            previous_name = value
+            continue
+        
+        if token_type == tokenize.NEWLINE:
+            last_line = token.end[0]
+            if pending is not None:
+                header_ended = pending
+                pending = None
+        elif token_type == tokenize.INDENT:
+            indent_depth += 1
+        elif token_type == tokenize.DEDENT:
+            indent_depth -= 1
+            while open_scopes and open_scopes[-1].depth >= indent_depth and open_scopes[-1] is not pending:
+                open_scopes.pop().end_line = last_line
+        previous_name = ""
+    
+    for scope in open_scopes:
+        scope.end_line = last_line
+    
+    return {
+        "complexity": 1.0 + decisions,
+        "scopes": [scope.to_dict() for scope in scopes]
+    }
+
+def c_family_complexity_profile(source_code: str) -> Dict[str, Any]:
+    """Cyclomatic complexity of a C-family file (JS/TS/Java/C/C++) and of each function/class
+    
+    Functions are recognised as "name(...) {" where name is not a control keyword,
+    "function (...) {" and "(...) => {" (named after the variable they are assigned
+    to, if any); classes as "class Name ... {". Spans follow brace nesting, and a
+    scope's decisions include those of scopes nested in it, as in visit_tree.
+    """
+    decisions = 0
+    scopes: List[_ComplexityScope] = []
+    open_scopes: List[_ComplexityScope] = []
+    brace_stack: List[Optional[_ComplexityScope]] = []
+    paren_names: List[Tuple[str, int]] = []
+    line = 1
+    previous = ""          # previous significant token
+    previous_name = ""     # most recent identifier
+    call_name = ""         # identifier before the last closed "(...)"
+    call_line = 0
+    assign_name = ""       # target of the current "name = ..." statement
+    in_signature_suffix = False
+    pending_class: Optional[Tuple[str, int]] = None
+    
+    for match in C_FAMILY_TOKEN_PATTERN.finditer(source_code):
+        kind = match.lastgroup
+        value = match.group()
+        
+        if kind == "newline":
+            line += 1
+            continue
+        if kind in ("comment", "string"):
+            line += value.count("\n")
+            if kind == "string":
+                previous = kind
+            continue
+        
+        if in_signature_suffix and (kind == "name" or value == ","):
+            continue
+        
+        if kind == "name":
+            if value in C_FAMILY_DECISION_KEYWORDS:
+                decisions += 1
+                for scope in open_scopes:
+                    scope.decisions += 1
+            elif previous == "class":
+                pending_class = (value, line)
+            elif previous == ")" and value in C_FAMILY_SIGNATURE_SUFFIXES:
+                in_signature_suffix = True
+                continue
+            previous_name = value
+        elif value in ("&&", "||"):
+            decisions += 1
+            for scope in open_scopes:
+                scope.decisions += 1
+        elif value == "=":
+            assign_name = previous_name if previous == previous_name else ""
+        elif value == "(":
+            paren_names.append((previous_name, line) if previous == previous_name else ("", line))
+        elif value == ")":
+            call_name, call_line = paren_names.pop() if paren_names else ("", line)
+        elif value == "{":
+            scope = None
+            if pending_class is not None:
+                scope = _ComplexityScope(pending_class[0], "class", pending_class[1], len(brace_stack))
+                pending_class = None
+            elif previous == "=>" or (previous == ")" and call_name == "function"):
+                scope = _ComplexityScope(assign_name or "anonymous", "function", line, len(brace_stack))
+            elif previous == ")" and call_name and call_name not in C_FAMILY_CONTROL_KEYWORDS:
+                scope = _ComplexityScope(call_name, "function", call_line, len(brace_stack))
+            if scope is not None:
+                scopes.append(scope)
+                open_scopes.append(scope)
+            brace_stack.append(scope)
+            assign_name = ""
+        elif value == "}" and brace_stack:
+            scope = brace_stack.pop()
+            if scope is not None:
+                scope.end_line = line
+                open_scopes.remove(scope)
+        elif value == ";":
+            assign_name = ""
+        
+        in_signature_suffix = False
+        previous = value
+    
+    for scope in open_scopes:
+        scope.end_line = line
+    
+    return {
+        "complexity": 1.0 + decisions,
+        "scopes": [scope.to_dict() for scope in scopes]
+    }
+
+## Tree-sitter Grammar Registry
+# Grammar per analyzer language, as (library path, language name) for tree_sitter.Language
+TREE_SITTER_GRAMMARS: Dict[str, Tuple[str, str]] = {
+    "python": ("tree-sitter-python", "python"),
+    "javascript": ("tree-sitter-javascript", "javascript"),
+    "typescript": ("tree-sitter-typescript", "typescript"),
+    "java": ("tree-sitter-java", "java"),
+    "cpp": ("tree-sitter-cpp", "cpp"),
+    "c": ("tree-sitter-c", "c")
+}
+
+class GrammarRegistry:
+    """Process-wide Tree-sitter grammars, loaded on first use, with one Parser per thread
+    
+    Language objects are immutable and shared by every agent in the process;
+    Parser objects are not thread-safe, so each thread gets its own.
+    """
+    
+    def __init__(self):
+        self._languages: Dict[str, Any] = {}
+        self._failures: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def supported_languages(self) -> List[str]:
+        """Languages that have a grammar configured (loaded or not)"""
+        return list(TREE_SITTER_GRAMMARS) if TREE_SITTER_AVAILABLE else []
+    
+    def loaded_languages(self) -> List[str]:
+        return list(self._languages)
+    
+    def failed_languages(self) -> Dict[str, str]:
+        return dict(self._failures)
+    
+    def get_language(self, language: str) -> Optional[Any]:
+        """Load a grammar the first time it is requested; None if unavailable"""
+        grammar = self._languages.get(language)
+        if grammar is not None or not TREE_SITTER_AVAILABLE:
+            return grammar
+        
+        with self._lock:
+            if language in self._languages:
+                return self._languages[language]
+            if language in self._failures or language not in TREE_SITTER_GRAMMARS:
+                return None
+            try:
+                grammar = tree_sitter.Language(*TREE_SITTER_GRAMMARS[language])
+            except Exception as e:
+                # Remember the failure so the load is not retried for every file
+                self._failures[language] = str(e)
+                print(f"Failed to initialize {language} parser: {e}")
+                return None
+            self._languages[language] = grammar
+            return grammar
+    
+    def backend(self, language: str) -> str:
+        """Which parser parse_source will use for a language: "tree-sitter" or "regex"
+        
+        Part of the parse cache key, so fallback results are never served to a
+        process that has the grammar (or the other way round).
+        """
+        return "tree-sitter" if self.get_language(language) is not None else "regex"
+    
+    def get_parser(self, language: str) -> Optional[Any]:
+        """This thread's parser for a language; None if the grammar is unavailable"""
+        parsers = getattr(self._local, "parsers", None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        
+        parser = parsers.get(language)
+        if parser is None:
+            grammar = self.get_language(language)
+            if grammar is None:
+                return None
+            parser = parsers[language] = tree_sitter.Parser(grammar)
+        return parser
+
+GRAMMAR_REGISTRY = GrammarRegistry()
+
+## Columnar Entity Store
+class StringPool:
+    """Intern table mapping repeated strings (types, names, paths) to integer ids"""
+    __slots__ = ("strings", "_ids")
+    
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+    
+    def intern(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._ids[value] = string_id
+            self.strings.append(value)
+        return string_id
+    
+    def lookup(self, value: str) -> int:
+        """Id of an already-interned string, or -1"""
+        return self._ids.get(value, -1)
+    
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+    
+    def __len__(self) -> int:
+        return len(self.strings)
+
+class _ColumnarTable:
+    """Append-only table of records stored column by column in typed arrays
+    
+    String fields hold StringPool ids (-1 for None), list fields are flattened
+    into one id array plus row offsets, and span fields are stored as
+    (file id, byte_start, byte_end) columns with byte_start -1 for no span.
+    Keys outside the schema are kept per row in extras so row() reproduces the
+    original record. Subclasses declare the schema in FIELDS.
+    """
+    # (field name, kind, default) in output order; kind is one of
+    # 'str', 'int', 'float', 'bool', 'list', 'span'
+    FIELDS: Tuple[Tuple[str, str, Any], ...] = ()
+    ARRAY_TYPECODES = {"str": "i", "int": "q", "float": "d", "bool": "B"}
+    
+    def __init__(self, pool: Optional[StringPool] = None):
+        self.pool = pool or StringPool()
+        self.columns: Dict[str, array.array] = {}
+        self.list_offsets: Dict[str, array.array] = {}
+        self.span_columns: Dict[str, Tuple[array.array, array.array, array.array]] = {}
+        for name, kind, _ in self.FIELDS:
+            if kind == "list":
+                self.columns[name] = array.array("i")
+                self.list_offsets[name] = array.array("q", [0])
+            elif kind == "span":
+                self.span_columns[name] = (array.array("i"), array.array("q"), array.array("q"))
+            else:
+                self.columns[name] = array.array(self.ARRAY_TYPECODES[kind])
+        self.extras: Dict[int, Dict[str, Any]] = {}
+        self._kinds = {name: kind for name, kind, _ in self.FIELDS}
+        self._rows = 0
+    
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], pool: Optional[StringPool] = None) -> "_ColumnarTable":
+        table = cls(pool)
+        for record in records:
+            table.append(record)
+        return table
+    
+    def __len__(self) -> int:
+        return self._rows
+    
+    def _intern(self, value: Optional[str]) -> int:
+        return -1 if value is None else self.pool.intern(value)
+    
+    def _string(self, string_id: int) -> Optional[str]:
+        return None if string_id < 0 else self.pool.strings[string_id]
+    
+    def append(self, record: Dict[str, Any]) -> int:
+        """Add a record dict and return its row index"""
+        row = self._rows
+        for name, kind, default in self.FIELDS:
+            value = record.get(name, default)
+            if kind == "str":
+                self.columns[name].append(self._intern(value))
+            elif kind == "list":
+                values = self.columns[name]
+                values.extend(self.pool.intern(item) for item in value)
+                self.list_offsets[name].append(len(values))
+            elif kind == "span":
+                file_ids, starts, ends = self.span_columns[name]
+                if value:
+                    file_ids.append(self.pool.intern(value[0]))
+                    starts.append(value[1])
+                    ends.append(value[2])
+                else:
+                    file_ids.append(-1)
+                    starts.append(-1)
+                    ends.append(-1)
+            else:
+                self.columns[name].append(value)
+        
+        extra = {key: value for key, value in record.items() if key not in self._kinds}
+        if extra:
+            self.extras[row] = extra
+        self._rows += 1
+        return row
+    
+    def extend(self, other: "_ColumnarTable"):
+        """Append every row of another table of the same type, remapping its string ids"""
+        remap = [self.pool.intern(value) for value in other.pool.strings]
+        
+        def mapped(ids):
+            return (remap[i] if i >= 0 else -1 for i in ids)
+        
+        for name, kind, _ in self.FIELDS:
+            if kind == "str":
+                self.columns[name].extend(mapped(other.columns[name]))
+            elif kind == "list":
+                base = len(self.columns[name])
+                self.columns[name].extend(mapped(other.columns[name]))
+                self.list_offsets[name].extend(base + offset for offset in other.list_offsets[name][1:])
+            elif kind == "span":
+                file_ids, starts, ends = self.span_columns[name]
+                other_file_ids, other_starts, other_ends = other.span_columns[name]
+                file_ids.extend(mapped(other_file_ids))
+                starts.extend(other_starts)
+                ends.extend(other_ends)
+            else:
+                self.columns[name].extend(other.columns[name])
+        
+        for row, extra in other.extras.items():
+            self.extras[self._rows + row] = dict(extra)
+        self._rows += len(other)
+    
+    def value(self, row: int, name: str) -> Any:
+        """Decode one field of one row"""
+        kind = self._kinds[name]
+        if kind == "str":
+            return self._string(self.columns[name][row])
+        if kind == "list":
+            offsets = self.list_offsets[name]
+            return [self.pool.strings[i] for i in self.columns[name][offsets[row]:offsets[row + 1]]]
+        if kind == "span":
+            file_ids, starts, ends = self.span_columns[name]
+            return (self.pool.strings[file_ids[row]], starts[row], ends[row]) if starts[row] >= 0 else None
+        if kind == "bool":
+            return bool(self.columns[name][row])
+        return self.columns[name][row]
+    
+    def values(self, name: str) -> typing.Iterator[Any]:
+        """Iterate over one decoded column"""
+        for row in range(self._rows):
+            yield self.value(row, name)
+    
+    def row(self, row: int) -> Dict[str, Any]:
+        """Rebuild the record dict for a row (span fields are omitted when unset)"""
+        record = {}
+        for name, kind, _ in self.FIELDS:
+            value = self.value(row, name)
+            if kind == "span" and value is None:
+                continue
+            record[name] = value
+        extra = self.extras.get(row)
+        if extra:
+            record.update(extra)
+        return record
+    
+    def __iter__(self) -> typing.Iterator[Dict[str, Any]]:
+        for row in range(self._rows):
+            yield self.row(row)
+    
+    def to_dicts(self, source_reader: Optional["SourceSpanReader"] = None) -> List[Dict[str, Any]]:
+        """Materialise every row in the dict shape used by the API
+        
+        With a source_reader, lazy source spans are resolved into source_code / context.
+        """
+        if source_reader is None:
+            return list(self)
+        return [source_reader.materialize(record) for record in self]
+    
+    def to_columns(self) -> Dict[str, Any]:
+        """JSON-serialisable column form (used for the parse cache and worker results)"""
+        return {
+            "rows": self._rows,
+            "strings": self.pool.strings,
+            "columns": {name: values.tolist() for name, values in self.columns.items()},
+            "list_offsets": {name: offsets.tolist() for name, offsets in self.list_offsets.items()},
+            "span_columns": {name: [column.tolist() for column in columns] for name, columns in self.span_columns.items()},
+            "extras": [[row, extra] for row, extra in self.extras.items()]
+        }
+    
+    @classmethod
+    def from_columns(cls, data: Dict[str, Any]) -> "_ColumnarTable":
+        table = cls()
+        for value in data["strings"]:
+            table.pool.intern(value)
+        for name, values in data["columns"].items():
+            table.columns[name].extend(values)
+        for name, offsets in data["list_offsets"].items():
+            table.list_offsets[name] = array.array("q", offsets)
+        for name, columns in data["span_columns"].items():
+            for column, values in zip(table.span_columns[name], columns):
+                column.extend(values)
+        table.extras = {row: extra for row, extra in data["extras"]}
+        table._rows = data["rows"]
+        return table
+
+class ElementTable(_ColumnarTable):
+    """Columnar store of code element records (see extract_python_function for the shape)"""
+    FIELDS = (
+        ("id", "str", ""), ("type", "str", ""), ("name", "str", ""),
+        ("start_line", "int", 0), ("end_line", "int", 0),
+        ("signature", "str", ""), ("documentation", "str", ""),
+        ("complexity", "float", 0.0), ("dependencies", "list", ()), ("parameters", "list", ()),
+        ("return_type", "str", ""), ("decorators", "list", ()), ("visibility", "str", "public"),
+        ("is_async", "bool", False), ("is_deprecated", "bool", False),
+        ("source_code", "str", ""), ("source_span", "span", None),
+        ("file_path", "str", ""), ("language", "str", "")
+    )
+
+class RelationshipTable(_ColumnarTable):
+    """Columnar store of relationship records (calls, imports, uses, ...)"""
+    FIELDS = (
+        ("type", "str", ""), ("source", "str", None), ("target", "str", ""),
+        ("line", "int", 0), ("context", "str", ""), ("context_span", "span", None),
+        ("confidence", "float", 0.0), ("is_direct", "bool", True)
+    )
+
+## Incremental Parse Cache
+class ParseResultCache:
+    """Size-bounded, on-disk LRU cache of compact parse_file results
+    
+    Entries are keyed by (content hash, language, analyzer version, source mode,
+    parser backend, relative path)
+    and stored zlib-compressed in a SQLite database, so re-analysing a repository
+    at a new commit only re-parses files whose content changed.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = 536870912):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched: List[str] = []
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cache_dir, "parse_cache.sqlite3"), timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_last_access ON parse_cache(last_access)")
+        self.connection.commit()
+    
+    @staticmethod
+    def make_key(file_path: str, relative_path: str, language: str, variant: str = "", content_id: Optional[str] = None) -> str:
+        """Build the cache key for a file from its current content
+        
+        variant distinguishes analyzer settings that change the output (source_mode
+        and the parser backend, see GrammarRegistry.backend).
+        content_id, when given, already identifies the content (a git blob id)
+        and the file is not read.
+        """
+        if content_id is None:
+            content_hash = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1048576), b""):
+                    content_hash.update(chunk)
+            content_id = content_hash.hexdigest()
+        
+        # The relative path is part of the key because element IDs embed it
+        return hashlib.sha256(
+            f"{content_id}:{language}:{ANALYZER_VERSION}:{variant}:{relative_path}".encode()
+        ).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached parse result, or None on a miss"""
+        row = self.connection.execute("SELECT value FROM parse_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._touched.append(key)
+        return json.loads(zlib.decompress(row[0]))
+    
+    def put_many(self, entries: List[Tuple[str, Dict[str, Any]]]):
+        """Store parse results, then refresh LRU timestamps and evict if over budget"""
+        now = time.time()
+        rows = []
+        for key, result in entries:
+            value = zlib.compress(json.dumps(result).encode())
+            rows.append((key, value, len(value), now))
+        
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO parse_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)", rows
+        )
+        self.connection.executemany(
+            "UPDATE parse_cache SET last_access = ? WHERE key = ?", [(now, key) for key in self._touched]
+        )
+        self._touched = []
+        self.connection.commit()
+        self.evict()
+    
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        
+        # Evict down to 90% of the budget so every run does not evict again
+        target = total_size - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in self.connection.execute("SELECT key, size FROM parse_cache ORDER BY last_access"):
+            if freed >= target:
+                break
+            victims.append((key,))
+            freed += size
+        
+        self.connection.executemany("DELETE FROM parse_cache WHERE key = ?", victims)
+        self.connection.commit()
+        self.evictions += len(victims)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus current cache occupancy"""
+        entries, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parse_cache"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes
+        }
+    
+    def close(self):
+        self.connection.close()
+
+## Code Context Graph Index
+class CodeContextGraphIndex:
+    """Persisted CCG for one repository, backing query_code_relationships
+    
+    Nodes are code elements plus one 'file' node per source file; edges are the
+    parsed relationships plus 'inherits' edges from class bases. Edges are indexed
+    by (type, source) and (type, target) for forward and reverse adjacency, and
+    nodes by name. Targets are stored by name and resolved to a node when the
+    name is unambiguous (same file first, then repository-wide).
+    """
+    
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        self.connection = sqlite3.connect(index_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "node_id INTEGER PRIMARY KEY, element_id TEXT UNIQUE NOT NULL, name TEXT NOT NULL, type TEXT NOT NULL, "
+            "file_path TEXT NOT NULL, start_line INTEGER, end_line INTEGER, complexity REAL);"
+            "CREATE TABLE IF NOT EXISTS edges ("
+            "type TEXT NOT NULL, source_id INTEGER NOT NULL, target_id INTEGER, target_name TEXT NOT NULL, "
+            "target_key TEXT NOT NULL, line INTEGER, confidence REAL);"
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_nodes_name ON nodes(name);"
+            "CREATE INDEX IF NOT EXISTS idx_edges_forward ON edges(type, source_id);"
+            "CREATE INDEX IF NOT EXISTS idx_edges_reverse ON edges(type, target_id);"
+            "CREATE INDEX IF NOT EXISTS idx_edges_target_key ON edges(target_key);"
+        )
+        self.connection.commit()
+    
+    @staticmethod
+    def _git_output(repository_path: str, *args: str) -> str:
+        # The ceiling stops git from picking up an enclosing repository of a plain directory
+        environment = dict(os.environ, GIT_CEILING_DIRECTORIES=os.path.dirname(os.path.abspath(repository_path)))
+        try:
+            result = subprocess.run(["git", "-C", repository_path, *args], capture_output=True, text=True, timeout=30, env=environment)
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+        return result.stdout.strip() if result.returncode == 0 else ""
+    
+    @staticmethod
+    def repository_key(repository: str, commit: Optional[str] = None) -> Tuple[str, str]:
+        """(normalized remote URL, commit) an index is stored under
+        
+        repository is a remote URL or a local path. For a local clone, worktree or
+        mirror the origin URL and HEAD commit are read from git, so every checkout
+        of the same commit shares one index; other directories fall back to their
+        absolute path.
+        """
+        remote = repository
+        if os.path.exists(repository):
+            remote = CodeContextGraphIndex._git_output(repository, "config", "--get", "remote.origin.url") or os.path.abspath(repository)
+            commit = commit or CodeContextGraphIndex._git_output(repository, "rev-parse", "--verify", "HEAD^{commit}")
+        remote = remote.strip().rstrip("/")
+        if remote.endswith(".git"):
+            remote = remote[:-4]
+        return remote.lower(), commit or ""
+    
+    @staticmethod
+    def index_path_for(cache_dir: str, repository: str, commit: Optional[str] = None) -> str:
+        """Location of the index for a repository (remote URL or local path) at a commit"""
+        remote, commit = CodeContextGraphIndex.repository_key(repository, commit)
+        repository_id = hashlib.sha1(remote.encode()).hexdigest()
+        return os.path.join(cache_dir, "ccg", repository_id, f"{commit or 'worktree'}.sqlite3")
+    
+    @staticmethod
+    def find_index(cache_dir: str, repository: str, commit: Optional[str] = None) -> Optional[str]:
+        """Existing index for a repository at a commit; without a known commit, the most recently built one"""
+        remote, commit = CodeContextGraphIndex.repository_key(repository, commit)
+        directory = os.path.join(cache_dir, "ccg", hashlib.sha1(remote.encode()).hexdigest())
+        if commit:
+            index_path = os.path.join(directory, f"{commit}.sqlite3")
+            return index_path if os.path.exists(index_path) else None
+        try:
+            candidates = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".sqlite3")]
+        except OSError:
+            return None
+        return max(candidates, key=os.path.getmtime, default=None)
+    
+    @staticmethod
+    def evict(cache_dir: str, max_bytes: int, keep: Optional[str] = None) -> int:
+        """Drop least recently used indexes until all of them fit in max_bytes; returns how many"""
+        indexes = []
+        for root, _, filenames in os.walk(os.path.join(cache_dir, "ccg")):
+            for filename in filenames:
+                if not filename.endswith(".sqlite3"):
+                    continue
+                index_path = os.path.join(root, filename)
+                size = 0
+                for suffix in ("", "-wal", "-shm"):
+                    with contextlib.suppress(OSError):
+                        size += os.path.getsize(index_path + suffix)
+                with contextlib.suppress(OSError):
+                    indexes.append((os.path.getmtime(index_path), index_path, size))
+        
+        total_size = sum(size for _, _, size in indexes)
+        if total_size <= max_bytes:
+            return 0
+        
+        # Evict down to 90% of the budget, as ParseResultCache does
+        target = total_size - int(max_bytes * 0.9)
+        freed = 0
+        evicted = 0
+        for _, index_path, size in sorted(indexes):
+            if freed >= target:
+                break
+            if index_path == keep:
+                continue
+            for suffix in ("", "-wal", "-shm"):
+                with contextlib.suppress(OSError):
+                    os.remove(index_path + suffix)
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.dirname(index_path))  # Only succeeds once the repository has no indexes left
+            freed += size
+            evicted += 1
+        return evicted
+    
+    @staticmethod
+    def _name_key(name: str) -> str:
+        # 'self.save' / 'db.session.add' resolve on their last component
+        return name.rsplit(".", 1)[-1]
+    
+    def build(self, elements: ElementTable, relationships: RelationshipTable, repository_path: str = "", repository_url: str = "", commit: str = ""):
+        """Replace the index contents with the given repository tables"""
+        nodes = []
+        node_ids: Dict[str, int] = {}
+        nodes_by_name: Dict[str, List[Tuple[int, str]]] = collections.defaultdict(list)
+        
+        def add_node(element_id, name, node_type, file_path, start_line=0, end_line=0, complexity=0.0):
+            node_id = len(nodes) + 1
+            node_ids[element_id] = node_id
+            nodes.append((node_id, element_id, name, node_type, file_path, start_line, end_line, complexity))
+            return node_id
+        
+        for row in range(len(elements)):
+            element_id = elements.value(row, "id")
+            if element_id in node_ids:
+                continue
+            name = elements.value(row, "name")
+            file_path = elements.value(row, "file_path")
+            node_id = add_node(
+                element_id, name, elements.value(row, "type"), file_path,
+                elements.value(row, "start_line"), elements.value(row, "end_line"), elements.value(row, "complexity")
+            )
+            nodes_by_name[name].append((node_id, file_path))
+        for file_path in set(elements.values("file_path")):
+            if file_path not in node_ids:
+                add_node(file_path, file_path, "file", file_path)
+        
+        node_files = {node[0]: node[4] for node in nodes}
+        
+        def resolve(target_name, source_file):
+            candidates = nodes_by_name.get(self._name_key(target_name), ())
+            local = [node_id for node_id, file_path in candidates if file_path == source_file]
+            if len(local) == 1:
+                return local[0]
+            return candidates[0][0] if len(candidates) == 1 else None
+        
+        edges = []
+        for row in range(len(relationships)):
+            source = relationships.value(row, "source")
+            target = relationships.value(row, "target")
+            if not source or not target:
+                continue
+            source_id = node_ids.get(source)
+            if source_id is None:
+                # Relationship sourced from a file with no elements of its own
+                source_id = add_node(source, source, "file", source)
+                node_files[source_id] = source
+            edges.append((
+                relationships.value(row, "type"), source_id, resolve(target, node_files[source_id]), target,
+                self._name_key(target), relationships.value(row, "line"), relationships.value(row, "confidence")
+            ))
+        
+        # Class dependencies are their base classes
+        class_type = elements.pool.lookup("class")
+        for row, type_id in enumerate(elements.columns["type"]):
+            if type_id != class_type:
+                continue
+            source_id = node_ids[elements.value(row, "id")]
+            for base in elements.value(row, "dependencies"):
+                edges.append((
+                    "inherits", source_id, resolve(base, node_files[source_id]), base,
+                    self._name_key(base), elements.value(row, "start_line"), 1.0
+                ))
+        
+        with self.connection:
+            self.connection.execute("DELETE FROM edges")
+            self.connection.execute("DELETE FROM nodes")
+            self.connection.execute("DELETE FROM metadata")
+            self.connection.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", nodes)
+            self.connection.executemany("INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?, ?)", edges)
+            self.connection.executemany("INSERT INTO metadata VALUES (?, ?)", [
+                ("repository_path", repository_path),
+                ("repository_url", repository_url),
+                ("commit", commit),
+                ("analyzer_version", ANALYZER_VERSION),
+                ("built_at", datetime.datetime.now().isoformat())
+            ])
+        
+        return {"nodes": len(nodes), "edges": len(edges), "index_path": self.index_path}
+    
+    def find_nodes(self, name: str, element_type: str = "") -> List[int]:
+        """Node ids for an element name (or element id / file path), optionally filtered by type"""
+        query = "SELECT node_id FROM nodes WHERE (name = ? OR element_id = ?)"
+        params: List[Any] = [name, name]
+        if element_type:
+            query += " AND type = ?"
+            params.append(element_type)
+        return [row[0] for row in self.connection.execute(query, params)]
+    
+    def nodes(self, node_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not node_ids:
+            return {}
+        placeholders = ",".join("?" * len(node_ids))
+        rows = self.connection.execute(
+            f"SELECT node_id, element_id, name, type, file_path, start_line, end_line, complexity "
+            f"FROM nodes WHERE node_id IN ({placeholders})", node_ids
+        )
+        return {
+            row[0]: {"node_id": row[0], "id": row[1], "name": row[2], "type": row[3], "file_path": row[4],
+                     "start_line": row[5], "end_line": row[6], "complexity": row[7]}
+            for row in rows
+        }
+    
+    def outgoing(self, node_ids: List[int], relationship_types: Optional[List[str]] = None,
+                 min_confidence: float = 0.0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Forward adjacency: what the given nodes point at"""
+        if not node_ids:
+            return []
+        placeholders = ",".join("?" * len(node_ids))
+        query = (f"SELECT type, target_id, target_name, line, confidence FROM edges "
+                 f"WHERE source_id IN ({placeholders}) AND confidence >= ?")
+        params: List[Any] = list(node_ids) + [min_confidence]
+        if relationship_types:
+            query += f" AND type IN ({','.join('?' * len(relationship_types))})"
+            params.extend(relationship_types)
+        rows = self.connection.execute(query + " ORDER BY line LIMIT ?", params + [limit]).fetchall()
+        
+        targets = self.nodes([row[1] for row in rows if row[1] is not None])
+        return [
+            {"type": row[0], "target": row[2], "line": row[3], "confidence": row[4],
+             "resolved": targets.get(row[1])}
+            for row in rows
+        ]
+    
+    def incoming(self, node_ids: List[int], name: str, relationship_types: Optional[List[str]] = None,
+                 min_confidence: float = 0.0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Reverse adjacency: what points at the given nodes, or at the unresolved name"""
+        conditions = ["(target_id IS NULL AND target_key = ?)"]
+        params: List[Any] = [self._name_key(name)]
+        if node_ids:
+            conditions.append(f"target_id IN ({','.join('?' * len(node_ids))})")
+            params.extend(node_ids)
+        query = (f"SELECT type, source_id, target_name, line, confidence FROM edges "
+                 f"WHERE ({' OR '.join(conditions)}) AND confidence >= ?")
+        params.append(min_confidence)
+        if relationship_types:
+            query += f" AND type IN ({','.join('?' * len(relationship_types))})"
+            params.extend(relationship_types)
+        rows = self.connection.execute(query + " ORDER BY line LIMIT ?", params + [limit]).fetchall()
+        
+        sources = self.nodes([row[1] for row in rows])
+        return [
+            {"type": row[0], "source": sources.get(row[1]), "target": row[2], "line": row[3], "confidence": row[4]}
+            for row in rows
+        ]
+    
+    def close(self):
+        self.connection.close()
+    
+    def __enter__(self) -> "CodeContextGraphIndex":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+## Lazy Source Access
+class SourceSpanReader:
+    """Materialise lazy source spans on demand through memory-mapped files
+    
+    In lazy source mode elements carry a source_span and relationships a
+    context_span of (file_id, byte_start, byte_end), where file_id is the path
+    relative to the analysed repository. Files are mapped on first access and
+    kept open, least recently used first out, up to max_open_files. If commit
+    is given, repository_path is a git directory and file contents are read
+    from that commit's blobs instead.
+    """
+    
+    def __init__(self, repository_path: str, max_open_files: int = 64, commit: Optional[str] = None):
+        self.repository_path = repository_path
+        self.max_open_files = max_open_files
+        self._maps: "collections.OrderedDict[str, Any]" = collections.OrderedDict()
+        self._object_reader = GitObjectReader(repository_path, commit) if commit else None
+    
+    def _map_file(self, file_id: str) -> Any:
+        mapped = self._maps.get(file_id)
+        if mapped is not None:
+            self._maps.move_to_end(file_id)
+            return mapped
+        
+        if self._object_reader is not None:
+            mapped = self._object_reader.read_file(file_id)
+        else:
+            with open(os.path.join(self.repository_path, file_id), 'rb') as f:
+                # mmap cannot map empty files
+                if os.fstat(f.fileno()).st_size == 0:
+                    mapped = b""
+                else:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        self._maps[file_id] = mapped
+        if len(self._maps) > self.max_open_files:
+            _, evicted = self._maps.popitem(last=False)
+            if isinstance(evicted, mmap.mmap):
+                evicted.close()
+        return mapped
+    
+    def read(self, span: Tuple[str, int, int]) -> str:
+        """Return the text covered by a (file_id, byte_start, byte_end) span"""
+        file_id, byte_start, byte_end = span
+        return self._map_file(file_id)[byte_start:byte_end].decode('utf-8', errors='replace')
+    
+    def materialize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in source_code / context of an element or relationship from its span"""
+        if record.get("source_span") and not record.get("source_code"):
+            record["source_code"] = self.read(record["source_span"])
+        if record.get("context_span") and not record.get("context"):
+            record["context"] = self.read(record["context_span"])
+        return record
+    
+    def close(self):
+        for mapped in self._maps.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._maps.clear()
+        if self._object_reader is not None:
+            self._object_reader.close()
+    
+    def __enter__(self) -> "SourceSpanReader":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
 ## Code Analyzer Agent Class
 class CodeAnalyzerAgent:
     def __init__(self):
@@ -92,11 +1230,25 @@ class CodeAnalyzerAgent:
         self.max_file_size: int = 10485760
         self.include_ignored: bool = False
         self.analysis_depth: str = "full"  # 'basic', 'full', 'deep'
-        self.language_parsers: Dict[str, Any] = {}
         self.analysis_results: Dict[str, Any] = {}
+        self.max_workers: int = os.cpu_count() or 1
+        self.parse_batch_size: int = 50   # Files handed to a worker per round trip
+        self.parallel_min_files: int = 32  # Below this, a process pool costs more than it saves
+        self.stream_batch_size: int = 8   # Batch size when source_files is a stream of unknown length
+        self.cache_enabled: bool = True
+        self.cache_dir: str = os.environ.get("CODEBASE_GENIUS_CACHE_DIR", "/tmp/codebase_genius_cache")
+        self.cache_max_bytes: int = 536870912  # 512MB, matches performance.cache_size_mb
+        self.source_mode: str = "lazy"  # 'lazy' keeps (file_id, byte_start, byte_end) spans while parsing and resolves them in the result, 'eager' inlines text throughout
+        self.keep_parse_tree: bool = False  # Store the S-expression of each tree in FileAnalysis
+        self._inline_source: bool = False
+        self.ccg_index_enabled: bool = True  # Persist the CCG under cache_dir/ccg for query_code_relationships
+        self.ccg_index_max_bytes: int = 268435456  # 256MB across every repository's index
+        self.object_reader: Optional[GitObjectReader] = None  # Set while analysing a commit without a checkout
+        self.element_table: ElementTable = ElementTable()
+        self.relationship_table: RelationshipTable = RelationshipTable()
     
     def initialize_parsers(self) -> Dict[str, Any]:
-        """Initialize Tree-sitter language parsers"""
+        """Report Tree-sitter availability; grammars load lazily on first use (see GrammarRegistry)"""
         if not TREE_SITTER_AVAILABLE:
             return {
                 "status": "warning",
@@ -104,91 +1256,64 @@ class CodeAnalyzerAgent:
                 "parsers_available": False
             }
         
+        return {
+            "status": "success",
+            "parsers_initialized": len(GRAMMAR_REGISTRY.loaded_languages()),
+            "supported_languages": GRAMMAR_REGISTRY.supported_languages(),
+            "failed_languages": GRAMMAR_REGISTRY.failed_languages()
+        }
+    
+    def parse_file(self, file_path: str, language: str, relative_path: Optional[str] = None) -> Dict[str, Any]:
+        """Parse a single file using Tree-sitter or fallback methods
+        
+        relative_path, when given, is the path recorded in element IDs and
+        relationships instead of the on-disk location. While object_reader is
+        set, file_path is a blob id in its object database.
+        """
         try:
-            # Initialize language parsers
-            language_parsers = {}
-            
-            # Python parser
-            try:
-                python_lang = tree_sitter.Language('tree-sitter-python', 'python')
-                language_parsers['python'] = tree_sitter.Parser(python_lang)
-            except Exception as e:
-                print(f"Failed to initialize Python parser: {e}")
-            
-            # JavaScript parser
-            try:
-                js_lang = tree_sitter.Language('tree-sitter-javascript', 'javascript')
-                language_parsers['javascript'] = tree_sitter.Parser(js_lang)
-            except Exception as e:
-                print(f"Failed to initialize JavaScript parser: {e}")
-            
-            # TypeScript parser
-            try:
-                ts_lang = tree_sitter.Language('tree-sitter-typescript', 'typescript')
-                language_parsers['typescript'] = tree_sitter.Parser(ts_lang)
-            except Exception as e:
-                print(f"Failed to initialize TypeScript parser: {e}")
-            
-            # Java parser
-            try:
-                java_lang = tree_sitter.Language('tree-sitter-java', 'java')
-                language_parsers['java'] = tree_sitter.Parser(java_lang)
-            except Exception as e:
-                print(f"Failed to initialize Java parser: {e}")
-            
-            # C++ parser
-            try:
-                cpp_lang = tree_sitter.Language('tree-sitter-cpp', 'cpp')
-                language_parsers['cpp'] = tree_sitter.Parser(cpp_lang)
-            except Exception as e:
-                print(f"Failed to initialize C++ parser: {e}")
+            # Read raw bytes so Tree-sitter byte offsets match the file on disk
+            if self.object_reader is not None:
+                raw_source = self.object_reader.read_blob(file_path)
+            else:
+                with open(file_path, 'rb') as f:
+                    raw_source = f.read()
             
-            # C parser
             try:
-                c_lang = tree_sitter.Language('tree-sitter-c', 'c')
-                language_parsers['c'] = tree_sitter.Parser(c_lang)
-            except Exception as e:
-                print(f"Failed to initialize C parser: {e}")
+                source_code = raw_source.decode('utf-8')
+                spans_exact = True
+            except UnicodeDecodeError:
+                # Dropping invalid bytes shifts offsets, so spans cannot point into the file
+                source_code = raw_source.decode('utf-8', errors='ignore')
+                spans_exact = False
             
-            self.language_parsers = language_parsers
-            
-            return {
-                "status": "success",
-                "parsers_initialized": len(language_parsers),
-                "supported_languages": list(language_parsers.keys())
-            }
-            
-        except Exception as e:
-            return {
-                "status": "error",
-                "error": f"Parser initialization failed: {str(e)}"
-            }
-    
-    def parse_file(self, file_path: str, language: str) -> Dict[str, Any]:
-        """Parse a single file using Tree-sitter or fallback methods"""
-        try:
-            # Read file content
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                source_code = f.read()
-            
-            # Try Tree-sitter parsing first
-            if TREE_SITTER_AVAILABLE and language in self.language_parsers:
-                return self._parse_with_tree_sitter(file_path, language, source_code)
-            else:
-                return self._parse_with_fallback(file_path, language, source_code)
+            return self.parse_source(relative_path or file_path, language, source_code, spans_exact)
             
         except Exception as e:
             return {
                 "status": "error",
-                "file_path": file_path,
+                "file_path": relative_path or file_path,
                 "error": str(e)
             }
     
-    def _parse_with_tree_sitter(self, file_path: str, language: str, source_code: str) -> Dict[str, Any]:
+    def parse_source(self, file_path: str, language: str, source_code: str, spans_exact: bool = True) -> Dict[str, Any]:
+        """Parse already-loaded source code using Tree-sitter or fallback methods
+        
+        spans_exact says whether the UTF-8 encoding of source_code is byte-identical
+        to the file at file_path; if not, source text is always stored inline.
+        """
+        # Try Tree-sitter parsing first
+        parser = GRAMMAR_REGISTRY.get_parser(language) if TREE_SITTER_AVAILABLE else None
+        if parser is not None:
+            return self._parse_with_tree_sitter(file_path, language, source_code, spans_exact, parser)
+        else:
+            return self._parse_with_fallback(file_path, language, source_code)
+    
+    def _parse_with_tree_sitter(self, file_path: str, language: str, source_code: str, spans_exact: bool = True, parser: Any = None) -> Dict[str, Any]:
         """Parse using Tree-sitter"""
         try:
             # Get appropriate parser
-            parser = self.language_parsers[language]
+            parser = parser or GRAMMAR_REGISTRY.get_parser(language)
+            self._inline_source = self.source_mode == "eager" or not spans_exact
             
             # Parse the code
             tree = parser.parse(source_code.encode())
@@ -199,16 +1324,18 @@ class CodeAnalyzerAgent:
             file_analysis.language = language
             file_analysis.parsing_status = "success"
             file_analysis.lines_of_code = len(source_code.splitlines())
-            file_analysis.tree_sitter_tree = tree.root_node.sexp()
+            if self.keep_parse_tree:
+                file_analysis.tree_sitter_tree = tree.root_node.sexp()
             
-            # Extract code elements
-            elements = self.extract_code_elements(tree.root_node, language, file_path)
-            relationships = self.extract_relationships(tree.root_node, language, file_path)
+            # Extract elements, relationships and complexity in a single pass
+            visit_result = self.visit_tree(tree.root_node, language, file_path)
+            elements = visit_result["elements"]
+            relationships = visit_result["relationships"]
             
             # Update counts
             file_analysis.elements_found = len(elements)
             file_analysis.relationships_found = len(relationships)
-            file_analysis.complexity_score = self.calculate_complexity_score(tree.root_node)
+            file_analysis.complexity_score = visit_result["complexity_score"]
             
             return {
                 "status": "success",
@@ -238,13 +1365,23 @@ class CodeAnalyzerAgent:
             file_analysis.lines_of_code = len(source_code.splitlines())
             
             # Extract elements using regex patterns
-            elements = self.extract_elements_with_regex(source_code, language, file_path)
-            relationships = self.extract_relationships_with_regex(source_code, language, file_path)
+            scan_result = self.scan_with_regex(source_code, language, file_path)
+            elements = scan_result["elements"]
+            relationships = scan_result["relationships"]
             
             # Update counts
             file_analysis.elements_found = len(elements)
             file_analysis.relationships_found = len(relationships)
-            file_analysis.complexity_score = self.calculate_complexity_with_regex(source_code)
+            
+            # Per-function complexity and spans from the token scan replace the regex placeholders
+            profile = self.complexity_profile(source_code, language)
+            scopes = {(scope["type"], scope["start_line"], scope["name"]): scope for scope in profile["scopes"]}
+            for element in elements:
+                scope = scopes.get((element["type"], element["start_line"], element["name"]))
+                if scope:
+                    element["complexity"] = scope["complexity"]
+                    element["end_line"] = scope["end_line"]
+            file_analysis.complexity_score = profile["complexity"]
             
             return {
                 "status": "success",
@@ -263,46 +1400,134 @@ class CodeAnalyzerAgent:
                 "error": f"Fallback parsing failed: {str(e)}"
             }
     
-    def extract_code_elements(self, tree_node: Any, language: str, file_path: str) -> List[Dict[str, Any]]:
-        """Extract code elements from parse tree"""
-        elements = []
-        element_counter = 0
+    def visit_tree(self, tree_root: Any, language: str, file_path: str) -> Dict[str, Any]:
+        """Collect elements, relationships and complexity in one iterative TreeCursor pass
         
-        def traverse_tree(node, current_path=""):
-            nonlocal element_counter
+        Per-element complexity and call dependencies are accumulated on a stack of
+        open frames and folded into the parent frame when an element is left, so
+        every node is visited exactly once regardless of nesting depth.
+        """
+        elements: List[Dict[str, Any]] = []
+        relationships: List[Dict[str, Any]] = []
+        if not tree_root:
+            return {"elements": elements, "relationships": relationships, "complexity_score": 0.0}
+        
+        element_handlers = ELEMENT_HANDLERS.get(language, {})
+        relationship_handlers = RELATIONSHIP_HANDLERS.get(language, {})
+        frames: List[_VisitFrame] = []
+        scored_total = 0.0
+        scored_count = 0
+        
+        def enter(node, depth):
+            node_type = node.type
+            parent = frames[-1] if frames else None
+            scope = parent.scope if parent else None
+            
+            if parent and node_type in COMPLEXITY_NODE_TYPES:
+                parent.construct_counts[node_type] = parent.construct_counts.get(node_type, 0) + 1
             
-            # Process based on node type
-            if language == "python":
-                if node.type == "function_definition":
-                    elements.append(self.extract_python_function(node, file_path, element_counter))
-                    element_counter += 1
-                elif node.type == "class_definition":
-                    elements.append(self.extract_python_class(node, file_path, element_counter))
-                    element_counter += 1
-                elif node.type == "assignment":
-                    elements.append(self.extract_python_variable(node, file_path, element_counter))
-                    element_counter += 1
+            relationship_handler = relationship_handlers.get(node_type)
+            if relationship_handler:
+                relationship_type, name_extractor, confidence, source_kind = relationship_handler
+                target = getattr(self, name_extractor)(node)
+                if target and not (source_kind == "scope_required" and not scope):
+                    relationships.append({
+                        "type": relationship_type,
+                        "source": file_path if source_kind == "file" else scope,
+                        "target": target,
+                        "line": node.start_point[0] + 1,
+                        "context": self.node_source(node),
+                        "context_span": (file_path, node.start_byte, node.end_byte),
+                        "confidence": confidence,
+                        "is_direct": True
+                    })
+                    if relationship_type == "calls" and parent:
+                        parent.calls.add(target)
+            
+            element = None
+            element_handler = element_handlers.get(node_type)
+            if element_handler:
+                extractor, weights_language, collects_calls, opens_scope = element_handler
+                extract = getattr(self, extractor)
+                if weights_language and collects_calls:
+                    element = extract(node, file_path, len(elements), complexity=1.0, dependencies=[])
+                elif weights_language:
+                    element = extract(node, file_path, len(elements), complexity=1.0)
+                else:
+                    element = extract(node, file_path, len(elements))
+                elements.append(element)
+                if not opens_scope:
+                    element = None
+            
+            scored = SCORED_NODE_TYPES.get(node_type)
+            if element is not None or scored is not None:
+                frames.append(_VisitFrame(
+                    depth,
+                    element,
+                    element_handler[1] if element is not None else None,
+                    element_handler[2] if element is not None else False,
+                    scored,
+                    element["id"] if element is not None else scope
+                ))
+        
+        def leave(depth):
+            nonlocal scored_total, scored_count
+            if not frames or frames[-1].depth != depth:
+                return
             
-            elif language == "javascript":
-                if node.type == "function_declaration":
-                    elements.append(self.extract_js_function(node, file_path, element_counter))
-                    element_counter += 1
-                elif node.type == "class_declaration":
-                    elements.append(self.extract_js_class(node, file_path, element_counter))
-                    element_counter += 1
-                elif node.type == "variable_declaration":
-                    elements.append(self.extract_js_variable(node, file_path, element_counter))
-                    element_counter += 1
+            frame = frames.pop()
+            if frame.element is not None:
+                if frame.weights_language:
+                    frame.element["complexity"] = weighted_complexity(frame.construct_counts, frame.weights_language)
+                if frame.collects_calls:
+                    frame.element["dependencies"] = list(frame.calls)
+            if frame.scored is not None:
+                scored_count += 1
+                if frame.scored:
+                    scored_total += weighted_complexity(frame.construct_counts, "python")
             
-            # Traverse children
-            for child in node.children:
-                traverse_tree(child, current_path)
+            # Nested constructs and calls also belong to every enclosing scope
+            if frames:
+                parent = frames[-1]
+                for node_type, count in frame.construct_counts.items():
+                    parent.construct_counts[node_type] = parent.construct_counts.get(node_type, 0) + count
+                parent.calls.update(frame.calls)
         
-        traverse_tree(tree_node)
-        return elements
+        cursor = tree_root.walk()
+        depth = 0
+        while True:
+            enter(cursor.node, depth)
+            if cursor.goto_first_child():
+                depth += 1
+                continue
+            leave(depth)
+            while depth > 0 and not cursor.goto_next_sibling():
+                cursor.goto_parent()
+                depth -= 1
+                leave(depth)
+            if depth == 0:
+                break
+        
+        return {
+            "elements": elements,
+            "relationships": relationships,
+            "complexity_score": scored_total / max(scored_count, 1)
+        }
+    
+    def extract_code_elements(self, tree_node: Any, language: str, file_path: str) -> List[Dict[str, Any]]:
+        """Extract code elements from parse tree"""
+        return self.visit_tree(tree_node, language, file_path)["elements"]
+    
+    def node_source(self, node: Any) -> str:
+        """Inline source text for a node; empty in lazy mode, where the span is used instead"""
+        return node.text.decode() if self._inline_source else ""
     
-    def extract_python_function(self, node: Any, file_path: str, element_id: int) -> Dict[str, Any]:
-        """Extract Python function"""
+    def extract_python_function(self, node: Any, file_path: str, element_id: int, complexity: Optional[float] = None, dependencies: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Extract Python function
+        
+        complexity and dependencies are computed from the subtree unless supplied
+        (visit_tree fills them in when it leaves the function).
+        """
         # Get function name
         name_node = node.child_by_field_name("name")
         function_name = name_node.text.decode() if name_node else "anonymous"
@@ -316,8 +1541,10 @@ class CodeAnalyzerAgent:
                     parameters.append(param.text.decode())
         
         # Get function body for complexity calculation
-        body_node = node.child_by_field_name("body")
-        complexity = self.calculate_python_complexity(body_node)
+        if complexity is None:
+            complexity = self.calculate_python_complexity(node.child_by_field_name("body"))
+        if dependencies is None:
+            dependencies = self.extract_python_dependencies(node)
         
         # Get decorators
         decorators = []
@@ -332,17 +1559,18 @@ class CodeAnalyzerAgent:
             "signature": f"def {function_name}({', '.join(parameters)})",
             "documentation": self.extract_python_docstring(node),
             "complexity": complexity,
-            "dependencies": self.extract_python_dependencies(node),
+            "dependencies": dependencies,
             "parameters": parameters,
             "return_type": "Any",  # Python type inference would need more sophisticated analysis
             "decorators": decorators,
             "visibility": "public",
             "is_async": False,  # Would need to check for 'async' keyword
             "is_deprecated": False,
-            "source_code": node.text.decode()
+            "source_code": self.node_source(node),
+            "source_span": (file_path, node.start_byte, node.end_byte)
         }
     
-    def extract_python_class(self, node: Any, file_path: str, element_id: int) -> Dict[str, Any]:
+    def extract_python_class(self, node: Any, file_path: str, element_id: int, complexity: Optional[float] = None) -> Dict[str, Any]:
         """Extract Python class"""
         # Get class name
         name_node = node.child_by_field_name("name")
@@ -357,8 +1585,8 @@ class CodeAnalyzerAgent:
                     inheritance.append(base.text.decode())
         
         # Calculate complexity
-        body_node = node.child_by_field_name("body")
-        complexity = self.calculate_python_complexity(body_node)
+        if complexity is None:
+            complexity = self.calculate_python_complexity(node.child_by_field_name("body"))
         
         return {
             "id": f"class_{element_id}_{file_path}",
@@ -376,7 +1604,8 @@ class CodeAnalyzerAgent:
             "visibility": "public",
             "is_async": False,
             "is_deprecated": False,
-            "source_code": node.text.decode()
+            "source_code": self.node_source(node),
+            "source_span": (file_path, node.start_byte, node.end_byte)
         }
     
     def extract_python_variable(self, node: Any, file_path: str, element_id: int) -> Dict[str, Any]:
@@ -405,10 +1634,11 @@ class CodeAnalyzerAgent:
             "visibility": "public",
             "is_async": False,
             "is_deprecated": False,
-            "source_code": node.text.decode()
+            "source_code": self.node_source(node),
+            "source_span": (file_path, node.start_byte, node.end_byte)
         }
     
-    def extract_js_function(self, node: Any, file_path: str, element_id: int) -> Dict[str, Any]:
+    def extract_js_function(self, node: Any, file_path: str, element_id: int, complexity: Optional[float] = None, dependencies: Optional[List[str]] = None) -> Dict[str, Any]:
         """Extract JavaScript function"""
         # Get function name
         name_node = node.child_by_field_name("name")
@@ -423,8 +1653,10 @@ class CodeAnalyzerAgent:
                     parameters.append(param.text.decode())
         
         # Calculate complexity
-        body_node = node.child_by_field_name("body")
-        complexity = self.calculate_js_complexity(body_node)
+        if complexity is None:
+            complexity = self.calculate_js_complexity(node.child_by_field_name("body"))
+        if dependencies is None:
+            dependencies = self.extract_js_dependencies(node)
         
         return {
             "id": f"func_{element_id}_{file_path}",
@@ -435,14 +1667,15 @@ class CodeAnalyzerAgent:
             "signature": f"function {function_name}({', '.join(parameters)})",
             "documentation": self.extract_js_docstring(node),
             "complexity": complexity,
-            "dependencies": self.extract_js_dependencies(node),
+            "dependencies": dependencies,
             "parameters": parameters,
             "return_type": "any",
             "decorators": [],
             "visibility": "public",
             "is_async": False,
             "is_deprecated": False,
-            "source_code": node.text.decode()
+            "source_code": self.node_source(node),
+            "source_span": (file_path, node.start_byte, node.end_byte)
         }
     
     def extract_js_class(self, node: Any, file_path: str, element_id: int) -> Dict[str, Any]:
@@ -467,7 +1700,8 @@ class CodeAnalyzerAgent:
             "visibility": "public",
             "is_async": False,
             "is_deprecated": False,
-            "source_code": node.text.decode()
+            "source_code": self.node_source(node),
+            "source_span": (file_path, node.start_byte, node.end_byte)
         }
     
     def extract_js_variable(self, node: Any, file_path: str, element_id: int) -> Dict[str, Any]:
@@ -497,250 +1731,90 @@ class CodeAnalyzerAgent:
             "visibility": "public",
             "is_async": False,
             "is_deprecated": False,
-            "source_code": node.text.decode()
+            "source_code": self.node_source(node),
+            "source_span": (file_path, node.start_byte, node.end_byte)
         }
     
     def extract_relationships(self, tree_node: Any, language: str, file_path: str) -> List[Dict[str, Any]]:
         """Extract relationships from parse tree"""
-        relationships = []
-        
-        def traverse_for_relationships(node, current_element=None):
-            if language == "python":
-                if node.type == "call":
-                    # Function call relationship
-                    func_name = self.extract_call_name(node)
-                    if func_name:
-                        relationships.append({
-                            "type": "calls",
-                            "source": current_element,
-                            "target": func_name,
-                            "line": node.start_point[0] + 1,
-                            "context": node.text.decode(),
-                            "confidence": 0.8,
-                            "is_direct": True
-                        })
-                elif node.type == "import_from_statement":
-                    # Import relationship
-                    module_name = self.extract_import_module(node)
-                    if module_name:
-                        relationships.append({
-                            "type": "imports",
-                            "source": file_path,
-                            "target": module_name,
-                            "line": node.start_point[0] + 1,
-                            "context": node.text.decode(),
-                            "confidence": 0.9,
-                            "is_direct": True
-                        })
-                elif node.type == "attribute":
-                    # Attribute access relationship
-                    attr_name = self.extract_attribute_name(node)
-                    if attr_name and current_element:
-                        relationships.append({
-                            "type": "uses",
-                            "source": current_element,
-                            "target": attr_name,
-                            "line": node.start_point[0] + 1,
-                            "context": node.text.decode(),
-                            "confidence": 0.7,
-                            "is_direct": True
-                        })
-            
-            elif language == "javascript":
-                if node.type == "call_expression":
-                    # Function call relationship
-                    func_name = self.extract_js_call_name(node)
-                    if func_name:
-                        relationships.append({
-                            "type": "calls",
-                            "source": current_element,
-                            "target": func_name,
-                            "line": node.start_point[0] + 1,
-                            "context": node.text.decode(),
-                            "confidence": 0.8,
-                            "is_direct": True
-                        })
-                elif node.type == "import_statement":
-                    # Import relationship
-                    module_name = self.extract_js_import_module(node)
-                    if module_name:
-                        relationships.append({
-                            "type": "imports",
-                            "source": file_path,
-                            "target": module_name,
-                            "line": node.start_point[0] + 1,
-                            "context": node.text.decode(),
-                            "confidence": 0.9,
-                            "is_direct": True
-                        })
-            
-            # Continue traversal
-            for child in node.children:
-                traverse_for_relationships(child, current_element)
-        
-        traverse_for_relationships(tree_node)
-        return relationships
+        return self.visit_tree(tree_node, language, file_path)["relationships"]
     
-    def extract_elements_with_regex(self, source_code: str, language: str, file_path: str) -> List[Dict[str, Any]]:
-        """Extract elements using regex patterns (fallback method)"""
-        import re
+    def scan_with_regex(self, source_code: str, language: str, file_path: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Extract elements and relationships with one regex scan (fallback method)"""
+        elements: List[Dict[str, Any]] = []
+        relationships: List[Dict[str, Any]] = []
+        pattern = REGEX_FALLBACK_PATTERNS.get(language)
+        if pattern is None:
+            return {"elements": elements, "relationships": relationships}
         
-        elements = []
+        element_kinds = REGEX_ELEMENT_KINDS[language]
+        matches_by_kind: Dict[str, List[Tuple[str, int, str]]] = {kind: [] for kind in element_kinds}
+        offsets = newline_offsets(source_code)
         
-        if language == "python":
-            # Python function definitions
-            func_pattern = r'def\s+(\w+)\s*\([^)]*\):'
-            for match in re.finditer(func_pattern, source_code):
-                elements.append({
-                    "id": f"func_{len(elements)}_{file_path}",
-                    "type": "function",
-                    "name": match.group(1),
-                    "start_line": source_code[:match.start()].count('\n') + 1,
-                    "end_line": 0,  # Would need more complex parsing
-                    "signature": match.group(0).rstrip(':'),
-                    "documentation": "",
-                    "complexity": 1.0,
-                    "dependencies": [],
-                    "parameters": [],
-                    "return_type": "Any",
-                    "decorators": [],
-                    "visibility": "public",
-                    "is_async": False,
-                    "is_deprecated": False,
-                    "source_code": match.group(0)
-                })
+        for match in pattern.finditer(source_code):
+            # The outer group closes last, so lastgroup names the construct
+            construct = match.lastgroup
+            line_num = line_at(offsets, match.start())
             
-            # Python class definitions
-            class_pattern = r'class\s+(\w+)\s*(\([^)]*\))?:'
-            for match in re.finditer(class_pattern, source_code):
-                elements.append({
-                    "id": f"class_{len(elements)}_{file_path}",
-                    "type": "class",
-                    "name": match.group(1),
-                    "start_line": source_code[:match.start()].count('\n') + 1,
-                    "end_line": 0,
-                    "signature": match.group(0).rstrip(':'),
-                    "documentation": "",
-                    "complexity": 1.0,
-                    "dependencies": [],
-                    "parameters": [],
-                    "return_type": "class",
-                    "decorators": [],
-                    "visibility": "public",
-                    "is_async": False,
-                    "is_deprecated": False,
-                    "source_code": match.group(0)
+            if construct == "import":
+                module_name = match.group("import_from") or match.group("import_names")
+                relationships.append({
+                    "type": "imports",
+                    "source": file_path,
+                    "target": module_name.strip(),
+                    "line": line_num,
+                    "context": match.group(0),
+                    "confidence": 0.9,
+                    "is_direct": True
                 })
+            else:
+                matches_by_kind[construct].append((match.group(f"{construct}_name"), line_num, match.group(0)))
         
-        elif language == "javascript":
-            # JavaScript function declarations
-            func_pattern = r'function\s+(\w+)\s*\([^)]*\)\s*{'
-            for match in re.finditer(func_pattern, source_code):
-                elements.append({
-                    "id": f"func_{len(elements)}_{file_path}",
-                    "type": "function",
-                    "name": match.group(1),
-                    "start_line": source_code[:match.start()].count('\n') + 1,
-                    "end_line": 0,
-                    "signature": match.group(0).rstrip('{'),
-                    "documentation": "",
-                    "complexity": 1.0,
-                    "dependencies": [],
-                    "parameters": [],
-                    "return_type": "any",
-                    "decorators": [],
-                    "visibility": "public",
-                    "is_async": False,
-                    "is_deprecated": False,
-                    "source_code": match.group(0)
-                })
-            
-            # JavaScript class declarations
-            class_pattern = r'class\s+(\w+)\s*{'
-            for match in re.finditer(class_pattern, source_code):
+        for kind, (id_prefix, element_type, signature_suffix, return_type) in element_kinds.items():
+            for name, line_num, text in matches_by_kind[kind]:
                 elements.append({
-                    "id": f"class_{len(elements)}_{file_path}",
-                    "type": "class",
-                    "name": match.group(1),
-                    "start_line": source_code[:match.start()].count('\n') + 1,
-                    "end_line": 0,
-                    "signature": match.group(0).rstrip('{'),
+                    "id": f"{id_prefix}_{len(elements)}_{file_path}",
+                    "type": element_type,
+                    "name": name,
+                    "start_line": line_num,
+                    "end_line": 0,  # Filled in from the complexity scan when the span is found
+                    "signature": text.rstrip(signature_suffix),
                     "documentation": "",
                     "complexity": 1.0,
                     "dependencies": [],
                     "parameters": [],
-                    "return_type": "class",
+                    "return_type": return_type,
                     "decorators": [],
                     "visibility": "public",
                     "is_async": False,
                     "is_deprecated": False,
-                    "source_code": match.group(0)
+                    "source_code": text
                 })
         
-        return elements
+        return {"elements": elements, "relationships": relationships}
+    
+    def extract_elements_with_regex(self, source_code: str, language: str, file_path: str) -> List[Dict[str, Any]]:
+        """Extract elements using regex patterns (fallback method)"""
+        return self.scan_with_regex(source_code, language, file_path)["elements"]
     
     def extract_relationships_with_regex(self, source_code: str, language: str, file_path: str) -> List[Dict[str, Any]]:
         """Extract relationships using regex patterns (fallback method)"""
-        import re
-        
-        relationships = []
-        
-        if language == "python":
-            # Python import statements
-            import_pattern = r'(?:from\s+(\S+)\s+)?import\s+([^\n#]+)'
-            for match in re.finditer(import_pattern, source_code, re.MULTILINE):
-                line_num = source_code[:match.start()].count('\n') + 1
-                module_name = match.group(1) or match.group(2)
-                relationships.append({
-                    "type": "imports",
-                    "source": file_path,
-                    "target": module_name.strip(),
-                    "line": line_num,
-                    "context": match.group(0),
-                    "confidence": 0.9,
-                    "is_direct": True
-                })
-        
-        elif language == "javascript":
-            # JavaScript import statements
-            import_pattern = r"import\s+(?:{[^}]+}|[\w*\s,]+)\s+from\s+['\"]([^'\"]+)['\"]"
-            for match in re.finditer(import_pattern, source_code):
-                line_num = source_code[:match.start()].count('\n') + 1
-                module_name = match.group(1)
-                relationships.append({
-                    "type": "imports",
-                    "source": file_path,
-                    "target": module_name,
-                    "line": line_num,
-                    "context": match.group(0),
-                    "confidence": 0.9,
-                    "is_direct": True
-                })
-        
-        return relationships
+        return self.scan_with_regex(source_code, language, file_path)["relationships"]
     
-    def calculate_complexity_with_regex(self, source_code: str) -> float:
-        """Calculate complexity using regex patterns"""
-        import re
-        
-        # Count various complexity-inducing constructs
-        complexity = 1.0
-        
-        # Control flow statements
-        if_count = len(re.findall(r'\bif\b', source_code))
-        for_count = len(re.findall(r'\bfor\b', source_code))
-        while_count = len(re.findall(r'\bwhile\b', source_code))
-        try_count = len(re.findall(r'\btry\b', source_code))
-        
-        complexity += if_count + for_count + while_count + try_count
-        
-        # Logical operators
-        and_count = len(re.findall(r'\band\b', source_code))
-        or_count = len(re.findall(r'\bor\b', source_code))
-        
-        complexity += and_count + or_count
+    def complexity_profile(self, source_code: str, language: str) -> Dict[str, Any]:
+        """File and per-function/class cyclomatic complexity from a single token scan"""
+        if language != "python":
+            return c_family_complexity_profile(source_code)
         
-        return complexity
+        try:
+            return python_complexity_profile(source_code)
+        except (tokenize.TokenError, SyntaxError):
+            # Unbalanced brackets or bad indentation: count keywords only, no scopes
+            return {"complexity": 1.0 + len(PYTHON_DECISION_PATTERN.findall(source_code)), "scopes": []}
+    
+    def calculate_complexity_with_regex(self, source_code: str, language: str = "python") -> float:
+        """Calculate file complexity for the fallback parser (see complexity_profile)"""
+        return self.complexity_profile(source_code, language)["complexity"]
     
     # Helper functions for extracting information
     def extract_python_docstring(self, node: Any) -> str:
@@ -757,19 +1831,15 @@ class CodeAnalyzerAgent:
     
     def extract_python_dependencies(self, node: Any) -> List[str]:
         """Extract function call dependencies"""
-        dependencies = []
+        dependencies = set()
         
-        def find_calls(node):
-            if node.type == "call":
-                func_name = self.extract_call_name(node)
+        for descendant in iter_subtree(node):
+            if descendant.type == "call":
+                func_name = self.extract_call_name(descendant)
                 if func_name:
-                    dependencies.append(func_name)
-            
-            for child in node.children:
-                find_calls(child)
+                    dependencies.add(func_name)
         
-        find_calls(node)
-        return list(set(dependencies))  # Remove duplicates
+        return list(dependencies)
     
     def extract_call_name(self, node: Any) -> str:
         """Extract function call name"""
@@ -805,19 +1875,15 @@ class CodeAnalyzerAgent:
     
     def extract_js_dependencies(self, node: Any) -> List[str]:
         """Extract JavaScript dependencies"""
-        dependencies = []
+        dependencies = set()
         
-        def find_js_calls(node):
-            if node.type == "call_expression":
-                func_name = self.extract_js_call_name(node)
+        for descendant in iter_subtree(node):
+            if descendant.type == "call_expression":
+                func_name = self.extract_js_call_name(descendant)
                 if func_name:
-                    dependencies.append(func_name)
-            
-            for child in node.children:
-                find_js_calls(child)
+                    dependencies.add(func_name)
         
-        find_js_calls(node)
-        return list(set(dependencies))
+        return list(dependencies)
     
     def extract_js_call_name(self, node: Any) -> str:
         """Extract JavaScript function call name"""
@@ -839,110 +1905,349 @@ class CodeAnalyzerAgent:
         if not node:
             return 1.0
         
-        complexity = 1.0
-        
-        def count_complexity_constructs(node):
-            nonlocal complexity
-            
-            # Count various complexity-inducing constructs
-            if node.type in ["if_statement", "for_statement", "while_statement", "try_statement"]:
-                complexity += 1
-            elif node.type == "elif_clause":
-                complexity += 0.5
-            elif node.type == "except_clause":
-                complexity += 1
-            elif node.type in ["and_expression", "or_expression"]:
-                complexity += 1
-            
-            for child in node.children:
-                count_complexity_constructs(child)
-        
-        count_complexity_constructs(node)
-        return complexity
+        return weighted_complexity(collections.Counter(n.type for n in iter_subtree(node)), "python")
     
     def calculate_js_complexity(self, node: Any) -> float:
         """Calculate JavaScript complexity"""
         if not node:
             return 1.0
         
-        complexity = 1.0
-        
-        def count_js_complexity(node):
-            nonlocal complexity
-            
-            if node.type in ["if_statement", "for_statement", "while_statement", "switch_statement"]:
-                complexity += 1
-            elif node.type == "case_clause":
-                complexity += 0.5
-            elif node.type in ["binary_expression", "logical_expression"]:
-                complexity += 1
-            
-            for child in node.children:
-                count_js_complexity(child)
-        
-        count_js_complexity(node)
-        return complexity
+        return weighted_complexity(collections.Counter(n.type for n in iter_subtree(node)), "javascript")
     
     def calculate_complexity_score(self, tree_root: Any) -> float:
         """Calculate overall file complexity"""
         if not tree_root:
             return 0.0
         
-        # Calculate overall file complexity
-        total_complexity = 0.0
-        element_count = 0
+        return self.visit_tree(tree_root, "", "")["complexity_score"]
+    
+    def source_task(self, location: str, relative_path: str, size: int) -> Optional[Tuple[str, str, str]]:
+        """Return the parse task for one repository file, or None if it is not analysed
+        
+        location is the file's absolute path, or its blob id while object_reader is set;
+        relative_path uses "/" separators.
+        """
+        if size > self.max_file_size:
+            return None
+        if IGNORED_DIRECTORIES.intersection(relative_path.split("/")[:-1]):
+            return None
+        language = LANGUAGE_EXTENSIONS.get(os.path.splitext(relative_path)[1].lower())
+        return (location, relative_path, language) if language else None
+    
+    def discover_source_files(self, repository_path: str) -> List[Tuple[str, str, str]]:
+        """Find analyzable files as (absolute path, relative path, language) tuples
+        
+        While object_reader is set, the commit's tree is listed instead and the
+        first element of each tuple is the file's blob id.
+        """
+        source_files = []
+        
+        if self.object_reader is not None:
+            for path, _, object_type, object_id, size in self.object_reader.entries():
+                task = self.source_task(object_id, path, size) if object_type == "blob" else None
+                if task:
+                    source_files.append(task)
+            return source_files
+        
+        for root, dirs, filenames in os.walk(repository_path):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRECTORIES]
+            
+            for filename in filenames:
+                if not LANGUAGE_EXTENSIONS.get(os.path.splitext(filename)[1].lower()):
+                    continue
+                
+                file_path = os.path.join(root, filename)
+                try:
+                    size = os.path.getsize(file_path)
+                except OSError:
+                    continue
+                
+                task = self.source_task(file_path, os.path.relpath(file_path, repository_path).replace(os.sep, "/"), size)
+                if task:
+                    source_files.append(task)
+        
+        return source_files
+    
+    def parse_repository_file(self, file_path: str, relative_path: str, language: str) -> Dict[str, Any]:
+        """Parse one repository file and return a compact, picklable result"""
+        result = self.parse_file(file_path, language, relative_path)
+        
+        if result.get("status") != "success":
+            return {
+                "status": "error",
+                "file_path": relative_path,
+                "language": language,
+                "error": result.get("error", "Unknown parsing error")
+            }
+        
+        # Drop the FileAnalysis object (and its serialized tree); keep columnar data only
+        elements = ElementTable()
+        for element in result["elements"]:
+            element["file_path"] = relative_path
+            element["language"] = language
+            elements.append(element)
+        
+        # Module-level calls belong to the file, like its imports
+        for relationship in result["relationships"]:
+            if relationship["source"] is None:
+                relationship["source"] = relative_path
+        
+        return {
+            "status": "success",
+            "file_path": relative_path,
+            "language": language,
+            "elements": elements,
+            "relationships": RelationshipTable.from_records(result["relationships"]),
+            "complexity_score": result["complexity_score"],
+            "lines_of_code": result["file_analysis"].lines_of_code
+        }
+    
+    def parse_repository_files(self, repository_path: str, max_workers: Optional[int] = None, source_files: Optional[typing.Iterable[Tuple[str, str, str]]] = None, on_result: Optional[typing.Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Parse all source files, fanning parse_file out over a process pool
         
-        def analyze_node(node):
-            nonlocal total_complexity, element_count
+        source_files defaults to discover_source_files(repository_path) but may be
+        any iterable of the same tuples, e.g. one fed from a queue while the
+        repository is still being walked: files are dispatched in batches as they
+        arrive, with at most two batches per worker in flight, and on_result is
+        called with each file's result as soon as it is available. Results in the
+        returned "files" keep the order of source_files.
+        """
+        cache = None
+        pool = None
+        try:
+            if source_files is None:
+                source_files = self.discover_source_files(repository_path)
+            
+            if self.cache_enabled:
+                try:
+                    cache = ParseResultCache(self.cache_dir, self.cache_max_bytes)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"⚠️ Parse cache unavailable, parsing every file: {e}")
+            
+            workers = max(1, max_workers or self.max_workers)
+            if isinstance(source_files, list):
+                # Small batches keep workers evenly loaded; large ones cut IPC round trips
+                batch_size = max(1, min(self.parse_batch_size, len(source_files) // (workers * 4)))
+            else:
+                batch_size = self.stream_batch_size
+            
+            file_results: Dict[int, Dict[str, Any]] = {}
+            cache_entries: List[Tuple[str, Dict[str, Any]]] = []
+            # Cache misses as (index, cache key, task), waiting for a batch or the process pool
+            pending: List[Tuple[int, Optional[str], Tuple[str, str, str]]] = []
+            in_flight: Dict[concurrent.futures.Future, List[Tuple[int, Optional[str], Tuple[str, str, str]]]] = {}
+            misses = 0
+            parallel = workers > 1
+            
+            def finish(entries, results):
+                for (index, key, _), result in zip(entries, results):
+                    file_results[index] = result
+                    if key and result["status"] == "success":
+                        cache_entries.append((key, result))
+                    if on_result:
+                        on_result(result)
+            
+            def parse_serially(entries):
+                for entry in entries:
+                    finish([entry], [self.parse_repository_file(*entry[2])])
+            
+            def collect(wait_all: bool):
+                nonlocal parallel
+                if not in_flight:
+                    return
+                done, _ = concurrent.futures.wait(
+                    list(in_flight),
+                    return_when=concurrent.futures.ALL_COMPLETED if wait_all else concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    entries = in_flight.pop(future)
+                    try:
+                        results = future.result()
+                    except (OSError, pickle.PicklingError, concurrent.futures.process.BrokenProcessPool) as e:
+                        if parallel:
+                            print(f"⚠️ Parallel parsing failed, falling back to serial parsing: {e}")
+                        parallel = False
+                        parse_serially(entries)
+                        continue
+                    finish(entries, results)
+            
+            def dispatch(final: bool):
+                nonlocal pool, parallel
+                if pool is None and parallel and misses >= self.parallel_min_files:
+                    try:
+                        # Another thread (e.g. a producer feeding source_files) may hold locks a
+                        # forked child would inherit, so workers then come from a forkserver
+                        start_method = "forkserver" if threading.active_count() > 1 and "forkserver" in multiprocessing.get_all_start_methods() else None
+                        pool = concurrent.futures.ProcessPoolExecutor(
+                            max_workers=workers,
+                            mp_context=multiprocessing.get_context(start_method),
+                            # Workers reach this module through the loader: a forkserver child
+                            # cannot import it by name (see call_agent_function)
+                            initializer=call_agent_function,
+                            initargs=(
+                                "code-analyzer", "_init_parse_worker",
+                                self.analysis_depth, self.max_file_size, self.source_mode,
+                                self.object_reader.git_dir if self.object_reader else None,
+                                self.object_reader.commit if self.object_reader else None
+                            )
+                        )
+                    except (OSError, NotImplementedError, ValueError) as e:
+                        # Some serverless runtimes cannot spawn processes
+                        print(f"⚠️ Parallel parsing unavailable, falling back to serial parsing: {e}")
+                        parallel = False
+                
+                if pool is None or not parallel:
+                    # Below parallel_min_files misses wait (the pool may still pay off) until the end
+                    if final or not parallel:
+                        entries = pending[:]
+                        pending.clear()
+                        parse_serially(entries)
+                    return
+                
+                while len(pending) >= batch_size or (final and pending):
+                    batch = pending[:batch_size]
+                    del pending[:batch_size]
+                    while len(in_flight) >= workers * 2:
+                        collect(False)
+                    if not parallel:
+                        parse_serially(batch)
+                        continue
+                    try:
+                        in_flight[pool.submit(call_agent_function, "code-analyzer", "_parse_batch_worker", [task for _, _, task in batch])] = batch
+                    except (OSError, RuntimeError, pickle.PicklingError, concurrent.futures.process.BrokenProcessPool) as e:
+                        print(f"⚠️ Parallel parsing failed, falling back to serial parsing: {e}")
+                        parallel = False
+                        parse_serially(batch)
+            
+            # Serve unchanged files from the parse cache; only misses are parsed
+            for index, task in enumerate(source_files):
+                key = None
+                if cache:
+                    try:
+                        # A blob id already names the content, so commits need no hashing pass
+                        content_id = task[0] if self.object_reader is not None else None
+                        variant = f"{self.source_mode}:{GRAMMAR_REGISTRY.backend(task[2])}"
+                        key = ParseResultCache.make_key(*task, variant=variant, content_id=content_id)
+                    except OSError:
+                        key = None
+                    cached_result = cache.get(key) if key else None
+                    if cached_result is not None:
+                        cached_result["elements"] = ElementTable.from_columns(cached_result["elements"])
+                        cached_result["relationships"] = RelationshipTable.from_columns(cached_result["relationships"])
+                        finish([(index, None, task)], [cached_result])
+                        continue
+                pending.append((index, key, task))
+                misses += 1
+                dispatch(final=False)
+            
+            dispatch(final=True)
+            collect(wait_all=True)
+            workers = min(workers, misses) if pool is not None and parallel else 1
+            
+            if cache:
+                cache.put_many([
+                    (key, dict(
+                        result,
+                        elements=result["elements"].to_columns(),
+                        relationships=result["relationships"].to_columns()
+                    ))
+                    for key, result in cache_entries
+                ])
             
-            if node.type in ["function_definition", "class_definition", "method_definition"]:
-                element_count += 1
-                if node.type == "function_definition":
-                    total_complexity += self.calculate_python_complexity(node.child_by_field_name("body"))
-                elif node.type == "class_definition":
-                    total_complexity += self.calculate_python_complexity(node.child_by_field_name("body"))
+            # Per-file tables are merged into shared repository tables with one string pool
+            entities = ElementTable()
+            relationships = RelationshipTable()
+            files = []
+            errors = []
+            for index in range(len(file_results)):
+                file_result = file_results[index]
+                if file_result["status"] != "success":
+                    errors.append({"file_path": file_result["file_path"], "error": file_result["error"]})
+                    continue
+                
+                entities.extend(file_result["elements"])
+                relationships.extend(file_result["relationships"])
+                files.append({
+                    "file_path": file_result["file_path"],
+                    "language": file_result["language"],
+                    "elements_found": len(file_result["elements"]),
+                    "relationships_found": len(file_result["relationships"]),
+                    "complexity_score": file_result["complexity_score"],
+                    "lines_of_code": file_result["lines_of_code"]
+                })
             
-            for child in node.children:
-                analyze_node(child)
+            return {
+                "status": "success",
+                "files_discovered": len(file_results),
+                "files_parsed": len(files),
+                "files_failed": len(errors),
+                "workers": workers,
+                "files": files,
+                "errors": errors,
+                "entities": entities,
+                "relationships": relationships,
+                "cache": cache.stats() if cache else {"enabled": False}
+            }
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"File parsing failed: {str(e)}"
+            }
+        
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if cache:
+                cache.close()
+    
+    def _module_files(self, repository_path: str) -> typing.Iterator[Tuple[str, str]]:
+        """(relative path, enclosing module) of every module file, directories depth first"""
+        if self.object_reader is not None:
+            for path, _, object_type, _, _ in self.object_reader.entries():
+                if object_type != "blob" or os.path.splitext(path)[1] not in MODULE_FILE_SUFFIXES:
+                    continue
+                directories = path.split("/")[:-1]
+                if not MODULE_SKIPPED_DIRECTORIES.intersection(directories):
+                    yield path, ".".join(directories)
+            return
+        
+        def process_directory(dir_path, current_module=""):
+            for item in pathlib.Path(dir_path).iterdir():
+                if item.is_file() and item.suffix in MODULE_FILE_SUFFIXES:
+                    yield str(item.relative_to(repository_path)), current_module
+                elif item.is_dir() and item.name not in MODULE_SKIPPED_DIRECTORIES:
+                    # Process subdirectory
+                    sub_module = f"{current_module}.{item.name}" if current_module else item.name
+                    yield from process_directory(item, sub_module)
         
-        analyze_node(tree_root)
-        return total_complexity / max(element_count, 1)
+        yield from process_directory(repository_path)
     
     def build_module_hierarchy(self, repository_path: str) -> Dict[str, Any]:
         """Build module hierarchy"""
         try:
             modules = {}
             
-            def process_directory(dir_path, current_module=""):
-                for item in pathlib.Path(dir_path).iterdir():
-                    if item.is_file() and item.suffix in [".py", ".js", ".ts", ".java", ".cpp", ".c"]:
-                        # Create module for file
-                        module_name = item.stem
-                        full_module_path = str(item.relative_to(repository_path))
-                        
-                        if current_module:
-                            module_name = f"{current_module}.{module_name}"
-                        
-                        if module_name not in modules:
-                            modules[module_name] = {
-                                "name": module_name,
-                                "path": full_module_path,
-                                "is_package": False,
-                                "level": module_name.count("."),
-                                "parent": current_module if "." in module_name else None,
-                                "children": []
-                            }
-                        
-                        # Add to parent module's children
-                        if current_module and current_module in modules:
-                            modules[current_module]["children"].append(module_name)
-                    
-                    elif item.is_dir() and item.name not in [".git", "__pycache__", "node_modules"]:
-                        # Process subdirectory
-                        sub_module = f"{current_module}.{item.name}" if current_module else item.name
-                        process_directory(item, sub_module)
-            
-            process_directory(repository_path)
+            for full_module_path, current_module in self._module_files(repository_path):
+                # Create module for file
+                module_name = os.path.splitext(os.path.basename(full_module_path))[0]
+                
+                if current_module:
+                    module_name = f"{current_module}.{module_name}"
+                
+                if module_name not in modules:
+                    modules[module_name] = {
+                        "name": module_name,
+                        "path": full_module_path,
+                        "is_package": False,
+                        "level": module_name.count("."),
+                        "parent": current_module if "." in module_name else None,
+                        "children": []
+                    }
+                
+                # Add to parent module's children
+                if current_module and current_module in modules:
+                    modules[current_module]["children"].append(module_name)
             
             # Create module objects
             module_objects = []
@@ -968,27 +2273,125 @@ class CodeAnalyzerAgent:
                 "error": f"Module hierarchy construction failed: {str(e)}"
             }
     
-    def calculate_repository_metrics(self) -> Dict[str, Any]:
+    def build_import_graph(self, files: List[Dict[str, Any]], relationships: RelationshipTable) -> Dict[str, List[str]]:
+        """File-level import graph: each parsed file mapped to the repository files it imports
+        
+        Imports that do not resolve to a parsed file (standard library, third-party
+        packages) are dropped, as are self-imports such as "from . import x" in __init__.py.
+        """
+        paths = [f["file_path"] for f in files]
+        path_set = set(paths)
+        
+        # Dotted module name -> file, for the full name and every dotted suffix
+        # of it, keeping only names that identify exactly one file
+        modules: Dict[str, str] = {}
+        ambiguous = set()
+        for path in paths:
+            stem, suffix = os.path.splitext(path)
+            if suffix not in MODULE_FILE_SUFFIXES:
+                continue
+            parts = stem.replace(os.sep, "/").split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            for start in range(len(parts)):
+                name = ".".join(parts[start:])
+                if modules.setdefault(name, path) != path:
+                    ambiguous.add(name)
+        for name in ambiguous:
+            del modules[name]
+        
+        edges: Dict[str, set] = {path: set() for path in paths}
+        imports_type = relationships.pool.lookup("imports")
+        if imports_type != -1:
+            for row, type_id in enumerate(relationships.columns["type"]):
+                if type_id != imports_type:
+                    continue
+                source = relationships.value(row, "source")
+                if source not in edges:
+                    continue
+                target = self.resolve_import(source, relationships.value(row, "target"), modules, path_set)
+                if target is not None and target != source:
+                    edges[source].add(target)
+        
+        return {path: sorted(targets) for path, targets in edges.items()}
+    
+    def resolve_import(self, source_file: str, target: str, modules: Dict[str, str], paths: typing.AbstractSet[str]) -> Optional[str]:
+        """Repository file an import target refers to, or None if it is external
+        
+        Handles "./x" and "../x" paths (JS/TS), Python relative imports (".x", "..x")
+        and absolute dotted names; aliases ("x as y") are ignored.
+        """
+        name = (target or "").split(" as ")[0].strip()
+        if not name:
+            return None
+        directory = os.path.dirname(source_file)
+        
+        if name.startswith(("./", "../")):
+            base = os.path.normpath(os.path.join(directory, name))
+            candidates = [base]
+            candidates.extend(base + suffix for suffix in MODULE_FILE_SUFFIXES)
+            candidates.extend(os.path.join(base, "index" + suffix) for suffix in MODULE_FILE_SUFFIXES)
+            return next((candidate for candidate in candidates if candidate in paths), None)
+        
+        if name.startswith("."):
+            level = len(name) - len(name.lstrip("."))
+            package = directory.split("/") if directory else []
+            if level - 1 > len(package):
+                return None
+            parts = package[:len(package) - (level - 1)]
+            remainder = name[level:]
+            if remainder:
+                parts.extend(remainder.split("."))
+            base = "/".join(parts)
+            candidates = (base + ".py", os.path.join(base, "__init__.py"))
+            return next((candidate for candidate in candidates if candidate in paths), None)
+        
+        return modules.get(name)
+    
+    def calculate_repository_metrics(self, parse_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Calculate repository metrics"""
         try:
-            # This would typically query the graph database or nodes created earlier
-            # For now, return a basic structure
+            parse_result = parse_result or {}
+            files = parse_result.get("files", [])
+            entities = parse_result.get("entities") or ElementTable()
+            
+            # Read the columns directly instead of materialising element dicts
+            complexities = entities.columns["complexity"]
+            documentable_types = {entities.pool.lookup("function"), entities.pool.lookup("class")} - {-1}
+            empty_documentation = entities.pool.lookup("")
+            documentable = 0
+            documented = 0
+            for type_id, documentation_id in zip(entities.columns["type"], entities.columns["documentation"]):
+                if type_id in documentable_types:
+                    documentable += 1
+                    if documentation_id != empty_documentation:
+                        documented += 1
+            
+            # One SCC pass over the file import graph yields both cycles and depth
+            dependency_graph = analyze_dependency_graph(
+                self.build_import_graph(files, parse_result.get("relationships") or RelationshipTable())
+            )
             
             metrics = {
-                "total_files": 0,
-                "total_elements": 0,
-                "total_relationships": 0,
-                "complexity_distribution": {},
-                "language_distribution": {},
+                "total_files": len(files),
+                "total_elements": len(entities),
+                "total_relationships": len(parse_result.get("relationships") or ()),
+                "complexity_distribution": {
+                    "low": sum(1 for c in complexities if c <= 5.0),
+                    "medium": sum(1 for c in complexities if 5.0 < c <= 10.0),
+                    "high": sum(1 for c in complexities if c > 10.0)
+                },
+                "language_distribution": dict(collections.Counter(f["language"] for f in files)),
                 "dependency_metrics": {
-                    "circular_dependencies": [],
+                    "circular_dependencies": dependency_graph["cycles"],
+                    "dependency_depth": dependency_graph["depth"],
                     "orphaned_modules": [],
                     "core_modules": []
                 },
                 "quality_metrics": {
-                    "avg_complexity": 0.0,
-                    "max_complexity": 0.0,
-                    "documentation_coverage": 0.0,
+                    "avg_complexity": sum(complexities) / len(complexities) if complexities else 0.0,
+                    "max_complexity": max(complexities, default=0.0),
+                    "documentation_coverage": documented / documentable if documentable else 0.0,
                     "test_coverage": 0.0
                 }
             }
@@ -1004,14 +2407,48 @@ class CodeAnalyzerAgent:
                 "error": f"Metrics calculation failed: {str(e)}"
             }
     
-    def analyze_repository(self, repository_path: str, max_file_size: int = 10485760, include_ignored: bool = False, analysis_depth: str = "full") -> Dict[str, Any]:
-        """Main repository analysis function"""
+    def build_ccg_index(self, repository_path: str, repository_url: Optional[str] = None, commit: Optional[str] = None) -> Dict[str, Any]:
+        """Write the current element and relationship tables to the repository's CCG index
+        
+        The index is keyed by remote URL and commit (see CodeContextGraphIndex.repository_key),
+        not by the checkout path, so temporary checkouts of one commit share it.
+        """
+        if not self.ccg_index_enabled:
+            return {"status": "skipped", "message": "CCG index disabled"}
+        
+        try:
+            remote, commit = CodeContextGraphIndex.repository_key(repository_url or repository_path, commit)
+            if not commit and repository_url:
+                commit = CodeContextGraphIndex.repository_key(repository_path)[1]
+            index_path = CodeContextGraphIndex.index_path_for(self.cache_dir, remote, commit)
+            with CodeContextGraphIndex(index_path) as index:
+                stats = index.build(self.element_table, self.relationship_table, os.path.abspath(repository_path), remote, commit)
+            stats["evicted"] = CodeContextGraphIndex.evict(self.cache_dir, self.ccg_index_max_bytes, keep=index_path)
+            return {"status": "success", **stats}
+            
+        except (OSError, sqlite3.Error) as e:
+            return {
+                "status": "error",
+                "error": f"CCG index build failed: {str(e)}"
+            }
+    
+    def analyze_repository(self, repository_path: str, max_file_size: int = 10485760, include_ignored: bool = False, analysis_depth: str = "full", max_workers: Optional[int] = None, commit: Optional[str] = None, source_files: Optional[typing.Iterable[Tuple[str, str, str]]] = None, on_file_result: Optional[typing.Callable[[Dict[str, Any]], None]] = None, repository_url: Optional[str] = None) -> Dict[str, Any]:
+        """Main repository analysis function
+        
+        With commit, repository_path is a git directory (e.g. a bare mirror) and
+        that commit is analysed straight from the object database, without a checkout.
+        source_files and on_file_result are passed to parse_repository_files, so a
+        caller still walking the repository can stream files in and consume each
+        file's result as it is parsed. repository_url, if known, names the CCG index
+        (otherwise the origin URL is read from the repository).
+        """
         print("🔍 Code Analyzer Agent: Starting repository analysis...")
         
         self.repository_path = repository_path
         self.max_file_size = max_file_size
         self.include_ignored = include_ignored
         self.analysis_depth = analysis_depth
+        self.object_reader = GitObjectReader(repository_path, commit) if commit else None
         
         try:
             # Step 1: Initialize parsers
@@ -1028,23 +2465,66 @@ class CodeAnalyzerAgent:
             
             print(f"✅ Step 2: Module hierarchy constructed - {module_result['modules_created']} modules")
             
-            # Step 3: Parse and analyze files (simplified for now)
-            # In a full implementation, this would iterate through all files from Repository Mapper
+            # Step 3: Parse and analyze files
+            parse_result = self.parse_repository_files(repository_path, max_workers, source_files, on_file_result)
+            if parse_result["status"] == "error":
+                return {"error": "File parsing failed", "details": parse_result["error"]}
+            
+            print(f"✅ Step 3: Parsed {parse_result['files_parsed']}/{parse_result['files_discovered']} files using {parse_result['workers']} worker(s) - cache hits: {parse_result['cache'].get('hits', 0)}")
+            
+            # Keep the compact tables for in-process consumers; the result carries plain dicts
+            self.element_table = parse_result["entities"]
+            self.relationship_table = parse_result["relationships"]
             
             # Step 4: Calculate metrics
-            metrics_result = self.calculate_repository_metrics()
+            metrics_result = self.calculate_repository_metrics(parse_result)
             if metrics_result["status"] == "error":
                 return {"error": "Metrics calculation failed", "details": metrics_result["error"]}
             
-            print("✅ Step 3: Repository analysis completed")
+            print("✅ Step 4: Repository metrics calculated")
+            
+            # Step 5: Persist the code context graph for relationship queries
+            index_result = self.build_ccg_index(repository_path, repository_url, commit)
+            if index_result["status"] == "success":
+                print(f"✅ Step 5: CCG index built - {index_result['nodes']} nodes, {index_result['edges']} edges")
+            else:
+                print(f"⚠️ Step 5: CCG index not built: {index_result.get('error', index_result.get('message'))}")
+            
+            # Lazy spans are resolved here, once, so the result carries the source text
+            source_reader = SourceSpanReader(repository_path, commit=commit) if self.source_mode == "lazy" else None
+            try:
+                entities = parse_result["entities"].to_dicts(source_reader)
+                relationships = parse_result["relationships"].to_dicts(source_reader)
+            finally:
+                if source_reader is not None:
+                    source_reader.close()
             
             # Return comprehensive results
             final_result = {
                 "status": "success",
                 "repository_path": repository_path,
+                "commit": commit,
                 "parser_initialization": parser_result,
                 "module_hierarchy": module_result,
+                "parsing": {
+                    "files_discovered": parse_result["files_discovered"],
+                    "files_parsed": parse_result["files_parsed"],
+                    "files_failed": parse_result["files_failed"],
+                    "workers": parse_result["workers"],
+                    "errors": parse_result["errors"]
+                },
+                "parse_cache": parse_result["cache"],
+                "source_mode": self.source_mode,
+                "files": parse_result["files"],
+                "entities": entities,
+                "relationships": relationships,
+                "metadata": {
+                    "repository_name": os.path.basename(os.path.normpath(repository_path)),
+                    "total_files": parse_result["files_parsed"],
+                    "languages_detected": sorted({f["language"] for f in parse_result["files"]})
+                },
                 "metrics": metrics_result["metrics"],
+                "ccg_index": index_result,
                 "analysis_complete": True,
                 "timestamp": datetime.datetime.now().isoformat()
             }
@@ -1058,54 +2538,114 @@ class CodeAnalyzerAgent:
                 "status": "error",
                 "error": str(e)
             }
+        
+        finally:
+            if self.object_reader is not None:
+                self.object_reader.close()
+                self.object_reader = None
+
+## Parallel Parsing Workers
+# Each worker process builds its own CodeAnalyzerAgent once, in the pool initializer,
+# and reuses it for every file; grammars load into the worker's GRAMMAR_REGISTRY on
+# the first file of each language.
+_worker_agent: Optional[CodeAnalyzerAgent] = None
+
+def _init_parse_worker(analysis_depth: str, max_file_size: int, source_mode: str, git_dir: Optional[str] = None, commit: Optional[str] = None) -> None:
+    """Process pool initializer: create this worker's analyzer (with its own object reader for commits)"""
+    global _worker_agent
+    _worker_agent = CodeAnalyzerAgent()
+    _worker_agent.analysis_depth = analysis_depth
+    _worker_agent.max_file_size = max_file_size
+    _worker_agent.source_mode = source_mode
+    if commit:
+        _worker_agent.object_reader = GitObjectReader(git_dir, commit)
+
+def _parse_batch_worker(tasks: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+    """Process pool task: parse a batch of (absolute path or blob id, relative path, language) tuples"""
+    return [_worker_agent.parse_repository_file(*task) for task in tasks]
 
 ## API Functions for external use
-def analyze_repository_api(repository_path: str, max_file_size: int = 10485760, include_ignored: bool = False, analysis_depth: str = "full") -> Dict[str, Any]:
+def analyze_repository_api(repository_path: str, max_file_size: int = 10485760, include_ignored: bool = False, analysis_depth: str = "full", max_workers: Optional[int] = None, commit: Optional[str] = None, repository_url: Optional[str] = None) -> Dict[str, Any]:
     """API function for repository analysis"""
     analyzer = CodeAnalyzerAgent()
-    return analyzer.analyze_repository(repository_path, max_file_size, include_ignored, analysis_depth)
+    return analyzer.analyze_repository(repository_path, max_file_size, include_ignored, analysis_depth, max_workers, commit, repository_url=repository_url)
 
-def query_code_relationships(repository_path: str, query_type: str, element_name: str = "", element_type: str = "", max_results: int = 100) -> Dict[str, Any]:
-    """Query code relationships"""
+def query_code_relationships(repository_path: str, query_type: str, element_name: str = "", element_type: str = "", max_results: int = 100, cache_dir: Optional[str] = None, commit: Optional[str] = None) -> Dict[str, Any]:
+    """Query code relationships from the CCG index built by analyze_repository
+    
+    repository_path may also be the remote URL; without a commit (and without a
+    local checkout to read it from) the most recently built index is used.
+    """
     try:
-        # Query relationships based on type
-        if query_type == "dependencies":
-            # Find what this element depends on
-            result = {
-                "query_type": "dependencies",
-                "element_name": element_name,
-                "dependencies": [],  # Would query actual graph
-                "confidence_threshold": 0.7
-            }
-        elif query_type == "dependents":
-            # Find what depends on this element
-            result = {
-                "query_type": "dependents",
-                "element_name": element_name,
-                "dependents": [],  # Would query actual graph
-                "confidence_threshold": 0.7
-            }
-        elif query_type == "call_graph":
-            # Build call graph for a function/class
-            result = {
-                "query_type": "call_graph",
-                "element_name": element_name,
-                "callers": [],  # Would query actual graph
-                "callees": [],  # Would query actual graph
-                "complexity": 0.0
-            }
-        elif query_type == "inheritance":
-            # Find inheritance relationships
-            result = {
-                "query_type": "inheritance",
-                "element_name": element_name,
-                "superclasses": [],  # Would query actual graph
-                "subclasses": [],  # Would query actual graph
-                "depth": 0
+        cache_dir = cache_dir or os.environ.get("CODEBASE_GENIUS_CACHE_DIR", "/tmp/codebase_genius_cache")
+        index_path = CodeContextGraphIndex.find_index(cache_dir, repository_path, commit)
+        if index_path is None:
+            return {
+                "status": "error",
+                "error": "No code context graph index for this repository; run analyze_repository first"
             }
-        else:
+        os.utime(index_path)  # Recently queried indexes are evicted last
+        
+        if query_type not in ("dependencies", "dependents", "call_graph", "inheritance"):
             return {"error": f"Unknown query type: {query_type}"}
         
+        confidence_threshold = 0.7
+        with CodeContextGraphIndex(index_path) as index:
+            node_ids = index.find_nodes(element_name, element_type)
+            
+            # Query relationships based on type
+            if query_type == "dependencies":
+                # Find what this element depends on
+                result = {
+                    "query_type": "dependencies",
+                    "element_name": element_name,
+                    "dependencies": index.outgoing(node_ids, min_confidence=confidence_threshold, limit=max_results),
+                    "confidence_threshold": confidence_threshold
+                }
+            elif query_type == "dependents":
+                # Find what depends on this element
+                result = {
+                    "query_type": "dependents",
+                    "element_name": element_name,
+                    "dependents": index.incoming(node_ids, element_name, min_confidence=confidence_threshold, limit=max_results),
+                    "confidence_threshold": confidence_threshold
+                }
+            elif query_type == "call_graph":
+                # Build call graph for a function/class
+                nodes = index.nodes(node_ids)
+                result = {
+                    "query_type": "call_graph",
+                    "element_name": element_name,
+                    "callers": index.incoming(node_ids, element_name, ["calls"], limit=max_results),
+                    "callees": index.outgoing(node_ids, ["calls"], limit=max_results),
+                    "complexity": max((node["complexity"] or 0.0 for node in nodes.values()), default=0.0)
+                }
+            else:
+                # Find inheritance relationships, walking up the superclass chain
+                superclasses = []
+                frontier = node_ids
+                seen = set(node_ids)
+                depth = 0
+                while frontier and len(superclasses) < max_results:
+                    parents = index.outgoing(frontier, ["inherits"], limit=max_results)
+                    if not parents:
+                        break
+                    depth += 1
+                    superclasses.extend(dict(parent, level=depth) for parent in parents)
+                    frontier = [
+                        parent["resolved"]["node_id"] for parent in parents
+                        if parent["resolved"] and parent["resolved"]["node_id"] not in seen
+                    ]
+                    seen.update(frontier)
+                
+                result = {
+                    "query_type": "inheritance",
+                    "element_name": element_name,
+                    "superclasses": superclasses[:max_results],
+                    "subclasses": index.incoming(node_ids, element_name, ["inherits"], limit=max_results),
+                    "depth": depth
+                }
+        
         return {
             "status": "success",
             "query_result": result,
@@ -1125,7 +2665,7 @@ def code_analysis_health_check():
         "service": "Code Analyzer Agent",
         "status": "healthy",
         "timestamp": datetime.datetime.now().isoformat(),
-        "version": "1.0.0",
+        "version": ANALYZER_VERSION,
         "supported_languages": ["python", "javascript", "typescript", "java", "cpp", "c"],
         "tree_sitter_available": TREE_SITTER_AVAILABLE,
         "endpoints": [
@@ -3,14 +3,398 @@
 
 import json
 import datetime
+import os
 import pathlib
 import re
+import shutil
+import subprocess
+import sys
 import typing
 import collections
+import concurrent.futures
+import hashlib
+import itertools
+import threading
+import time
 import jinja2
 from graphviz import Digraph
 from typing import Dict, List, Optional, Any, Union
 
+# Modules shared by the agents live in agents/shared
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+from agents.shared.graph_analytics import analyze_dependency_graph
+
+## Documentation Templates
+# Built-in template sources; a file of the same name in DocGenieConfig.template_dir
+# overrides one. Templates are compiled once per process by get_template_environment.
+DEFAULT_TEMPLATES: Dict[str, str] = {
+    "overview.md": """# {{ repository_name }} - Codebase Analysis
+
+## Overview
+{{ overview_description }}
+
+**Repository**: {{ repository_url }}
+**Generated**: {{ generation_date }}
+**Analyzer**: {{ analyzer_version }}
+
+## Quick Statistics
+- **Total Files**: {{ total_files }}
+- **Total Entities**: {{ total_entities }}
+- **Total Relationships**: {{ total_relationships }}
+- **Average Complexity**: {{ avg_complexity }}
+
+## Architecture Overview
+{{ architecture_summary }}
+
+## High-Level Structure
+{{ structure_summary }}
+""",
+    
+    "api_reference.md": """# API Reference
+
+## Classes
+{% for class in classes %}
+### {{ class.name }}
+**File**: `{{ class.file_path }}` (lines {{ class.start_line }}-{{ class.end_line }})
+**Complexity**: {{ class.complexity }}
+
+{{ class.documentation if class.documentation else "No documentation available." }}
+
+#### Methods
+{% for method in class.methods %}
+- **{{ method.name }}** ({{ method.type }}) - Complexity: {{ method.complexity }}
+{% endfor %}
+
+#### Dependencies
+{% for dep in class.dependencies %}
+- {{ dep }}
+{% endfor %}
+
+---
+{% endfor %}
+
+## Functions
+{% for func in functions %}
+### {{ func.name }}
+**File**: `{{ func.file_path }}` (lines {{ func.start_line }}-{{ func.end_line }})
+**Complexity**: {{ func.complexity }}
+
+{{ func.documentation if func.documentation else "No documentation available." }}
+
+#### Parameters
+{% if func.parameters %}
+{% for param in func.parameters %}
+- **{{ param.name }}** ({{ param.type }}) - {{ param.description }}
+{% endfor %}
+{% else %}
+- No parameters documented
+{% endif %}
+
+#### Dependencies
+{% for dep in func.dependencies %}
+- {{ dep }}
+{% endfor %}
+
+---
+{% endfor %}
+""",
+    
+    "architecture.md": """# Architecture Analysis
+
+## System Components
+{{ components_summary }}
+
+## Dependency Graph
+{{ dependency_analysis }}
+
+## Complexity Analysis
+{{ complexity_summary }}
+
+## Design Patterns Detected
+{{ patterns_summary }}
+""",
+    
+    "examples.md": """# Usage Examples
+
+## Function Usage
+{% for func in functions %}
+### {{ func.name }}
+```{{ func.language or 'python' }}
+{{ func.example_code }}
+```
+
+**Context**: {{ func.example_context }}
+{% endfor %}
+
+## Class Usage
+{% for class in classes %}
+### {{ class.name }}
+```{{ class.language or 'python' }}
+{{ class.usage_example }}
+```
+
+**Context**: {{ class.usage_context }}
+{% endfor %}
+""",
+    
+    "module.md": """## Module `{{ module_path }}`
+**Language**: {{ language }}
+**Entities**: {{ entities | length }}
+
+{% for entity in entities %}
+### {{ entity.name }} ({{ entity.type }})
+**Lines**: {{ entity.start_line }}-{{ entity.end_line }} | **Complexity**: {{ entity.complexity }}
+
+{{ entity.documentation if entity.documentation else "No documentation available." }}
+{% endfor %}
+{% if imports %}
+#### Imports
+{% for target in imports %}
+- `{{ target }}`
+{% endfor %}
+{% endif %}
+{% if calls %}
+#### Calls
+{% for rel in calls %}
+- `{{ rel.from_entity }}` → `{{ rel.to_entity }}`
+{% endfor %}
+{% endif %}
+""",
+    
+    "documentation.html": """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ doc_title }}</title>
+    <style>
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; max-width: 1200px; margin: 0 auto; padding: 20px; line-height: 1.6; }
+        h1, h2, h3 { color: #2c3e50; }
+        pre { background: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto; }
+        code { background: #e9ecef; padding: 2px 5px; border-radius: 3px; }
+        .toc { background: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 30px; }
+        .citation { background: #e7f3ff; padding: 10px; border-left: 4px solid #007bff; margin: 10px 0; }
+        .section { margin-bottom: 40px; }
+    </style>
+</head>
+<body>
+    <h1>{{ doc_title }}</h1>
+    <div class="toc">
+        <h2>Table of Contents</h2>
+        <ul>
+        {% for section in sections %}
+            <li><a href="#{{ section.section_id }}">{{ section.title }}</a></li>
+        {% endfor %}
+        </ul>
+    </div>
+    
+    {% for section in sections %}
+    <div class="section" id="{{ section.section_id }}">
+        {% for line in section.lines() %}{{ line | replace('# ', '<h2>') | replace('## ', '<h3>') | replace('### ', '<h4>') | replace('**', '<strong>') | replace('**', '</strong>') }}{% if not loop.last %}<br>{% endif %}{% endfor %}
+    </div>
+    <hr>
+    {% endfor %}
+    
+    <div class="citation">
+        <h2>Citations</h2>
+        <p>This documentation was generated automatically. Cross-references are available for all documented entities.</p>
+    </div>
+</body>
+</html>
+        """
+}
+
+# Documentation template names by section key (see create_documentation_templates)
+TEMPLATE_NAMES: Dict[str, str] = {
+    "overview": "overview.md",
+    "api_reference": "api_reference.md",
+    "architecture": "architecture.md",
+    "examples": "examples.md",
+    "module": "module.md",
+    "html": "documentation.html"
+}
+
+DOCUMENT_WRITE_BUFFER = 1048576  # Bytes buffered per output file before a write to disk
+TEMPLATE_CACHE_DIR = os.environ.get("CODEBASE_GENIUS_TEMPLATE_CACHE_DIR", "/tmp/codebase_genius_template_cache")
+_template_environments: Dict[str, jinja2.Environment] = {}
+_template_environments_lock = threading.Lock()
+
+def get_template_environment(template_dir: str) -> jinja2.Environment:
+    """Shared Jinja2 environment for template_dir, with compiled templates cached on disk
+    
+    Templates are compiled on first use and then reused by every DocGenieAgent in
+    the process; the bytecode cache lets new processes skip compilation too.
+    Template files are only re-checked for changes outside production.
+    """
+    key = os.path.abspath(template_dir)
+    with _template_environments_lock:
+        environment = _template_environments.get(key)
+        if environment is None:
+            try:
+                os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+                bytecode_cache = jinja2.FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+            except OSError as e:
+                print(f"[DocGenie] Template bytecode cache unavailable: {e}")
+                bytecode_cache = None
+            environment = jinja2.Environment(
+                loader=jinja2.ChoiceLoader([
+                    jinja2.FileSystemLoader(key),
+                    jinja2.DictLoader(DEFAULT_TEMPLATES)
+                ]),
+                bytecode_cache=bytecode_cache,
+                auto_reload=os.environ.get("ENVIRONMENT", "development") != "production"
+            )
+            _template_environments[key] = environment
+        return environment
+
+## Diagram Rendering
+DIAGRAM_CACHE_DIR = os.environ.get("CODEBASE_GENIUS_DIAGRAM_CACHE_DIR", "/tmp/codebase_genius_diagram_cache")
+# Cached renders unused for DIAGRAM_CACHE_TTL_HOURS expire; beyond
+# DIAGRAM_CACHE_MAX_BYTES the least recently used are removed first
+DIAGRAM_CACHE_MAX_BYTES = int(os.environ.get("CODEBASE_GENIUS_DIAGRAM_CACHE_MAX_BYTES", "268435456"))  # 256MB
+DIAGRAM_CACHE_TTL_HOURS = int(os.environ.get("CODEBASE_GENIUS_DIAGRAM_CACHE_TTL_HOURS", "168"))
+DIAGRAM_TYPE_COLORS = {
+    'class': 'lightblue',
+    'function': 'lightgreen', 
+    'method': 'lightyellow',
+    'module': 'lightcoral',
+    'package': 'wheat',
+    'variable': 'lightgray'
+}
+DIAGRAM_EDGE_COLORS = {"calls": "blue", "imports": "green", "inherits": "red"}
+
+def summarize_graph(nodes: typing.Iterable[str], edges: typing.Iterable[typing.Tuple[str, str, str]], max_nodes: int) -> typing.Tuple[Dict[str, int], Dict[typing.Tuple[str, str, str], int]]:
+    """Reduce a labelled graph to at most max_nodes nodes
+    
+    The highest-degree half of the budget is kept as hubs; every other node is
+    collapsed into a cluster node per parent directory ("pkg/*"), and clusters
+    beyond the budget into a single "(other)" node. Returns the number of original
+    nodes behind each node and the count of original edges behind each
+    (source, target, label) edge; edges inside one node are dropped.
+    """
+    edges = list(edges)
+    degree = collections.Counter()
+    for source, target, _ in edges:
+        degree[source] += 1
+        degree[target] += 1
+    # Sorted, so the summary (and the DOT source hashed by render_diagram) does not
+    # depend on set iteration order, which changes with the hash seed
+    all_nodes = sorted(set(nodes).union(degree))
+    
+    if len(all_nodes) <= max_nodes:
+        mapping = {node: node for node in all_nodes}
+    else:
+        hubs = sorted(all_nodes, key=lambda node: (-degree[node], node))[:max(max_nodes // 2, 1)]
+        mapping = {node: node for node in hubs}
+        clusters = collections.defaultdict(list)
+        for node in all_nodes:
+            if node not in mapping:
+                clusters[f"{os.path.dirname(node) or '.'}/*"].append(node)
+        largest = sorted(clusters, key=lambda name: (-len(clusters[name]), name))
+        kept = max(max_nodes - len(hubs) - 1, 0)
+        for position, name in enumerate(largest):
+            for node in clusters[name]:
+                mapping[node] = name if position < kept else "(other)"
+    
+    weights = collections.Counter(mapping.values())
+    edge_counts = collections.Counter(
+        (mapping[source], mapping[target], label)
+        for source, target, label in edges
+        if mapping[source] != mapping[target]
+    )
+    return dict(weights), dict(edge_counts)
+
+def render_diagram(diagram: Digraph, output_path: str, diagram_format: str, timeout: float) -> str:
+    """Render diagram to output_path.<format> with the layout engine in a subprocess
+    
+    Output is cached in DIAGRAM_CACHE_DIR under a hash of the DOT source, so an
+    unchanged graph is linked from the cache instead of being laid out again.
+    Returns the rendered path, or "" if the engine is missing, fails or times out.
+    """
+    source = diagram.source
+    graph_hash = hashlib.sha256(f"{diagram.engine}\0{diagram_format}\0{source}".encode("utf-8")).hexdigest()
+    cached_file = os.path.join(DIAGRAM_CACHE_DIR, f"{graph_hash}.{diagram_format}")
+    output_file = f"{output_path}.{diagram_format}"
+    
+    # A failed render must not leave the previous run's diagram in place
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    
+    if os.path.exists(cached_file):
+        print(f"[DocGenie] Reusing cached diagram {graph_hash[:12]} for {output_file}")
+        try:
+            os.utime(cached_file)
+        except OSError:
+            pass
+    else:
+        partial_file = f"{cached_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(DIAGRAM_CACHE_DIR, exist_ok=True)
+            subprocess.run(
+                [diagram.engine, f"-T{diagram_format}", "-o", partial_file],
+                input=source.encode("utf-8"), capture_output=True, timeout=timeout, check=True
+            )
+            os.replace(partial_file, cached_file)
+        except subprocess.TimeoutExpired:
+            print(f"[DocGenie] Rendering {output_file} timed out after {timeout}s")
+            return ""
+        except subprocess.CalledProcessError as e:
+            print(f"[DocGenie] Rendering {output_file} failed: {e.stderr.decode('utf-8', 'replace').strip()}")
+            return ""
+        except OSError as e:
+            print(f"[DocGenie] Rendering {output_file} failed: {e}")
+            return ""
+        finally:
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+    
+    try:
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        try:
+            os.link(cached_file, output_file)
+        except OSError:
+            shutil.copyfile(cached_file, output_file)
+    except OSError as e:
+        print(f"[DocGenie] Could not write {output_file}: {e}")
+        return ""
+    return output_file
+
+def evict_diagram_cache(max_bytes: int = DIAGRAM_CACHE_MAX_BYTES, ttl_seconds: int = DIAGRAM_CACHE_TTL_HOURS * 3600) -> int:
+    """Remove expired cached renders, then least recently used ones until under max_bytes"""
+    now = time.time()
+    entries = []
+    try:
+        names = os.listdir(DIAGRAM_CACHE_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        # Partial renders belong to a running layout engine
+        if name.endswith('.tmp'):
+            continue
+        path = os.path.join(DIAGRAM_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for last_used, size, path in sorted(entries):
+        if now - last_used <= ttl_seconds and total <= max_bytes:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
 ## Configuration Class
 class DocGenieConfig:
     def __init__(self):
@@ -18,6 +402,8 @@ class DocGenieConfig:
         self.output_dir: str = "./outputs"
         self.diagram_enabled: bool = True
         self.diagram_format: str = "png"  # png, svg, pdf
+        self.diagram_max_nodes: int = 60  # larger graphs are aggregated and summarised
+        self.diagram_render_timeout: float = 120.0  # seconds per layout-engine run
         self.citation_style: str = "github"  # github, apa, ieee
         self.doc_structure: str = "comprehensive"  # comprehensive, summary, detailed
 
@@ -48,10 +434,44 @@ class DocumentationSection:
     def __init__(self):
         self.section_id: str = ""
         self.title: str = ""
-        self.content: str = ""
+        self._content: str = ""
+        # Or rendered only while the document is written: the template and its context
+        self.template: Optional[jinja2.Template] = None
+        self.context: Dict[str, Any] = {}
         self.order: int = 0
         self.section_type: str = ""  # overview, api, architecture, examples
         self.related_entities: List[str] = []
+    
+    @property
+    def content(self) -> str:
+        """The whole section text (rendered now if the section has a template)"""
+        return "".join(self.generate())
+    
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+        self.template = None
+    
+    def generate(self) -> typing.Iterator[str]:
+        """The section text in chunks, rendered from the template as they are consumed"""
+        if self.template is not None:
+            return self.template.generate(**self.context)
+        return iter([self._content])
+    
+    def lines(self) -> typing.Iterator[str]:
+        """The section text line by line, without line endings"""
+        pending = []
+        for chunk in self.generate():
+            *complete, rest = chunk.split("\n")
+            if complete:
+                complete[0] = "".join(pending) + complete[0]
+                yield from complete
+                pending = []
+            pending.append(rest)
+        yield "".join(pending)
+    
+    def has_content(self) -> bool:
+        return any(chunk.strip() for chunk in self.generate())
 
 class GeneratedDocument:
     def __init__(self):
@@ -61,6 +481,64 @@ class GeneratedDocument:
         self.citations: Dict[str, Any] = {}
         self.metadata: Dict[str, Any] = {}
 
+## Entity Index
+class EntityIndex:
+    """Entities of one documentation run, grouped once for every stage that slices them
+    
+    by_type keeps entities_map order; by_file lists each file's entities by start
+    line. methods maps each class id to the methods inside its line span (the
+    innermost class wins); a class without a usable span gets all methods in its file.
+    """
+    def __init__(self, entities_map: Dict[str, CodeEntity]):
+        self.entities: Dict[str, CodeEntity] = entities_map
+        self.by_type: Dict[str, List[CodeEntity]] = collections.defaultdict(list)
+        self.by_file: Dict[str, List[CodeEntity]] = collections.defaultdict(list)
+        self.by_complexity: Dict[str, List[CodeEntity]] = {"low": [], "medium": [], "high": []}
+        self.complexity_values: List[float] = []
+        self.methods: Dict[str, List[CodeEntity]] = {}
+        
+        for entity in entities_map.values():
+            self.by_type[entity.type].append(entity)
+            self.by_file[entity.file_path].append(entity)
+            if entity.complexity > 0:
+                self.complexity_values.append(entity.complexity)
+                if entity.complexity > 10.0:
+                    self.by_complexity["high"].append(entity)
+                elif entity.complexity > 5.0:
+                    self.by_complexity["medium"].append(entity)
+                else:
+                    self.by_complexity["low"].append(entity)
+        
+        for file_entities in self.by_file.values():
+            file_entities.sort(key=lambda e: (e.start_line, e.type != "class"))
+            self.index_methods(file_entities)
+    
+    def index_methods(self, file_entities: List[CodeEntity]):
+        """Attach methods to classes with one sweep over a file's entities in line order"""
+        open_classes: List[CodeEntity] = []
+        unbounded_classes: List[CodeEntity] = []
+        file_methods: List[CodeEntity] = []
+        
+        for entity in file_entities:
+            while open_classes and open_classes[-1].end_line < entity.start_line:
+                open_classes.pop()
+            if entity.type == "class":
+                self.methods[entity.entity_id] = []
+                if entity.end_line >= entity.start_line > 0:
+                    open_classes.append(entity)
+                else:
+                    unbounded_classes.append(entity)
+            elif entity.type == "method":
+                file_methods.append(entity)
+                if open_classes:
+                    self.methods[open_classes[-1].entity_id].append(entity)
+        
+        for cls in unbounded_classes:
+            self.methods[cls.entity_id] = list(file_methods)
+    
+    def of_type(self, entity_type: str) -> List[CodeEntity]:
+        return self.by_type.get(entity_type, [])
+
 ## DocGenie Agent Class
 class DocGenieAgent:
     def __init__(self):
@@ -68,6 +546,7 @@ class DocGenieAgent:
         self.repository_info: Dict[str, Any] = {}
         self.config: DocGenieConfig = DocGenieConfig()
         self.generated_doc: GeneratedDocument = GeneratedDocument()
+        self.entity_index: Optional[EntityIndex] = None
         
     def initialize_config(self):
         """Initialize documentation generation configuration"""
@@ -83,6 +562,8 @@ class DocGenieAgent:
             self.config.output_dir = user_config.get("output_dir", self.config.output_dir)
             self.config.diagram_enabled = user_config.get("diagram_enabled", self.config.diagram_enabled)
             self.config.diagram_format = user_config.get("diagram_format", self.config.diagram_format)
+            self.config.diagram_max_nodes = user_config.get("diagram_max_nodes", self.config.diagram_max_nodes)
+            self.config.diagram_render_timeout = user_config.get("diagram_render_timeout", self.config.diagram_render_timeout)
             self.config.citation_style = user_config.get("citation_style", self.config.citation_style)
             self.config.doc_structure = user_config.get("doc_structure", self.config.doc_structure)
         
@@ -111,23 +592,37 @@ class DocGenieAgent:
         # Convert entities to CodeEntity objects
         entities_map = {}
         for entity_data in entities_data:
-            entity = CodeEntity()
-            entity.entity_id = entity_data.get("id", "")
-            entity.name = entity_data.get("name", "")
-            entity.type = entity_data.get("type", "")
-            entity.file_path = entity_data.get("file_path", "")
-            entity.start_line = entity_data.get("start_line", 0)
-            entity.end_line = entity_data.get("end_line", 0)
-            entity.complexity = entity_data.get("complexity", 0.0)
-            entity.dependencies = entity_data.get("dependencies", [])
-            entity.dependents = entity_data.get("dependents", [])
-            entity.documentation = entity_data.get("documentation", "")
-            entity.source_code = entity_data.get("source_code", "")
+            entity = self.create_code_entity(entity_data)
             entities_map[entity.entity_id] = entity
         
-        print(f"[DocGenie] Processed {len(entities_map)} code entities")
+        # Group once; the API reference, architecture and citation stages reuse it
+        self.entity_index = EntityIndex(entities_map)
+        
+        print(f"[DocGenie] Processed {len(entities_map)} code entities across {len(self.entity_index.by_file)} files")
         return entities_map
     
+    def get_entity_index(self, entities_map: Dict[str, CodeEntity]) -> EntityIndex:
+        """Index built by analyze_code_entities, or a new one for a map from elsewhere"""
+        if self.entity_index is None or self.entity_index.entities is not entities_map:
+            self.entity_index = EntityIndex(entities_map)
+        return self.entity_index
+    
+    def create_code_entity(self, entity_data: dict) -> CodeEntity:
+        """Convert one CCG entity dict to a CodeEntity"""
+        entity = CodeEntity()
+        entity.entity_id = entity_data.get("id", "")
+        entity.name = entity_data.get("name", "")
+        entity.type = entity_data.get("type", "")
+        entity.file_path = entity_data.get("file_path", "")
+        entity.start_line = entity_data.get("start_line", 0)
+        entity.end_line = entity_data.get("end_line", 0)
+        entity.complexity = entity_data.get("complexity", 0.0)
+        entity.dependencies = entity_data.get("dependencies", [])
+        entity.dependents = entity_data.get("dependents", [])
+        entity.documentation = entity_data.get("documentation", "")
+        entity.source_code = entity_data.get("source_code", "")
+        return entity
+    
     def analyze_relationships(self) -> List[Relationship]:
         """Analyze entity relationships"""
         print("[DocGenie] Analyzing entity relationships...")
@@ -135,218 +630,161 @@ class DocGenieAgent:
         relationships_data = self.ccg_data.get("relationships", [])
         
         # Convert relationships to Relationship objects
-        relationships = []
-        for rel_data in relationships_data:
-            relationship = Relationship()
-            relationship.from_entity = rel_data.get("from", "")
-            relationship.to_entity = rel_data.get("to", "")
-            relationship.relationship_type = rel_data.get("type", "")
-            relationship.confidence = rel_data.get("confidence", 0.0)
-            relationship.context = rel_data.get("context", "")
-            relationships.append(relationship)
+        relationships = [self.create_relationship(rel_data) for rel_data in relationships_data]
         
         print(f"[DocGenie] Processed {len(relationships)} relationships")
         return relationships
     
-    def create_documentation_templates(self) -> Dict[str, str]:
-        """Create documentation templates"""
+    def create_relationship(self, rel_data: dict) -> Relationship:
+        """Convert one CCG relationship dict to a Relationship
+        
+        Accepts both "from"/"to" and the Code Analyzer's "source"/"target" keys.
+        """
+        relationship = Relationship()
+        relationship.from_entity = rel_data.get("from", rel_data.get("source")) or ""
+        relationship.to_entity = rel_data.get("to", rel_data.get("target")) or ""
+        relationship.relationship_type = rel_data.get("type", "")
+        relationship.confidence = rel_data.get("confidence", 0.0)
+        relationship.context = rel_data.get("context", "")
+        return relationship
+    
+    def create_documentation_templates(self) -> Dict[str, jinja2.Template]:
+        """Load the compiled documentation templates (see get_template_environment)"""
         print("[DocGenie] Creating documentation templates...")
         
-        templates = {
-            "overview": """# {{ repository_name }} - Codebase Analysis
-
-## Overview
-{{ overview_description }}
-
-**Repository**: {{ repository_url }}
-**Generated**: {{ generation_date }}
-**Analyzer**: {{ analyzer_version }}
-
-## Quick Statistics
-- **Total Files**: {{ total_files }}
-- **Total Entities**: {{ total_entities }}
-- **Total Relationships**: {{ total_relationships }}
-- **Average Complexity**: {{ avg_complexity }}
-
-## Architecture Overview
-{{ architecture_summary }}
-
-## High-Level Structure
-{{ structure_summary }}
-""",
-            
-            "api_reference": """# API Reference
-
-## Classes
-{% for class in classes %}
-### {{ class.name }}
-**File**: `{{ class.file_path }}` (lines {{ class.start_line }}-{{ class.end_line }})
-**Complexity**: {{ class.complexity }}
-
-{{ class.documentation if class.documentation else "No documentation available." }}
-
-#### Methods
-{% for method in class.methods %}
-- **{{ method.name }}** ({{ method.type }}) - Complexity: {{ method.complexity }}
-{% endfor %}
-
-#### Dependencies
-{% for dep in class.dependencies %}
-- {{ dep }}
-{% endfor %}
-
----
-{% endfor %}
-
-## Functions
-{% for func in functions %}
-### {{ func.name }}
-**File**: `{{ func.file_path }}` (lines {{ func.start_line }}-{{ func.end_line }})
-**Complexity**: {{ func.complexity }}
-
-{{ func.documentation if func.documentation else "No documentation available." }}
-
-#### Parameters
-{% if func.parameters %}
-{% for param in func.parameters %}
-- **{{ param.name }}** ({{ param.type }}) - {{ param.description }}
-{% endfor %}
-{% else %}
-- No parameters documented
-{% endif %}
-
-#### Dependencies
-{% for dep in func.dependencies %}
-- {{ dep }}
-{% endfor %}
-
----
-{% endfor %}
-""",
-            
-            "architecture": """# Architecture Analysis
-
-## System Components
-{{ components_summary }}
-
-## Dependency Graph
-{{ dependency_analysis }}
-
-## Complexity Analysis
-{{ complexity_summary }}
-
-## Design Patterns Detected
-{{ patterns_summary }}
-""",
-            
-            "examples": """# Usage Examples
-
-## Function Usage
-{% for func in functions %}
-### {{ func.name }}
-```{{ func.language or 'python' }}
-{{ func.example_code }}
-```
-
-**Context**: {{ func.example_context }}
-{% endfor %}
-
-## Class Usage
-{% for class in classes %}
-### {{ class.name }}
-```{{ class.language or 'python' }}
-{{ class.usage_example }}
-```
-
-**Context**: {{ class.usage_context }}
-{% endfor %}
-"""
-        }
+        environment = get_template_environment(self.config.template_dir)
+        templates = {key: environment.get_template(name) for key, name in TEMPLATE_NAMES.items()}
         
         print(f"[DocGenie] Created {len(templates)} documentation templates")
         return templates
     
-    def generate_architecture_diagram(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> str:
-        """Generate architecture diagram"""
-        if not self.config.diagram_enabled:
-            print("[DocGenie] Diagram generation disabled")
-            return ""
+    def build_module_section(self, module_path: str, language: str, entities: List[dict], relationships: List[dict]) -> DocumentationSection:
+        """Build the documentation section for one module from its own entities and relationships
         
-        print("[DocGenie] Generating architecture diagram...")
+        Needs nothing from the rest of the repository, so a pipeline can call it
+        as soon as each file has been analysed and pass the sections to
+        generate_documentation(module_sections=...).
+        """
+        template = get_template_environment(self.config.template_dir).get_template(TEMPLATE_NAMES["module"])
+        module_entities = sorted((self.create_code_entity(e) for e in entities), key=lambda e: e.start_line)
+        module_relationships = [self.create_relationship(r) for r in relationships]
+        
+        section = DocumentationSection()
+        section.section_id = "module-" + re.sub(r"[^a-z0-9]+", "-", module_path.lower()).strip("-")
+        section.title = f"Module {module_path}"
+        section.section_type = "module"
+        section.related_entities = [e.entity_id for e in module_entities]
+        section.content = template.render(
+            module_path=module_path,
+            language=language,
+            entities=module_entities,
+            imports=sorted({r.to_entity for r in module_relationships if r.relationship_type == "imports"}),
+            calls=[r for r in module_relationships if r.relationship_type == "calls"]
+        )
+        return section
+    
+    def build_architecture_diagram(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> Digraph:
+        """Build the architecture diagram
         
+        Up to diagram_max_nodes entities are drawn one node each. Larger repositories
+        are drawn per module (file), or per package (directory) if there are too many
+        modules, and then summarised with summarize_graph.
+        """
         # Create graphviz diagram
         diagram = Digraph(comment='Codebase Architecture')
         diagram.attr(rankdir='TB')
         diagram.attr('node', shape='box', style='rounded,filled')
-        
-        # Add entity nodes with color coding by type
-        type_colors = {
-            'class': 'lightblue',
-            'function': 'lightgreen', 
-            'method': 'lightyellow',
-            'module': 'lightcoral',
-            'variable': 'lightgray'
-        }
-        
-        for entity_id, entity in entities_map.items():
-            color = type_colors.get(entity.type, 'white')
-            label = f"{entity.name}\\n({entity.type})"
-            if entity.complexity > 5.0:
-                label += "\\n⚠️ High Complexity"
-            diagram.node(entity_id, label, fillcolor=color)
-        
-        # Add relationship edges
-        for relationship in relationships:
-            edge_attrs = {}
+        max_nodes = self.config.diagram_max_nodes
+        
+        # Only show high-confidence relationships
+        confident = [r for r in relationships if r.confidence > 0.7]
+        
+        if len(entities_map) <= max_nodes:
+            # Add entity nodes with color coding by type
+            for entity_id, entity in entities_map.items():
+                color = DIAGRAM_TYPE_COLORS.get(entity.type, 'white')
+                label = f"{entity.name}\\n({entity.type})"
+                if entity.complexity > 5.0:
+                    label += "\\n⚠️ High Complexity"
+                diagram.node(entity_id, label, fillcolor=color)
             
-            # Style edges by relationship type
-            if relationship.relationship_type == "calls":
-                edge_attrs['color'] = 'blue'
-                edge_attrs['label'] = 'calls'
-            elif relationship.relationship_type == "imports":
-                edge_attrs['color'] = 'green'
-                edge_attrs['label'] = 'imports'
-            elif relationship.relationship_type == "inherits":
-                edge_attrs['color'] = 'red'
-                edge_attrs['label'] = 'inherits'
+            # Add relationship edges, styled by relationship type
+            for relationship in confident:
+                diagram.edge(
+                    relationship.from_entity, relationship.to_entity,
+                    color=DIAGRAM_EDGE_COLORS.get(relationship.relationship_type, 'gray'),
+                    label=relationship.relationship_type
+                )
+            return diagram
+        
+        # Aggregate entities to their modules; endpoints that are neither an entity
+        # nor a known module (external imports, unresolved names) are left out
+        entity_index = self.get_entity_index(entities_map)
+        def module_of(endpoint):
+            entity = entities_map.get(endpoint)
+            if entity is not None:
+                return entity.file_path
+            return endpoint if endpoint in entity_index.by_file else None
+        
+        units = {path: len(entities) for path, entities in entity_index.by_file.items()}
+        edges = []
+        for relationship in confident:
+            source, target = module_of(relationship.from_entity), module_of(relationship.to_entity)
+            if source is not None and target is not None and source != target:
+                edges.append((source, target, relationship.relationship_type))
+        unit_type, unit_label = "module", "entities"
+        
+        if len(units) > max_nodes:
+            packages = collections.Counter()
+            for path in units:
+                packages[os.path.dirname(path) or "."] += 1
+            package_of = {path: os.path.dirname(path) or "." for path in units}
+            edges = [(package_of[s], package_of[t], label) for s, t, label in edges if package_of[s] != package_of[t]]
+            units = dict(packages)
+            unit_type, unit_label = "package", "modules"
+        
+        weights, edge_counts = summarize_graph(units, edges, max_nodes)
+        for node, weight in sorted(weights.items()):
+            members = units.get(node, weight)
+            label = f"{node}\\n({members} {unit_label if node in units else unit_type + 's'})"
+            if node in units:
+                diagram.node(node, label, fillcolor=DIAGRAM_TYPE_COLORS[unit_type])
             else:
-                edge_attrs['color'] = 'gray'
-                edge_attrs['label'] = relationship.relationship_type
-            
-            # Only show high-confidence relationships
-            if relationship.confidence > 0.7:
-                diagram.edge(relationship.from_entity, relationship.to_entity, **edge_attrs)
-        
-        # Render diagram
-        diagram_path = f"{self.config.output_dir}/architecture_diagram"
-        diagram.render(diagram_path, format=self.config.diagram_format, cleanup=True)
-        
-        print(f"[DocGenie] Architecture diagram saved to {diagram_path}.{self.config.diagram_format}")
-        return f"{diagram_path}.{self.config.diagram_format}"
+                diagram.node(node, label, fillcolor='white', style='rounded,dashed')
+        for (source, target, relationship_type), count in sorted(edge_counts.items()):
+            diagram.edge(
+                source, target,
+                color=DIAGRAM_EDGE_COLORS.get(relationship_type, 'gray'),
+                label=f"{relationship_type} ×{count}" if count > 1 else relationship_type
+            )
+        
+        print(f"[DocGenie] Architecture diagram summarised: {len(entities_map)} entities -> {len(weights)} {unit_type} nodes")
+        return diagram
     
-    def generate_call_graph(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> str:
-        """Generate call graph diagram"""
-        if not self.config.diagram_enabled:
-            print("[DocGenie] Call graph generation disabled")
-            return ""
-        
-        print("[DocGenie] Generating call graph diagram...")
+    def build_call_graph(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> Optional[Digraph]:
+        """Build the call graph diagram, or None if there are no call relationships
         
+        Only high-confidence calls are drawn. Above diagram_max_nodes functions the
+        calls are aggregated per module and summarised with summarize_graph.
+        """
         # Filter call relationships
         call_relationships = [r for r in relationships if r.relationship_type == "calls"]
         
         if not call_relationships:
             print("[DocGenie] No call relationships found for call graph")
-            return ""
+            return None
         
         # Create call graph
         call_graph = Digraph(comment='Function Call Graph')
         call_graph.attr(rankdir='LR')
         call_graph.attr('node', shape='ellipse', style='filled')
         
-        # Add function nodes
-        for relationship in call_relationships:
-            if relationship.confidence > 0.8:  # Only high-confidence calls
+        confident = [r for r in call_relationships if r.confidence > 0.8]  # Only high-confidence calls
+        endpoints = {r.from_entity for r in confident} | {r.to_entity for r in confident}
+        
+        if len(endpoints) <= self.config.diagram_max_nodes:
+            # Add function nodes
+            for relationship in confident:
                 from_entity = entities_map.get(relationship.from_entity)
                 to_entity = entities_map.get(relationship.to_entity)
                 
@@ -356,18 +794,67 @@ class DocGenieAgent:
                     call_graph.node(relationship.to_entity, to_entity.name)
                 
                 call_graph.edge(relationship.from_entity, relationship.to_entity)
+            return call_graph
+        
+        # Functions grouped by module; unknown callees stay as they are
+        def module_of(endpoint):
+            entity = entities_map.get(endpoint)
+            return entity.file_path if entity is not None else endpoint
+        
+        edges = [(module_of(r.from_entity), module_of(r.to_entity), "calls") for r in confident]
+        weights, edge_counts = summarize_graph((), edges, self.config.diagram_max_nodes)
+        for node, weight in sorted(weights.items()):
+            call_graph.node(node, f"{node}\\n({weight} modules)" if weight > 1 else node)
+        for (source, target, _), count in sorted(edge_counts.items()):
+            call_graph.edge(source, target, label=str(count) if count > 1 else "")
+        
+        print(f"[DocGenie] Call graph summarised: {len(endpoints)} functions -> {len(weights)} nodes")
+        return call_graph
+    
+    def generate_diagrams(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> Dict[str, str]:
+        """Build and render the architecture diagram and call graph concurrently
+        
+        Each render is its own layout-engine subprocess bounded by
+        diagram_render_timeout; a diagram that fails or times out maps to "".
+        """
+        if not self.config.diagram_enabled:
+            print("[DocGenie] Diagram generation disabled")
+            return {}
+        
+        print("[DocGenie] Generating architecture diagram and call graph...")
+        
+        diagrams = {
+            "architecture": (self.build_architecture_diagram(relationships, entities_map), "architecture_diagram"),
+            "call_graph": (self.build_call_graph(relationships, entities_map), "call_graph")
+        }
+        titles = {"architecture": "Architecture diagram", "call_graph": "Call graph"}
+        jobs = {name: job for name, job in diagrams.items() if job[0] is not None}
+        if not jobs:
+            return {}
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = {
+                name: pool.submit(render_diagram, diagram, f"{self.config.output_dir}/{file_stem}",
+                                  self.config.diagram_format, self.config.diagram_render_timeout)
+                for name, (diagram, file_stem) in jobs.items()
+            }
+            rendered = {name: future.result() for name, future in futures.items()}
         
-        # Render call graph
-        call_graph_path = f"{self.config.output_dir}/call_graph"
-        call_graph.render(call_graph_path, format=self.config.diagram_format, cleanup=True)
+        removed = evict_diagram_cache()
+        if removed:
+            print(f"[DocGenie] Evicted {removed} cached diagrams")
         
-        print(f"[DocGenie] Call graph saved to {call_graph_path}.{self.config.diagram_format}")
-        return f"{call_graph_path}.{self.config.diagram_format}"
+        for name, path in rendered.items():
+            if path:
+                print(f"[DocGenie] {titles[name]} saved to {path}")
+        return rendered
     
     def synthesize_documentation_sections(self, entities_map: Dict[str, CodeEntity], relationships: List[Relationship], templates: Dict[str, str]) -> GeneratedDocument:
         """Synthesize documentation sections"""
         print("[DocGenie] Synthesizing documentation sections...")
         
+        entity_index = self.get_entity_index(entities_map)
+        
         # Initialize generated document
         generated_doc = GeneratedDocument()
         
@@ -386,19 +873,18 @@ class DocGenieAgent:
         overview_section = DocumentationSection()
         overview_section.section_id = "overview"
         overview_section.title = "Repository Overview"
-        overview_section.content = ""
         overview_section.order = 1
         overview_section.section_type = "overview"
         overview_section.related_entities = list(entities_map.keys())
         
         # Calculate statistics
-        entity_types = collections.Counter(entity.type for entity in entities_map.values())
-        complexity_values = [entity.complexity for entity in entities_map.values() if entity.complexity > 0]
+        entity_types = {entity_type: len(entities) for entity_type, entities in entity_index.by_type.items()}
+        complexity_values = entity_index.complexity_values
         avg_complexity = sum(complexity_values) / len(complexity_values) if complexity_values else 0
         
-        # Generate overview content using template
-        template = jinja2.Template(templates["overview"])
-        overview_content = template.render(
+        # Overview content, rendered from the template when the document is written
+        overview_section.template = templates["overview"]
+        overview_section.context = dict(
             repository_name=generated_doc.title,
             repository_url=generated_doc.metadata["repository_url"],
             generation_date=generated_doc.metadata["generation_date"],
@@ -410,42 +896,37 @@ class DocGenieAgent:
             architecture_summary="Architecture analysis based on code relationships and complexity metrics.",
             structure_summary=f"Detected {len(entity_types)} entity types: {dict(entity_types)}"
         )
-        
-        overview_section.content = overview_content
         generated_doc.sections.append(overview_section)
         
         # Generate API reference section
         api_section = DocumentationSection()
         api_section.section_id = "api_reference"
         api_section.title = "API Reference"
-        api_section.content = ""
         api_section.order = 2
         api_section.section_type = "api"
-        api_section.related_entities = [eid for eid, e in entities_map.items() if e.type in ["class", "function", "method"]]
         
         # Categorize entities
-        classes = [e for e in entities_map.values() if e.type == "class"]
-        functions = [e for e in entities_map.values() if e.type == "function"]
-        methods = [e for e in entities_map.values() if e.type == "method"]
+        classes = entity_index.of_type("class")
+        functions = entity_index.of_type("function")
+        methods = entity_index.of_type("method")
+        api_section.related_entities = [e.entity_id for e in classes + functions + methods]
         
         # Add methods to classes
         for cls in classes:
-            cls.methods = [m for m in methods if m.file_path == cls.file_path]
+            cls.methods = entity_index.methods[cls.entity_id]
         
-        template = jinja2.Template(templates["api_reference"])
-        api_content = template.render(
+        # Covers every class and function, so it is never held as one string
+        api_section.template = templates["api_reference"]
+        api_section.context = dict(
             classes=classes,
             functions=functions
         )
-        
-        api_section.content = api_content
         generated_doc.sections.append(api_section)
         
         # Generate architecture section
         arch_section = DocumentationSection()
         arch_section.section_id = "architecture"
         arch_section.title = "Architecture Analysis"
-        arch_section.content = ""
         arch_section.order = 3
         arch_section.section_type = "architecture"
         arch_section.related_entities = list(entities_map.keys())
@@ -454,15 +935,13 @@ class DocGenieAgent:
         dependency_analysis = self.analyze_dependency_patterns(relationships, entities_map)
         complexity_summary = self.analyze_complexity_patterns(entities_map)
         
-        template = jinja2.Template(templates["architecture"])
-        arch_content = template.render(
+        arch_section.template = templates["architecture"]
+        arch_section.context = dict(
             components_summary=f"System contains {len(classes)} classes, {len(functions)} functions, and {len(methods)} methods.",
             dependency_analysis=dependency_analysis,
             complexity_summary=complexity_summary,
             patterns_summary="Design pattern detection analysis (TBD)"
         )
-        
-        arch_section.content = arch_content
         generated_doc.sections.append(arch_section)
         
         print(f"[DocGenie] Generated {len(generated_doc.sections)} documentation sections")
@@ -476,6 +955,7 @@ class DocGenieAgent:
         # Analyze dependency chains
         import_relationships = [r for r in relationships if r.relationship_type == "imports"]
         call_relationships = [r for r in relationships if r.relationship_type == "calls"]
+        dependency_graph = analyze_dependency_graph(self.build_dependency_graph(relationships, entities_map))
         
         analysis = f"""
 **Relationship Distribution**:
@@ -487,21 +967,22 @@ class DocGenieAgent:
 **Key Findings**:
 - Most imported modules: {self.get_most_imported_modules(import_relationships, entities_map)}
 - Most called functions: {self.get_most_called_functions(call_relationships, entities_map)}
-- Dependency depth: {self.calculate_dependency_depth(relationships, entities_map)}
+- Dependency depth: {dependency_graph["depth"]}
+- Circular dependencies: {len(dependency_graph["cycles"])}
 """
         
         return analysis
     
     def analyze_complexity_patterns(self, entities_map: Dict[str, CodeEntity]) -> str:
         """Analyze complexity patterns"""
-        complexity_values = [e.complexity for e in entities_map.values() if e.complexity > 0]
+        entity_index = self.get_entity_index(entities_map)
         
-        if not complexity_values:
+        if not entity_index.complexity_values:
             return "No complexity data available."
         
-        high_complexity = [e for e in entities_map.values() if e.complexity > 10.0]
-        medium_complexity = [e for e in entities_map.values() if 5.0 < e.complexity <= 10.0]
-        low_complexity = [e for e in entities_map.values() if 0 < e.complexity <= 5.0]
+        high_complexity = entity_index.by_complexity["high"]
+        medium_complexity = entity_index.by_complexity["medium"]
+        low_complexity = entity_index.by_complexity["low"]
         
         summary = f"""
 **Complexity Distribution**:
@@ -540,38 +1021,17 @@ class DocGenieAgent:
         top_calls = sorted(call_counts.items(), key=lambda x: x[1], reverse=True)[:5]
         return ", ".join([f"{name} ({count} calls)" for name, count in top_calls]) if top_calls else "None detected"
     
-    def calculate_dependency_depth(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> int:
-        """Calculate dependency depth"""
-        # Build dependency graph and calculate longest path
-        dependency_graph = collections.defaultdict(list)
-        
+    def build_dependency_graph(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> Dict[str, List[str]]:
+        """Import and call edges between known entities"""
+        dependency_graph = {entity_id: [] for entity_id in entities_map}
         for rel in relationships:
-            if rel.relationship_type in ["imports", "calls"]:
+            if rel.relationship_type in ["imports", "calls"] and rel.from_entity in entities_map and rel.to_entity in entities_map:
                 dependency_graph[rel.from_entity].append(rel.to_entity)
-        
-        # Calculate longest path using DFS
-        def dfs(node, visited, path_length):
-            if node in visited:
-                return path_length
-            
-            visited.add(node)
-            max_depth = path_length
-            
-            for neighbor in dependency_graph[node]:
-                if neighbor in entities_map:
-                    depth = dfs(neighbor, visited, path_length + 1)
-                    max_depth = max(max_depth, depth)
-            
-            return max_depth
-        
-        max_depth = 0
-        for entity_id in entities_map.keys():
-            if entity_id not in dependency_graph:
-                continue
-            depth = dfs(entity_id, set(), 0)
-            max_depth = max(max_depth, depth)
-        
-        return max_depth
+        return dependency_graph
+    
+    def calculate_dependency_depth(self, relationships: List[Relationship], entities_map: Dict[str, CodeEntity]) -> int:
+        """Calculate dependency depth (longest import/call chain, cycles counted once)"""
+        return analyze_dependency_graph(self.build_dependency_graph(relationships, entities_map))["depth"]
     
     def add_code_citations(self, generated_doc: GeneratedDocument, entities_map: Dict[str, CodeEntity], relationships: List[Relationship]):
         """Add code citations and cross-references"""
@@ -580,9 +1040,9 @@ class DocGenieAgent:
         # Build citation index
         citations = {}
         
-        # Add entity citations
-        for entity_id, entity in entities_map.items():
-            citations[entity_id] = {
+        # Add entity citations, grouped by file in line order
+        for entity in itertools.chain.from_iterable(self.get_entity_index(entities_map).by_file.values()):
+            citations[entity.entity_id] = {
                 "title": entity.name,
                 "type": entity.type,
                 "file_path": entity.file_path,
@@ -606,40 +1066,42 @@ class DocGenieAgent:
         print(f"[DocGenie] Added {len(citations)} citations and cross-references")
     
     def generate_final_document(self, generated_doc: GeneratedDocument) -> str:
-        """Generate final documentation document"""
+        """Generate final documentation document
+        
+        Written piece by piece through a buffered file handle, and template-backed
+        sections are rendered chunk by chunk into it, so memory does not grow with
+        the size of the sections or the number of citations.
+        """
         print("[DocGenie] Generating final documentation document...")
         
         # Ensure output directory exists
         pathlib.Path(self.config.output_dir).mkdir(parents=True, exist_ok=True)
         
-        # Combine all sections into final document
-        final_content = f"# {generated_doc.title}\\n\\n"
-        final_content += f"**Generated**: {generated_doc.metadata['generation_date']}\\n"
-        final_content += f"**Repository**: {generated_doc.metadata['repository_url']}\\n\\n"
-        
-        # Add table of contents
-        final_content += "## Table of Contents\\n\\n"
-        for section in sorted(generated_doc.sections, key=lambda x: x.order):
-            final_content += f"- [{section.title}](#{section.section_id})\\n"
-        final_content += "\\n---\\n\\n"
-        
-        # Add all sections
-        for section in sorted(generated_doc.sections, key=lambda x: x.order):
-            final_content += section.content
-            final_content += "\\n---\\n\\n"
-        
-        # Add citations section
-        final_content += "## Citations and References\\n\\n"
-        final_content += "This documentation includes cross-references to the following code entities:\\n\\n"
-        
-        entity_citations = {k: v for k, v in generated_doc.citations.items() if "->" not in k}
-        for entity_id, citation in entity_citations.items():
-            final_content += f"- **{citation['title']}** ({citation['type']}) - {citation['file_path']} ({citation['line_range']})\\n"
-        
-        # Save final document
+        sections = sorted(generated_doc.sections, key=lambda x: x.order)
         output_file = f"{self.config.output_dir}/documentation.md"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(final_content)
+        with open(output_file, 'w', encoding='utf-8', buffering=DOCUMENT_WRITE_BUFFER) as f:
+            f.write(f"# {generated_doc.title}\n\n")
+            f.write(f"**Generated**: {generated_doc.metadata['generation_date']}\n")
+            f.write(f"**Repository**: {generated_doc.metadata['repository_url']}\n\n")
+            
+            # Add table of contents
+            f.write("## Table of Contents\n\n")
+            f.writelines(f"- [{section.title}](#{section.section_id})\n" for section in sections)
+            f.write("\n---\n\n")
+            
+            # Add all sections, each rendered straight into the file
+            for section in sections:
+                f.writelines(section.generate())
+                f.write("\n---\n\n")
+            
+            # Add citations section
+            f.write("## Citations and References\n\n")
+            f.write("This documentation includes cross-references to the following code entities:\n\n")
+            f.writelines(
+                f"- **{citation['title']}** ({citation['type']}) - {citation['file_path']} ({citation['line_range']})\n"
+                for entity_id, citation in generated_doc.citations.items()
+                if "->" not in entity_id
+            )
         
         print(f"[DocGenie] Final documentation saved to {output_file}")
         return output_file
@@ -648,61 +1110,17 @@ class DocGenieAgent:
         """Generate HTML documentation"""
         print("[DocGenie] Generating HTML documentation...")
         
-        # Create HTML template
-        html_template = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ doc_title }}</title>
-    <style>
-        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; max-width: 1200px; margin: 0 auto; padding: 20px; line-height: 1.6; }
-        h1, h2, h3 { color: #2c3e50; }
-        pre { background: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto; }
-        code { background: #e9ecef; padding: 2px 5px; border-radius: 3px; }
-        .toc { background: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 30px; }
-        .citation { background: #e7f3ff; padding: 10px; border-left: 4px solid #007bff; margin: 10px 0; }
-        .section { margin-bottom: 40px; }
-    </style>
-</head>
-<body>
-    <h1>{{ doc_title }}</h1>
-    <div class="toc">
-        <h2>Table of Contents</h2>
-        <ul>
-        {% for section in sections %}
-            <li><a href="#{{ section.section_id }}">{{ section.title }}</a></li>
-        {% endfor %}
-        </ul>
-    </div>
-    
-    {% for section in sections %}
-    <div class="section" id="{{ section.section_id }}">
-        {{ section.content | replace('\\n', '<br>') | replace('# ', '<h2>') | replace('## ', '<h3>') | replace('### ', '<h4>') | replace('**', '<strong>') | replace('**', '</strong>') }}
-    </div>
-    <hr>
-    {% endfor %}
-    
-    <div class="citation">
-        <h2>Citations</h2>
-        <p>This documentation was generated automatically. Cross-references are available for all documented entities.</p>
-    </div>
-</body>
-</html>
-        """
-        
         # Render HTML
-        template = jinja2.Template(html_template)
-        html_content = template.render(
+        template = get_template_environment(self.config.template_dir).get_template(TEMPLATE_NAMES["html"])
+        html_stream = template.stream(
             doc_title=generated_doc.title,
             sections=generated_doc.sections
         )
         
-        # Save HTML file
+        # Save HTML file, writing rendered chunks as they are generated
         html_file = f"{self.config.output_dir}/documentation.html"
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with open(html_file, 'w', encoding='utf-8', buffering=DOCUMENT_WRITE_BUFFER) as f:
+            html_stream.dump(f)
         
         print(f"[DocGenie] HTML documentation saved to {html_file}")
         return html_file
@@ -717,7 +1135,7 @@ class DocGenieAgent:
             "has_overview": any(s.section_type == "overview" for s in generated_doc.sections),
             "has_api_reference": any(s.section_type == "api" for s in generated_doc.sections),
             "has_architecture": any(s.section_type == "architecture" for s in generated_doc.sections),
-            "sections_with_content": len([s for s in generated_doc.sections if s.content.strip()]),
+            "sections_with_content": sum(1 for s in generated_doc.sections if s.has_content()),
             "quality_score": 0.0
         }
         
@@ -734,8 +1152,12 @@ class DocGenieAgent:
         print(f"[DocGenie] Quality metrics: {quality_metrics}")
         return quality_metrics
     
-    def generate_documentation(self, ccg_data: dict, repository_info: dict, config: DocGenieConfig = None) -> dict:
-        """Main documentation generation function"""
+    def generate_documentation(self, ccg_data: dict, repository_info: dict, config: DocGenieConfig = None, module_sections: Optional[List[DocumentationSection]] = None) -> dict:
+        """Main documentation generation function
+        
+        module_sections, built earlier with build_module_section, are appended
+        after the repository-wide sections in the order given.
+        """
         print("🚀 DocGenie Agent: Starting documentation generation...")
         
         self.ccg_data = ccg_data
@@ -757,13 +1179,15 @@ class DocGenieAgent:
             # Step 4: Create documentation templates
             templates = self.create_documentation_templates()
             
-            # Step 5: Generate diagrams (if enabled)
-            if self.config.diagram_enabled:
-                self.generate_architecture_diagram(relationships, entities_map)
-                self.generate_call_graph(relationships, entities_map)
+            # Step 5: Generate diagrams (if enabled), rendered in parallel
+            diagram_paths = self.generate_diagrams(relationships, entities_map)
             
             # Step 6: Synthesize documentation sections
             generated_doc = self.synthesize_documentation_sections(entities_map, relationships, templates)
+            generated_doc.diagrams = [path for path in diagram_paths.values() if path]
+            for order, section in enumerate(module_sections or [], start=len(generated_doc.sections) + 1):
+                section.order = order
+                generated_doc.sections.append(section)
             
             # Step 7: Add citations and cross-references
             self.add_code_citations(generated_doc, entities_map, relationships)
@@ -9,7 +9,17 @@ import typing
 import os
 import stat
 import shutil
-from typing import Dict, List, Optional, Any, Union
+import subprocess
+import io
+import sys
+from typing import Dict, List, Optional, Any, Tuple, Union
+
+# Modules shared by the agents live in agents/shared
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+from agents.shared.git_objects import GitObjectReader
+from agents.shared.mirrors import COMMIT_HASH_PATTERN, MirrorStore, get_mirror_store
 
 try:
     import github
@@ -19,6 +29,170 @@ except ImportError:
     GITHUB_AND_GIT_AVAILABLE = False
     print("Warning: GitHub/Git libraries not available. Using basic file system operations.")
 
+## File Tree Settings
+# Global ignore list, in .gitignore syntax; the lowest-precedence ignore source
+IGNORE_PATTERNS = [
+    ".git", ".svn", ".hg",
+    "node_modules", "__pycache__", ".pytest_cache",
+    "target", "build", "dist", "out",
+    ".DS_Store", "Thumbs.db",
+    "*.pyc", "*.pyo", "*.pyd",
+    ".env", ".env.local", "secrets.txt"
+]
+
+# Version-control metadata is never walked, even with include_ignored
+VCS_DIRECTORIES = frozenset({".git", ".svn", ".hg"})
+
+# Files a partial clone checks out by default: sources the analyzer parses, plus the
+# README and ignore files the mapper reads (sparse-checkout --no-cone patterns)
+SPARSE_CHECKOUT_PATTERNS = [
+    "*.py", "*.pyw", "*.js", "*.jsx", "*.mjs", "*.cjs", "*.ts", "*.tsx",
+    "*.java", "*.cpp", "*.cc", "*.cxx", "*.hpp", "*.hxx", "*.c", "*.h",
+    "/README*", "/readme*", ".gitignore"
+]
+
+# README files summarized, in order of preference
+README_FILES = [
+    "README.md", "README.rst", "README.txt", "README",
+    "readme.md", "readme.rst", "readme.txt", "readme"
+]
+
+# Text files whose first characters can be previewed
+PREVIEW_EXTENSIONS = frozenset({
+    ".py", ".js", ".ts", ".java", ".cpp", ".c", ".h", ".md", ".txt",
+    ".yml", ".yaml", ".json", ".xml", ".html", ".css"
+})
+
+## Ignore Rules
+def compile_gitignore_pattern(line: str) -> Optional[Tuple["re.Pattern[str]", bool, bool]]:
+    """Translate one .gitignore line into (regex, negated, directory_only); None for blanks/comments
+    
+    The regex matches paths relative to the directory holding the pattern.
+    """
+    line = line.rstrip("\n").rstrip("\r")
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line or line.startswith("#"):
+        return None
+    
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A slash anywhere but the end anchors the pattern to its directory
+    anchored = "/" in line
+    line = line.lstrip("/")
+    
+    parts = []
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if line.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if line.startswith("**", i) and i + 2 == len(line):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            end = line.find("]", i + 2)
+            if end == -1:
+                parts.append("\\[")
+            else:
+                body = line[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif char == "\\" and i + 1 < len(line):
+            i += 1
+            parts.append(re.escape(line[i]))
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(prefix + "".join(parts) + "$", re.DOTALL), negated, directory_only
+
+class IgnoreMatcher:
+    """Compiled .gitignore-style matcher over repository-relative paths
+    
+    Rule sets are added in increasing precedence (global list, .git/info/exclude,
+    root .gitignore, then nested .gitignore files as they are found) and the
+    last matching rule wins, so '!' negations work as in git. A rule set without
+    negations is folded into one combined regex.
+    """
+    
+    def __init__(self):
+        # (base directory, rules, combined regex for all rules, combined regex for file rules)
+        self._rule_sets: List[Tuple[str, List[Tuple["re.Pattern[str]", bool, bool]], Any, Any]] = []
+    
+    @classmethod
+    def for_repository(cls, repository_path: str, global_patterns: Optional[List[str]] = None) -> "IgnoreMatcher":
+        """Matcher seeded with the global list, .git/info/exclude and the root .gitignore"""
+        matcher = cls()
+        matcher.add_patterns(IGNORE_PATTERNS if global_patterns is None else global_patterns)
+        matcher.add_file(os.path.join(repository_path, ".git", "info", "exclude"))
+        matcher.add_file(os.path.join(repository_path, ".gitignore"))
+        return matcher
+    
+    def add_patterns(self, lines: typing.Iterable[str], base: str = ""):
+        """Add a rule set whose patterns are relative to base (a repository-relative directory)"""
+        rules = [rule for rule in map(compile_gitignore_pattern, lines) if rule]
+        if not rules:
+            return
+        
+        combined = file_combined = None
+        if not any(negated for _, negated, _ in rules):
+            combined = re.compile("|".join(f"(?:{regex.pattern})" for regex, _, _ in rules), re.DOTALL)
+            file_patterns = [regex.pattern for regex, _, directory_only in rules if not directory_only]
+            file_combined = re.compile("|".join(f"(?:{pattern})" for pattern in file_patterns), re.DOTALL) if file_patterns else None
+        self._rule_sets.append((base, rules, combined, file_combined))
+    
+    def add_file(self, ignore_file: str, base: str = "") -> bool:
+        """Add the rules of an ignore file if it exists"""
+        try:
+            with open(ignore_file, 'r', encoding='utf-8', errors='ignore') as f:
+                self.add_patterns(f.readlines(), base)
+            return True
+        except OSError:
+            return False
+    
+    def is_ignored(self, relative_path: str, is_directory: bool = False) -> bool:
+        """Whether a repository-relative path (using '/' separators) is ignored"""
+        for base, rules, combined, file_combined in reversed(self._rule_sets):
+            if base:
+                if not relative_path.startswith(base + "/"):
+                    continue
+                path = relative_path[len(base) + 1:]
+            else:
+                path = relative_path
+            
+            if combined is not None:
+                regex = combined if is_directory else file_combined
+                if regex is not None and regex.match(path):
+                    return True
+                continue
+            
+            for regex, negated, directory_only in reversed(rules):
+                if directory_only and not is_directory:
+                    continue
+                if regex.match(path):
+                    return not negated
+        return False
+
 ## Data Classes for Repository Mapping
 class Repository:
     def __init__(self):
@@ -32,15 +206,109 @@ class Repository:
         self.repository_stats: Dict[str, Any] = {}
 
 class FileNode:
+    __slots__ = ("path", "name", "type", "size", "extension", "language_detected", "is_ignored",
+                 "content_preview", "absolute_path", "depth", "object_id", "object_reader")
+    
     def __init__(self):
-        self.path: str = ""
+        self.path: str = ""               # Path relative to the repository root
         self.name: str = ""
         self.type: str = ""  # 'file', 'directory'
         self.size: int = 0
         self.extension: str = ""
         self.language_detected: str = ""
         self.is_ignored: bool = False
-        self.content_preview: str = ""
+        self.content_preview: str = ""    # Filled by read_preview()
+        self.absolute_path: str = ""
+        self.depth: int = 0               # 0 for entries directly under the root
+        self.object_id: str = ""          # Blob id, for nodes read from a git object database
+        self.object_reader: Optional[GitObjectReader] = None
+    
+    def read_preview(self, max_chars: int = 1000) -> str:
+        """Read (once) the first max_chars characters of a text file"""
+        if not self.content_preview and self.type == "file" and self.extension in PREVIEW_EXTENSIONS:
+            try:
+                if self.object_reader is not None:
+                    content = io.BytesIO(self.object_reader.read_blob(self.object_id))
+                    self.content_preview = io.TextIOWrapper(content, encoding='utf-8', errors='ignore').read(max_chars)
+                else:
+                    with open(self.absolute_path, 'r', encoding='utf-8', errors='ignore') as f:
+                        self.content_preview = f.read(max_chars)
+            except (OSError, KeyError):
+                self.content_preview = "[Binary or unreadable file]"
+        return self.content_preview
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Entry in the generate_file_tree nested dict format (without children)"""
+        if self.type == "directory":
+            entry = {"type": "directory", "size": self.size, "children": {}}
+        else:
+            entry = {
+                "type": "file",
+                "size": self.size,
+                "extension": self.extension,
+                "language": self.language_detected,
+                "content_preview": self.content_preview
+            }
+        if self.is_ignored:
+            entry["ignored"] = True
+        return entry
+
+class FileTreeStats:
+    """Repository statistics accumulated while file nodes stream past"""
+    
+    def __init__(self):
+        self.file_count: int = 0
+        self.directory_count: int = 0
+        self.total_size: int = 0
+        self.language_distribution: Dict[str, int] = {}
+        self.ignored_count: int = 0
+    
+    def add(self, node: FileNode):
+        if node.is_ignored:
+            self.ignored_count += 1
+        if node.type == "directory":
+            self.directory_count += 1
+        else:
+            self.file_count += 1
+            self.total_size += node.size
+            language = node.language_detected
+            self.language_distribution[language] = self.language_distribution.get(language, 0) + 1
+    
+    def remove_entry(self, entry: Dict[str, Any]):
+        """Undo add() for one entry in the generate_file_tree dict format"""
+        if entry.get("ignored"):
+            self.ignored_count -= 1
+        if entry["type"] == "directory":
+            self.directory_count -= 1
+        else:
+            self.file_count -= 1
+            self.total_size -= entry["size"]
+            language = entry["language"]
+            remaining = self.language_distribution.get(language, 0) - 1
+            if remaining > 0:
+                self.language_distribution[language] = remaining
+            else:
+                self.language_distribution.pop(language, None)
+    
+    @classmethod
+    def from_dict(cls, statistics: Dict[str, Any]) -> "FileTreeStats":
+        stats = cls()
+        stats.file_count = statistics["total_files"]
+        stats.directory_count = statistics["total_directories"]
+        stats.total_size = statistics["total_size_bytes"]
+        stats.language_distribution = statistics["language_distribution"]
+        stats.ignored_count = statistics.get("total_ignored", 0)
+        return stats
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_files": self.file_count,
+            "total_directories": self.directory_count,
+            "total_size_bytes": self.total_size,
+            "language_distribution": self.language_distribution,
+            "total_ignored": self.ignored_count,
+            "generation_timestamp": datetime.datetime.now().isoformat()
+        }
 
 class RepoFile:
     def __init__(self):
@@ -54,6 +322,11 @@ class RepositoryMapperAgent:
         self.output_format: str = "json"
         self.max_file_size: int = 10485760  # 10MB default
         self.include_ignored: bool = False
+        self.ignore_patterns: List[str] = list(IGNORE_PATTERNS)  # Global list, before repository ignore files
+        self.clone_mode: str = "shallow"  # 'shallow', 'partial' (blob:none + sparse checkout) or 'full'
+        self.clone_ref: Optional[str] = None  # Branch, tag or commit; None for the remote default branch
+        self.use_mirror_cache: bool = True  # Serve clones from the shared MirrorStore
+        self.read_mode: str = "checkout"  # 'checkout' (working tree on disk) or 'objects' (GitObjectReader on the mirror)
     
     def validate_github_url(self, repository_url: str) -> Dict[str, Any]:
         """Validate GitHub repository URL format"""
@@ -69,29 +342,120 @@ class RepositoryMapperAgent:
             
         return {"status": "valid", "username": repo_match.group(1), "repository": repo_match.group(2)}
     
-    def clone_repository(self, repository_url: str) -> Dict[str, Any]:
-        """Clone the repository using GitPython"""
+    def sparse_checkout_patterns(self, sparse_paths: Optional[List[str]] = None) -> List[str]:
+        """Sparse-checkout patterns: whole directories if sparse_paths is given, else SPARSE_CHECKOUT_PATTERNS"""
+        if not sparse_paths:
+            return list(SPARSE_CHECKOUT_PATTERNS)
+        patterns = [f"/{path.strip('/')}/" for path in sparse_paths if path.strip('/')]
+        return patterns + ["/README*", "/readme*", "/.gitignore"]
+    
+    def checkout_from_mirror(self, repository_url: str, ref: Optional[str] = None, clone_mode: str = "shallow") -> Dict[str, Any]:
+        """Check the repository out as a worktree of its local mirror (see MirrorStore)"""
+        try:
+            checkout = get_mirror_store().checkout(repository_url, ref)
+            return {
+                "status": "success",
+                "clone_path": checkout["clone_path"],
+                "repository_info": {
+                    "name": MirrorStore.normalize_url(repository_url).split('/')[-1],
+                    "remote_url": repository_url,
+                    "commit_hash": checkout["commit_hash"],
+                    "branch": checkout["branch"],
+                    "ref": ref,
+                    "clone_mode": clone_mode,
+                    "mirror_path": checkout["mirror_path"]
+                }
+            }
+        
+        except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            if "Authentication" in str(e):
+                return {"error": "Authentication failed - repository may be private"}
+            return {"error": f"Mirror checkout failed: {str(e)}"}
+    
+    def snapshot_from_mirror(self, repository_url: str, ref: Optional[str] = None) -> Dict[str, Any]:
+        """Open ref's commit in the local mirror for object reads; nothing is checked out
+        
+        On success the result carries the GitObjectReader as "object_reader";
+        the caller closes it when done instead of calling cleanup_repository.
+        """
+        try:
+            reader = get_mirror_store().snapshot(repository_url, ref)
+            return {
+                "status": "success",
+                "clone_path": reader.git_dir,
+                "object_reader": reader,
+                "repository_info": {
+                    "name": MirrorStore.normalize_url(repository_url).split('/')[-1],
+                    "remote_url": repository_url,
+                    "commit_hash": reader.commit,
+                    "branch": reader.branch,
+                    "ref": ref,
+                    "read_mode": "objects",
+                    "mirror_path": reader.git_dir
+                }
+            }
+        
+        except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            if "Authentication" in str(e):
+                return {"error": "Authentication failed - repository may be private"}
+            return {"error": f"Mirror snapshot failed: {str(e)}"}
+    
+    def clone_repository(self, repository_url: str, ref: Optional[str] = None, clone_mode: Optional[str] = None, sparse_paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Clone the repository using GitPython
+        
+        clone_mode is 'shallow' (depth 1, the default), 'partial' (depth 1 with
+        --filter=blob:none and a --no-cone sparse checkout, so only blobs matched
+        by sparse_checkout_patterns are downloaded) or 'full'. ref may be a branch,
+        tag or commit hash; without one the remote's default branch is used.
+        With use_mirror_cache, 'shallow' and 'full' are served as worktrees of a
+        shared local mirror instead (checkout_from_mirror); the mirror is blobless,
+        so a first run downloads commits and trees plus only the checked-out blobs.
+        """
+        clone_mode = clone_mode or self.clone_mode
+        ref = ref or self.clone_ref
+        if self.use_mirror_cache and clone_mode != "partial":
+            return self.checkout_from_mirror(repository_url, ref, clone_mode)
+        
         try:
             if not GITHUB_AND_GIT_AVAILABLE:
                 return {"error": "GitPython not available. Please install with: pip install GitPython"}
+            if clone_mode not in ("shallow", "partial", "full"):
+                return {"error": f"Unknown clone mode: {clone_mode}"}
             
             # Create temporary directory for cloning
             temp_dir = f"/tmp/codebase_genius_{datetime.datetime.now().timestamp()}"
             
+            is_commit = bool(ref and COMMIT_HASH_PATTERN.fullmatch(ref))
+            clone_options: Dict[str, Any] = {}
+            if clone_mode != "full":
+                clone_options["depth"] = 1  # Shallow clone for performance
+                clone_options["single_branch"] = True
+            if clone_mode == "partial":
+                clone_options["filter"] = "blob:none"
+                clone_options["no_checkout"] = True
+            if ref and not is_commit:
+                clone_options["branch"] = ref
+            elif is_commit and clone_mode != "full":
+                # The commit is fetched on its own below
+                clone_options["no_checkout"] = True
+            
             # Clone repository
-            repo = git.Repo.clone_from(
-                repository_url,
-                temp_dir,
-                depth=1,  # Shallow clone for performance
-                single_branch=True,
-                branch="main"
-            )
-            
-            # If main branch doesn't exist, try master
-            if not repo.heads.main.exists():
-                if repo.heads.master.exists():
-                    repo.git.checkout("master")
-                    
+            repo = git.Repo.clone_from(repository_url, temp_dir, **clone_options)
+            
+            if clone_mode == "partial":
+                repo.git.sparse_checkout("set", "--no-cone", *self.sparse_checkout_patterns(sparse_paths))
+            
+            if is_commit:
+                if clone_mode == "full":
+                    repo.git.checkout(ref)
+                else:
+                    fetch_options = ["--depth=1"] + (["--filter=blob:none"] if clone_mode == "partial" else [])
+                    repo.git.fetch("origin", ref, *fetch_options)
+                    repo.git.checkout("--detach", "FETCH_HEAD")
+            elif clone_mode == "partial":
+                # Checking out the cloned branch fetches only the sparse blobs
+                repo.git.checkout(repo.head.reference.name)
+            
             return {
                 "status": "success",
                 "clone_path": temp_dir,
@@ -99,7 +463,9 @@ class RepositoryMapperAgent:
                     "name": repo.working_tree_dir.split('/')[-1],
                     "remote_url": repo.remotes.origin.url,
                     "commit_hash": repo.head.commit.hexsha,
-                    "branch": repo.active_branch.name
+                    "branch": None if repo.head.is_detached else repo.active_branch.name,
+                    "ref": ref,
+                    "clone_mode": clone_mode
                 }
             }
             
@@ -112,164 +478,310 @@ class RepositoryMapperAgent:
         except Exception as e:
             return {"error": f"Repository cloning failed: {str(e)}"}
     
-    def generate_file_tree(self, clone_path: str, max_file_size: int = 10485760) -> Dict[str, Any]:
-        """Generate comprehensive file tree structure"""
+    def _scan_directory(self, dir_path: str) -> List[os.DirEntry]:
         try:
-            # List of directories/files to ignore
-            ignore_patterns = [
-                ".git", ".svn", ".hg",
-                "node_modules", "__pycache__", ".pytest_cache",
-                "target", "build", "dist", "out",
-                ".DS_Store", "Thumbs.db",
-                "*.pyc", "*.pyo", "*.pyd",
-                ".env", ".env.local", "secrets.txt"
-            ]
+            with os.scandir(dir_path) as entries:
+                # Materialise so no directory handle stays open while the walk descends
+                return list(entries)
+        except OSError:
+            return []
+    
+    def iter_file_tree(self, clone_path: str, max_file_size: int = 10485760, stats: Optional[FileTreeStats] = None, include_previews: bool = False, include_ignored: Optional[bool] = None) -> typing.Iterator[FileNode]:
+        """Walk a repository with os.scandir, yielding FileNode records as they are found
+        
+        Nodes come in depth-first pre-order: a directory is followed by its contents.
+        Each entry is stat'ed once through the DirEntry cache and symlinked
+        directories are not followed. Paths matched by the IgnoreMatcher (global
+        list, .git/info/exclude, .gitignore files) are skipped, and ignored
+        directories are pruned without being listed, unless include_ignored is
+        set, in which case they are yielded with is_ignored=True. Previews are
+        only read when include_previews is set; otherwise FileNode.read_preview
+        loads them on demand. If stats is given it is updated with every yielded node.
+        """
+        if include_ignored is None:
+            include_ignored = self.include_ignored
+        matcher = IgnoreMatcher.for_repository(clone_path, self.ignore_patterns)
+        
+        stack = [(iter(self._scan_directory(clone_path)), "", 0, False)]
+        while stack:
+            entries, relative_dir, depth, parent_ignored = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
             
-            file_tree = {}
+            if entry.name in VCS_DIRECTORIES:
+                continue
             
-            def should_ignore(path_str):
-                name = os.path.basename(path_str)
-                for pattern in ignore_patterns:
-                    if pattern.startswith("*") and name.endswith(pattern[1:]):
-                        return True
-                    elif pattern == name:
-                        return True
-                return False
-            
-            def process_directory(dir_path, tree_dict):
-                if not os.path.isdir(dir_path):
-                    return
-                    
-                for item in os.listdir(dir_path):
-                    item_path = os.path.join(dir_path, item)
-                    
-                    if should_ignore(item_path):
-                        continue
-                        
-                    item_stat = os.stat(item_path)
-                    
-                    if os.path.isdir(item_path):
-                        # Process directory
-                        tree_dict[item] = {
-                            "type": "directory",
-                            "size": item_stat.st_size,
-                            "children": {}
-                        }
-                        process_directory(item_path, tree_dict[item]["children"])
-                    else:
-                        # Process file
-                        extension = os.path.splitext(item)[1].lower()
-                        language = self.detect_language_from_extension(extension)
-                        
-                        # Skip files larger than max_file_size
-                        if item_stat.st_size > max_file_size:
-                            continue
-                            
-                        # Read preview content for text files
-                        content_preview = ""
-                        if extension in [".py", ".js", ".ts", ".java", ".cpp", ".c", ".h", ".md", ".txt", ".yml", ".yaml", ".json", ".xml", ".html", ".css"]:
-                            try:
-                                with open(item_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                    content_preview = f.read(1000)  # First 1000 chars
-                            except:
-                                content_preview = "[Binary or unreadable file]"
-                        
-                        tree_dict[item] = {
-                            "type": "file",
-                            "size": item_stat.st_size,
-                            "extension": extension,
-                            "language": language,
-                            "content_preview": content_preview
-                        }
-            
-            def detect_language_from_extension(ext):
-                """Detect programming language from file extension"""
-                language_map = {
-                    ".py": "Python",
-                    ".js": "JavaScript",
-                    ".ts": "TypeScript",
-                    ".java": "Java",
-                    ".cpp": "C++",
-                    ".c": "C",
-                    ".h": "C/C++ Header",
-                    ".cc": "C++",
-                    ".cs": "C#",
-                    ".php": "PHP",
-                    ".rb": "Ruby",
-                    ".go": "Go",
-                    ".rs": "Rust",
-                    ".swift": "Swift",
-                    ".kt": "Kotlin",
-                    ".scala": "Scala",
-                    ".sh": "Shell",
-                    ".bat": "Batch",
-                    ".ps1": "PowerShell",
-                    ".html": "HTML",
-                    ".css": "CSS",
-                    ".scss": "SCSS",
-                    ".less": "LESS",
-                    ".vue": "Vue.js",
-                    ".jsx": "React JSX",
-                    ".tsx": "React TSX",
-                    ".md": "Markdown",
-                    ".txt": "Plain Text",
-                    ".yml": "YAML",
-                    ".yaml": "YAML",
-                    ".json": "JSON",
-                    ".xml": "XML",
-                    ".toml": "TOML",
-                    ".ini": "INI",
-                    ".cfg": "Configuration",
-                    ".conf": "Configuration"
-                }
-                return language_map.get(ext.lower(), "Unknown")
+            try:
+                is_directory = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
             
-            # Process the repository directory
-            process_directory(clone_path, file_tree)
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            is_ignored = parent_ignored or matcher.is_ignored(relative_path, is_directory)
+            if is_ignored and not include_ignored:
+                continue
             
-            # Calculate statistics
-            file_count = 0
-            directory_count = 0
-            total_size = 0
-            language_distribution = {}
+            try:
+                entry_stat = entry.stat()
+            except OSError:
+                continue
             
-            def calculate_stats(tree_dict, current_path=""):
-                nonlocal file_count, directory_count, total_size, language_distribution
-                
-                for name, item in tree_dict.items():
-                    current_item_path = os.path.join(current_path, name)
-                    
-                    if item["type"] == "directory":
-                        directory_count += 1
-                        calculate_stats(item["children"], current_item_path)
-                    else:
-                        file_count += 1
-                        total_size += item["size"]
-                        language = item["language"]
-                        if language in language_distribution:
-                            language_distribution[language] += 1
-                        else:
-                            language_distribution[language] = 1
-            
-            calculate_stats(file_tree)
-            
-            stats = {
-                "total_files": file_count,
-                "total_directories": directory_count,
-                "total_size_bytes": total_size,
-                "language_distribution": language_distribution,
-                "generation_timestamp": datetime.datetime.now().isoformat()
-            }
+            node = FileNode()
+            node.name = entry.name
+            node.path = relative_path
+            node.absolute_path = entry.path
+            node.size = entry_stat.st_size
+            node.depth = depth
+            node.is_ignored = is_ignored
+            
+            if is_directory:
+                node.type = "directory"
+            else:
+                # Skip files larger than max_file_size
+                if entry_stat.st_size > max_file_size:
+                    continue
+                node.type = "file"
+                node.extension = os.path.splitext(entry.name)[1].lower()
+                node.language_detected = self.detect_language_from_extension(node.extension)
+                if include_previews:
+                    node.read_preview()
+            
+            if stats is not None:
+                stats.add(node)
+            yield node
+            
+            if is_directory:
+                children = self._scan_directory(entry.path)
+                if not is_ignored and any(child.name == ".gitignore" for child in children):
+                    matcher.add_file(os.path.join(entry.path, ".gitignore"), relative_path)
+                stack.append((iter(children), relative_path, depth + 1, is_ignored))
+    
+    def iter_object_tree(self, object_reader: GitObjectReader, max_file_size: int = 10485760, stats: Optional[FileTreeStats] = None, include_previews: bool = False, include_ignored: Optional[bool] = None) -> typing.Iterator[FileNode]:
+        """iter_file_tree over a commit in a git object database instead of a working tree
+        
+        Nodes come in the same pre-order from a single `git ls-tree` listing.
+        Every .gitignore of the commit is applied (there is no
+        .git/info/exclude), directory sizes are 0, submodules appear as empty
+        directories and symlinks are not followed (a link's content is its target
+        path). Previews are read from blobs through object_reader.
+        """
+        if include_ignored is None:
+            include_ignored = self.include_ignored
+        entries = object_reader.entries()
+        
+        matcher = IgnoreMatcher()
+        matcher.add_patterns(self.ignore_patterns)
+        # ls-tree lists parents first, so outer ignore files get lower precedence
+        for path, _, object_type, object_id, _ in entries:
+            if object_type == "blob" and path.rpartition("/")[2] == ".gitignore":
+                content = object_reader.read_blob(object_id).decode('utf-8', errors='ignore')
+                matcher.add_patterns(content.splitlines(), path.rpartition("/")[0])
+        
+        ignored_directories = set()
+        pruned_directories = set()
+        for path, _, object_type, object_id, size in entries:
+            parent, _, name = path.rpartition("/")
+            is_directory = object_type != "blob"
+            if parent in pruned_directories or name in VCS_DIRECTORIES:
+                if is_directory:
+                    pruned_directories.add(path)
+                continue
+            
+            is_ignored = parent in ignored_directories or matcher.is_ignored(path, is_directory)
+            if is_ignored and not include_ignored:
+                if is_directory:
+                    pruned_directories.add(path)
+                continue
+            
+            node = FileNode()
+            node.name = name
+            node.path = path
+            node.depth = path.count("/")
+            node.is_ignored = is_ignored
+            
+            if is_directory:
+                node.type = "directory"
+                if is_ignored:
+                    ignored_directories.add(path)
+            else:
+                if size > max_file_size:
+                    continue
+                node.type = "file"
+                node.size = size
+                node.extension = os.path.splitext(name)[1].lower()
+                node.language_detected = self.detect_language_from_extension(node.extension)
+                node.object_id = object_id
+                node.object_reader = object_reader
+                if include_previews:
+                    node.read_preview()
+            
+            if stats is not None:
+                stats.add(node)
+            yield node
+    
+    def generate_file_tree(self, clone_path: str, max_file_size: int = 10485760, include_previews: bool = False, include_ignored: Optional[bool] = None, object_reader: Optional[GitObjectReader] = None, node_callback: Optional[typing.Callable[[FileNode], None]] = None) -> Dict[str, Any]:
+        """Generate comprehensive file tree structure
+        
+        Builds the nested dict and the statistics in a single iter_file_tree pass
+        (iter_object_tree if object_reader is given; clone_path is then unused).
+        content_preview is left empty unless include_previews is set; ignored
+        entries are only present (marked "ignored") with include_ignored.
+        node_callback, if given, is called with every FileNode as it is found, so
+        later stages can start on files before the walk has finished.
+        """
+        try:
+            file_tree = {}
+            stats = FileTreeStats()
+            # Children dict of each directory seen so far, by relative path
+            children_by_path = {"": file_tree}
+            
+            if object_reader is not None:
+                nodes = self.iter_object_tree(object_reader, max_file_size, stats, include_previews, include_ignored)
+            else:
+                nodes = self.iter_file_tree(clone_path, max_file_size, stats, include_previews, include_ignored)
+            for node in nodes:
+                if node_callback:
+                    node_callback(node)
+                entry = node.to_dict()
+                children_by_path[node.path.rpartition("/")[0]][node.name] = entry
+                if node.type == "directory":
+                    children_by_path[node.path] = entry["children"]
             
             return {
                 "status": "success",
                 "file_tree": file_tree,
-                "statistics": stats
+                "statistics": stats.to_dict()
             }
             
         except Exception as e:
             return {"error": f"File tree generation failed: {str(e)}"}
     
+    def patch_file_tree(self, file_tree_result: Dict[str, Any], object_reader: GitObjectReader, changes: List[Tuple[str, str]], max_file_size: int = 10485760, include_ignored: Optional[bool] = None) -> Dict[str, int]:
+        """Apply (status, path) changes from GitObjectReader.changed_paths to a generate_file_tree result in place
+        
+        Only changed paths are looked up: deleted files are removed (with any
+        directory left without tracked files), added and modified files are
+        re-described from object_reader's commit, and the statistics are
+        adjusted entry by entry. Ignore rules come from the global list and the
+        .gitignore files on the changed paths' ancestor chains, so changes to
+        .gitignore files themselves need a full rebuild instead.
+        """
+        if include_ignored is None:
+            include_ignored = self.include_ignored
+        tree = file_tree_result["file_tree"]
+        stats = FileTreeStats.from_dict(file_tree_result["statistics"])
+        
+        def children_of(directory: str) -> Optional[Dict[str, Any]]:
+            children = tree
+            for part in directory.split("/") if directory else ():
+                entry = children.get(part)
+                if entry is None or entry["type"] != "directory":
+                    return None
+                children = entry["children"]
+            return children
+        
+        def remove(children: Dict[str, Any], name: str):
+            removed = children.pop(name, None)
+            pending = [removed] if removed is not None else []
+            while pending:
+                entry = pending.pop()
+                stats.remove_entry(entry)
+                if entry["type"] == "directory":
+                    pending.extend(entry["children"].values())
+        
+        def ancestors(path: str) -> typing.Iterator[str]:
+            parent = path.rpartition("/")[0]
+            while parent:
+                yield parent
+                parent = parent.rpartition("/")[0]
+        
+        changes = [(status, path) for status, path in changes if not VCS_DIRECTORIES.intersection(path.split("/"))]
+        deleted = [path for status, path in changes if status == "D"]
+        updated = sorted(path for status, path in changes if status != "D")
+        added = sum(1 for status, _ in changes if status == "A")
+        
+        for path in deleted:
+            parent, _, name = path.rpartition("/")
+            children = children_of(parent)
+            if children is not None:
+                remove(children, name)
+        
+        # Directories exist in git only while they contain tracked files
+        emptied = sorted({directory for path in deleted for directory in ancestors(path)}, key=lambda d: d.count("/"))
+        remaining = object_reader.describe_paths(emptied)
+        for directory in emptied:
+            if remaining.get(directory, ("",))[0] != "tree":
+                parent, _, name = directory.rpartition("/")
+                children = children_of(parent)
+                if children is not None:
+                    remove(children, name)
+        
+        matcher = IgnoreMatcher()
+        matcher.add_patterns(self.ignore_patterns)
+        directories = sorted({directory for path in updated for directory in ancestors(path)}, key=lambda d: d.count("/"))
+        for directory in [""] + directories:
+            try:
+                content = object_reader.read_blob(f"{object_reader.commit}:{directory + '/' if directory else ''}.gitignore")
+                matcher.add_patterns(content.decode('utf-8', errors='ignore').splitlines(), directory)
+            except KeyError:
+                continue
+        
+        described = object_reader.describe_paths(updated)
+        for path in updated:
+            if path not in described:
+                continue
+            object_type, object_id, size = described[path]
+            
+            # Walk down to the parent directory, creating directories new in this commit
+            children = tree
+            parent_ignored = False
+            directory = ""
+            for part in path.split("/")[:-1]:
+                directory = f"{directory}/{part}" if directory else part
+                parent_ignored = parent_ignored or matcher.is_ignored(directory, True)
+                if parent_ignored and not include_ignored:
+                    children = None
+                    break
+                entry = children.get(part)
+                if entry is None or entry["type"] != "directory":
+                    if entry is not None:
+                        remove(children, part)
+                    node = FileNode()
+                    node.type = "directory"
+                    node.is_ignored = parent_ignored
+                    stats.add(node)
+                    entry = children[part] = node.to_dict()
+                children = entry["children"]
+            if children is None:
+                continue
+            
+            name = path.rpartition("/")[2]
+            is_directory = object_type != "blob"
+            is_ignored = parent_ignored or matcher.is_ignored(path, is_directory)
+            remove(children, name)
+            if (is_ignored and not include_ignored) or (not is_directory and size > max_file_size):
+                continue
+            
+            node = FileNode()
+            node.name = name
+            node.path = path
+            node.depth = path.count("/")
+            node.is_ignored = is_ignored
+            if is_directory:
+                node.type = "directory"
+            else:
+                node.type = "file"
+                node.size = size
+                node.extension = os.path.splitext(name)[1].lower()
+                node.language_detected = self.detect_language_from_extension(node.extension)
+            stats.add(node)
+            children[name] = node.to_dict()
+        
+        file_tree_result["statistics"] = stats.to_dict()
+        return {"added": added, "modified": len(updated) - added, "deleted": len(deleted)}
+    
     def detect_language_from_extension(self, ext: str) -> str:
         """Detect programming language from file extension"""
         language_map = {
@@ -312,18 +824,21 @@ class RepositoryMapperAgent:
         }
         return language_map.get(ext.lower(), "Unknown")
     
-    def summarize_readme(self, clone_path: str) -> Dict[str, Any]:
-        """Extract and summarize README files"""
+    def summarize_readme(self, clone_path: str, object_reader: Optional[GitObjectReader] = None) -> Dict[str, Any]:
+        """Extract and summarize README files (from object_reader's commit if given)"""
         try:
-            readme_files = [
-                "README.md", "README.rst", "README.txt", "README",
-                "readme.md", "readme.rst", "readme.txt", "readme"
-            ]
-            
             readme_content = ""
             readme_file_found = ""
             
-            for readme_name in readme_files:
+            for readme_name in README_FILES:
+                if object_reader is not None:
+                    try:
+                        readme_content = object_reader.read_text(readme_name)
+                        readme_file_found = readme_name
+                        break
+                    except (FileNotFoundError, KeyError, UnicodeDecodeError):
+                        continue
+                
                 readme_path = os.path.join(clone_path, readme_name)
                 if os.path.exists(readme_path):
                     try:
@@ -411,8 +926,10 @@ class RepositoryMapperAgent:
         return summary
     
     def cleanup_repository(self, clone_path: str) -> Dict[str, Any]:
-        """Clean up temporary repository directory"""
+        """Clean up temporary repository directory (or release its mirror worktree)"""
         try:
+            if os.path.exists(clone_path) and get_mirror_store().release(clone_path):
+                return {"status": "success", "message": "Repository worktree released"}
             if os.path.exists(clone_path):
                 shutil.rmtree(clone_path)
                 return {"status": "success", "message": "Repository cleaned up successfully"}
@@ -421,14 +938,20 @@ class RepositoryMapperAgent:
         except Exception as e:
             return {"status": "error", "message": f"Cleanup failed: {str(e)}"}
     
-    def map_repository(self, repository_url: str, output_format: str = "json", max_file_size: int = 10485760, include_ignored: bool = False) -> Dict[str, Any]:
-        """Main repository mapping function"""
+    def map_repository(self, repository_url: str, output_format: str = "json", max_file_size: int = 10485760, include_ignored: bool = False, ref: Optional[str] = None, clone_mode: Optional[str] = None, read_mode: Optional[str] = None) -> Dict[str, Any]:
+        """Main repository mapping function
+        
+        read_mode 'objects' maps the commit straight from the local mirror's
+        object database (see snapshot_from_mirror) instead of a checkout.
+        """
         print("🗺️ Repository Mapper Agent: Starting repository mapping...")
         
         self.repository_url = repository_url
         self.output_format = output_format
         self.max_file_size = max_file_size
         self.include_ignored = include_ignored
+        read_mode = read_mode or self.read_mode
+        object_reader = None
         
         try:
             # Step 1: Validate URL
@@ -438,30 +961,38 @@ class RepositoryMapperAgent:
             
             print("✅ Step 1: Repository URL validated successfully")
             
-            # Step 2: Clone repository
-            clone_result = self.clone_repository(repository_url)
+            # Step 2: Clone repository (or open its commit in the mirror)
+            if read_mode == "objects":
+                clone_result = self.snapshot_from_mirror(repository_url, ref)
+                object_reader = clone_result.pop("object_reader", None)
+            else:
+                clone_result = self.clone_repository(repository_url, ref, clone_mode)
             if "error" in clone_result:
                 return {"error": "Repository cloning failed", "details": clone_result["error"]}
             
             clone_path = clone_result["clone_path"]
-            print("✅ Step 2: Repository cloned successfully")
+            print("✅ Step 2: Repository cloned successfully" if object_reader is None else "✅ Step 2: Repository snapshot opened from mirror")
             
             # Step 3: Generate file tree
-            file_tree_result = self.generate_file_tree(clone_path, max_file_size)
+            file_tree_result = self.generate_file_tree(clone_path, max_file_size, include_ignored=include_ignored, object_reader=object_reader)
             if "error" in file_tree_result:
                 return {"error": "File tree generation failed", "details": file_tree_result["error"]}
             
             print("✅ Step 3: File tree generated successfully")
             
             # Step 4: Summarize README
-            readme_result = self.summarize_readme(clone_path)
+            readme_result = self.summarize_readme(clone_path, object_reader)
             if "error" in readme_result:
                 return {"error": "README summarization failed", "details": readme_result["error"]}
             
             print("✅ Step 4: README summarized successfully")
             
             # Step 5: Clean up
-            cleanup_result = self.cleanup_repository(clone_path)
+            if object_reader is not None:
+                object_reader.close()
+                object_reader = None
+            else:
+                cleanup_result = self.cleanup_repository(clone_path)
             
             # Return comprehensive results
             final_result = {
@@ -484,12 +1015,90 @@ class RepositoryMapperAgent:
                 "status": "error",
                 "error": str(e)
             }
+        
+        finally:
+            if object_reader is not None:
+                object_reader.close()
+
+    def remap_repository(self, repository_url: str, previous_result: Dict[str, Any], max_file_size: int = 10485760, include_ignored: bool = False, ref: Optional[str] = None) -> Dict[str, Any]:
+        """Bring a previous map_repository result up to date with ref's commit
+        
+        The commit is opened from the local mirror and compared with the
+        previous result's commit_hash using `git diff --name-status`; only the
+        changed paths are patched into the file tree and statistics (see
+        patch_file_tree), and the README is re-summarized only if it changed.
+        previous_result is updated in place and returned. Falls back to a full
+        map_repository (read_mode 'objects') when there is no usable previous
+        commit or a .gitignore file changed.
+        """
+        print("🗺️ Repository Mapper Agent: Starting incremental repository mapping...")
+        
+        previous_commit = (previous_result.get("cloning") or {}).get("repository_info", {}).get("commit_hash")
+        if previous_result.get("status") != "success" or not previous_commit:
+            print("⚠️ No previous commit to diff against, mapping the whole repository")
+            return self.map_repository(repository_url, max_file_size=max_file_size, include_ignored=include_ignored, ref=ref, read_mode="objects")
+        
+        self.repository_url = repository_url
+        self.max_file_size = max_file_size
+        self.include_ignored = include_ignored
+        
+        snapshot_result = self.snapshot_from_mirror(repository_url, ref)
+        if "error" in snapshot_result:
+            return {"error": "Repository cloning failed", "details": snapshot_result["error"]}
+        
+        object_reader = snapshot_result.pop("object_reader")
+        try:
+            try:
+                changes = object_reader.changed_paths(previous_commit)
+            except RuntimeError as e:
+                # e.g. the previous commit was force-pushed away
+                print(f"⚠️ Cannot diff against {previous_commit[:12]} ({e}), mapping the whole repository")
+                changes = None
+            if changes is None or any(path.rpartition("/")[2] == ".gitignore" for _, path in changes):
+                object_reader.close()
+                return self.map_repository(repository_url, max_file_size=max_file_size, include_ignored=include_ignored, ref=ref, read_mode="objects")
+            
+            print(f"✅ Step 1: {len(changes)} changed files since {previous_commit[:12]}")
+            
+            change_counts = self.patch_file_tree(previous_result["file_tree"], object_reader, changes, max_file_size, include_ignored)
+            print("✅ Step 2: File tree patched successfully")
+            
+            if any(path in README_FILES for _, path in changes):
+                readme_result = self.summarize_readme(object_reader.git_dir, object_reader)
+                if "error" in readme_result:
+                    return {"error": "README summarization failed", "details": readme_result["error"]}
+                previous_result["readme"] = readme_result
+                print("✅ Step 3: README summarized successfully")
+            
+            previous_result.update({
+                "cloning": snapshot_result,
+                "incremental": {"base_commit": previous_commit, **change_counts},
+                "timestamp": datetime.datetime.now().isoformat()
+            })
+            
+            print("🎉 Repository Mapper Agent: Incremental mapping completed successfully!")
+            return previous_result
+            
+        except Exception as e:
+            print(f"❌ Repository Mapper Agent: Incremental mapping failed: {e}")
+            return {
+                "status": "error",
+                "error": str(e)
+            }
+        
+        finally:
+            object_reader.close()
 
 ## API Functions for external use
-def map_repository_api(repository_url: str, output_format: str = "json", max_file_size: int = 10485760, include_ignored: bool = False) -> Dict[str, Any]:
+def map_repository_api(repository_url: str, output_format: str = "json", max_file_size: int = 10485760, include_ignored: bool = False, ref: Optional[str] = None, clone_mode: Optional[str] = None, read_mode: Optional[str] = None) -> Dict[str, Any]:
     """API function for repository mapping"""
     agent = RepositoryMapperAgent()
-    return agent.map_repository(repository_url, output_format, max_file_size, include_ignored)
+    return agent.map_repository(repository_url, output_format, max_file_size, include_ignored, ref, clone_mode, read_mode)
+
+def remap_repository_api(repository_url: str, previous_result: Dict[str, Any], max_file_size: int = 10485760, include_ignored: bool = False, ref: Optional[str] = None) -> Dict[str, Any]:
+    """API function for incremental re-mapping of a previous result"""
+    agent = RepositoryMapperAgent()
+    return agent.remap_repository(repository_url, previous_result, max_file_size, include_ignored, ref)
 
 def repository_mapper_health_check():
     """Health check for Repository Mapper Agent"""
@@ -0,0 +1,151 @@
+# Shared Git Object Access
+# Used by the Repository Mapper (tree walks, snapshots) and the Code Analyzer (parsing a commit)
+
+import io
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: leases are not enforced
+    fcntl = None
+
+class GitObjectReader:
+    """Read one commit's tree and blobs straight from a git object database
+    
+    The tree is listed once with `git ls-tree` and blob contents stream through a
+    single long-running `git cat-file --batch` process, so nothing is written to
+    disk. git_dir may be a bare mirror or any repository's .git directory. If
+    lease_path is given, a shared lock is held on it until close(), which keeps
+    MirrorStore.evict from deleting the mirror while it is being read.
+    """
+    
+    def __init__(self, git_dir: str, commit: str, branch: Optional[str] = None, lease_path: Optional[str] = None, git_timeout: int = 600):
+        self.git_dir = git_dir
+        self.commit = commit
+        self.branch = branch
+        self.git_timeout = git_timeout
+        # (path, mode, object type, object id, size) in ls-tree order: parents before their contents
+        self._entries: Optional[List[Tuple[str, str, str, str, int]]] = None
+        self._blob_ids: Dict[str, str] = {}
+        self._batch: Optional[subprocess.Popen] = None
+        self._batch_lock = threading.Lock()
+        self._lease = None
+        if lease_path:
+            self._lease = open(lease_path, "a")
+            if fcntl:
+                fcntl.flock(self._lease, fcntl.LOCK_SH)
+    
+    def entries(self) -> List[Tuple[str, str, str, str, int]]:
+        """Every tree, blob and submodule entry of the commit, recursively"""
+        if self._entries is None:
+            result = subprocess.run(
+                ["git", "-C", self.git_dir, "ls-tree", "-r", "-t", "-l", "-z", self.commit],
+                capture_output=True, timeout=self.git_timeout
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.decode(errors="replace").strip() or "git ls-tree failed")
+            
+            self._entries = []
+            for record in result.stdout.split(b"\0"):
+                if not record:
+                    continue
+                # "<mode> <type> <object id> <size>\t<path>"; size is "-" for trees and submodules
+                meta, _, raw_path = record.partition(b"\t")
+                mode, object_type, object_id, size = meta.decode().split()
+                path = raw_path.decode("utf-8", errors="surrogateescape")
+                self._entries.append((path, mode, object_type, object_id, int(size) if size.isdigit() else 0))
+                if object_type == "blob":
+                    self._blob_ids[path] = object_id
+        return self._entries
+    
+    def blob_id(self, path: str) -> Optional[str]:
+        self.entries()
+        return self._blob_ids.get(path)
+    
+    def read_blob(self, object_id: str) -> bytes:
+        """Content of a blob by object id"""
+        with self._batch_lock:
+            if self._batch is None or self._batch.poll() is not None:
+                self._batch = subprocess.Popen(
+                    ["git", "-C", self.git_dir, "cat-file", "--batch"],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+                )
+            self._batch.stdin.write(object_id.encode() + b"\n")
+            self._batch.stdin.flush()
+            # "<object id> <type> <size>\n<content>\n", or "<object id> missing\n"
+            header = self._batch.stdout.readline().split()
+            if len(header) != 3 or not header[2].isdigit():
+                raise KeyError(f"Object not found: {object_id}")
+            content = self._batch.stdout.read(int(header[2]))
+            self._batch.stdout.read(1)
+            return content
+    
+    def read_file(self, path: str) -> bytes:
+        """Content of a file of the commit by repository-relative path"""
+        object_id = self.blob_id(path)
+        if object_id is None:
+            raise FileNotFoundError(path)
+        return self.read_blob(object_id)
+    
+    def describe_paths(self, paths: List[str]) -> Dict[str, Tuple[str, str, int]]:
+        """(object type, object id, size) of each of paths that exists in the commit"""
+        if not paths:
+            return {}
+        specs = "".join(f"{self.commit}:{path}\n" for path in paths).encode("utf-8", errors="surrogateescape")
+        result = subprocess.run(
+            ["git", "-C", self.git_dir, "cat-file", "--batch-check"],
+            input=specs, capture_output=True, timeout=self.git_timeout
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors="replace").strip() or "git cat-file failed")
+        
+        described = {}
+        # One line per path: "<object id> <type> <size>", or "<name> missing"
+        for path, line in zip(paths, result.stdout.splitlines()):
+            fields = line.split()
+            if len(fields) == 3 and fields[2].isdigit():
+                described[path] = (fields[1].decode(), fields[0].decode(), int(fields[2]))
+        return described
+    
+    def changed_paths(self, since_commit: str) -> List[Tuple[str, str]]:
+        """(status letter, path) of every file that differs between since_commit and the commit
+        
+        Renames are reported as a delete plus an add. Raises RuntimeError if
+        since_commit is not in the object database.
+        """
+        result = subprocess.run(
+            ["git", "-C", self.git_dir, "diff", "--name-status", "--no-renames", "-z", since_commit, self.commit],
+            capture_output=True, timeout=self.git_timeout
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors="replace").strip() or "git diff failed")
+        
+        # "<status>\0<path>\0" per file
+        fields = result.stdout.split(b"\0")
+        return [
+            (fields[index].decode()[:1], fields[index + 1].decode("utf-8", errors="surrogateescape"))
+            for index in range(0, len(fields) - 1, 2)
+        ]
+    
+    def read_text(self, path: str, errors: str = "strict") -> str:
+        """Decode a file as UTF-8 with universal newlines, as open(path, 'r') would"""
+        return io.TextIOWrapper(io.BytesIO(self.read_file(path)), encoding="utf-8", errors=errors).read()
+    
+    def close(self):
+        if self._batch is not None:
+            self._batch.stdin.close()
+            self._batch.wait()
+            self._batch.stdout.close()
+            self._batch = None
+        if self._lease is not None:
+            # Closing the file drops the shared lock
+            self._lease.close()
+            self._lease = None
+    
+    def __enter__(self) -> "GitObjectReader":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,84 @@
+# Shared Graph Analytics
+# Cycle detection and dependency depth for the Code Analyzer's import graph and DocGenie's entity graph
+
+from typing import Any, Dict, List
+
+def strongly_connected_components(graph: Dict[str, List[str]]) -> List[List[str]]:
+    """Tarjan's algorithm with an explicit stack (no recursion limit on deep graphs)
+    
+    Nodes that only appear as edge targets are included. Components are returned
+    in reverse topological order: every component comes after all it points at.
+    """
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack = set()
+    components = []
+    
+    def visit(node):
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+    
+    for root in list(graph):
+        if root in index:
+            continue
+        visit(root)
+        work = [(root, iter(graph.get(root, ())))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    visit(neighbor)
+                    work.append((neighbor, iter(graph.get(neighbor, ()))))
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    
+    return components
+
+def analyze_dependency_graph(graph: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Cycles and longest dependency chain of a directed graph in O(V + E)
+    
+    Each strongly connected component is condensed to one node, so "depth" is the
+    number of edges on the longest path through the resulting DAG. "cycles" lists
+    the components with more than one node, or with a self-loop.
+    """
+    components = strongly_connected_components(graph)
+    component_of = {node: number for number, component in enumerate(components) for node in component}
+    depths = [0] * len(components)
+    cycles = []
+    
+    # Reverse topological order: successors' depths are final before they are read
+    for number, component in enumerate(components):
+        self_loop = False
+        for node in component:
+            for neighbor in graph.get(node, ()):
+                successor = component_of[neighbor]
+                if successor != number:
+                    depths[number] = max(depths[number], depths[successor] + 1)
+                elif neighbor == node:
+                    self_loop = True
+        if len(component) > 1 or self_loop:
+            cycles.append(sorted(component))
+    
+    return {
+        "nodes": len(component_of),
+        "components": len(components),
+        "cycles": sorted(cycles),
+        "depth": max(depths, default=0)
+    }
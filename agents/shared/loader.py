@@ -0,0 +1,39 @@
+# Agent Module Loader
+# The agent directories are hyphenated (repository-mapper, code-analyzer, ...), so
+# their main.py modules cannot be imported by package path and are loaded from file
+
+import importlib.util
+import os
+import sys
+import types
+from typing import Any
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_agent_module(agent_dir: str) -> types.ModuleType:
+    """Load agents/<agent_dir>/main.py once per process, as agents.<agent_dir with underscores>.main"""
+    module_name = f"agents.{agent_dir.replace('-', '_')}.main"
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(AGENTS_DIR, agent_dir, "main.py"))
+    if spec is None or spec.loader is None:
+        raise ImportError(f"No agent module in {agent_dir}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+def call_agent_function(agent_dir: str, function_name: str, *args: Any) -> Any:
+    """Call a module-level function of an agent by name
+    
+    Picklable stand-in for the function itself, for process pools: a worker
+    started by spawn or forkserver cannot import the agent module by its name,
+    but can import this one and load the agent from file.
+    """
+    return getattr(load_agent_module(agent_dir), function_name)(*args)
@@ -0,0 +1,298 @@
+# Shared Local Mirror Store
+# Bare mirrors of remote repositories, used by the Repository Mapper and the API frontend
+
+import contextlib
+import datetime
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: mirror locking is process-local only
+    fcntl = None
+
+from agents.shared.git_objects import GitObjectReader
+
+# Refs given as 7-40 hex digits are treated as commit hashes
+COMMIT_HASH_PATTERN = re.compile(r'[0-9a-fA-F]{7,40}')
+MIRROR_DIR = os.environ.get("CODEBASE_GENIUS_MIRROR_DIR", "/tmp/codebase_genius_mirrors")
+MIRROR_MAX_BYTES = int(os.environ.get("CODEBASE_GENIUS_MIRROR_MAX_BYTES", "5368709120"))  # 5GB
+MIRROR_MAX_AGE_HOURS = int(os.environ.get("CODEBASE_GENIUS_MIRROR_MAX_AGE_HOURS", "168"))  # 7 days
+
+class MirrorStore:
+    """Shared store of bare mirrors of remote repositories, keyed by remote URL
+    
+    checkout() fetches the remote into its mirror (a blobless clone of the
+    branches and tags the first time, an incremental fetch afterwards) and adds a
+    detached worktree for the requested ref, which fetches the blobs it checks
+    out; release() removes the worktree again. snapshot() instead fetches the
+    commit's blobs in one batch and opens a GitObjectReader on it, for reads
+    without any checkout. Mirrors that have not
+    been used for max_age_seconds are evicted, then the least recently used ones
+    until the store fits in max_bytes. Mirrors with live worktrees or open
+    readers are never evicted. A per-mirror lock file serialises git operations across processes.
+    Defaults come from CODEBASE_GENIUS_MIRROR_DIR, _MAX_BYTES and _MAX_AGE_HOURS.
+    """
+    
+    def __init__(self, root_dir: Optional[str] = None, max_bytes: int = MIRROR_MAX_BYTES, max_age_seconds: int = MIRROR_MAX_AGE_HOURS * 3600, git_timeout: int = 600):
+        self.root_dir = root_dir or MIRROR_DIR
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.git_timeout = git_timeout
+        os.makedirs(self.root_dir, exist_ok=True)
+    
+    @staticmethod
+    def normalize_url(repository_url: str) -> str:
+        url = repository_url.strip().rstrip("/")
+        return url[:-4] if url.endswith(".git") else url
+    
+    def mirror_path(self, repository_url: str) -> str:
+        key = hashlib.sha1(self.normalize_url(repository_url).lower().encode()).hexdigest()
+        return os.path.join(self.root_dir, f"{key}.git")
+    
+    @contextlib.contextmanager
+    def _locked(self, mirror_path: str):
+        with open(f"{mirror_path}.lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                # The lock file's mtime records when the mirror was last used
+                os.utime(lock_file.name)
+    
+    def _git(self, *args: str, input: Optional[str] = None) -> str:
+        result = subprocess.run(["git", *args], input=input, capture_output=True, text=True, timeout=self.git_timeout)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+        return result.stdout.strip()
+    
+    def has_mirror(self, repository_url: str) -> bool:
+        return os.path.isdir(self.mirror_path(repository_url))
+    
+    def update(self, repository_url: str) -> str:
+        """Create or fetch the mirror for a URL and return its path (caller holds no lock)"""
+        mirror_path = self.mirror_path(repository_url)
+        with self._locked(mirror_path):
+            self._update_locked(repository_url, mirror_path)
+        return mirror_path
+    
+    @contextlib.contextmanager
+    def leased(self, repository_url: str, ref: Optional[str] = None):
+        """Create or fetch the mirror and yield its path with a reader lease held
+        
+        For callers that read the mirror directly (e.g. `git clone file://<mirror>`):
+        the blobs of ref's commit (default: the remote HEAD) are fetched first, and
+        evict() leaves the mirror alone until the block exits.
+        """
+        mirror_path = self.mirror_path(repository_url)
+        with open(f"{mirror_path}.readers", "a") as lease_file:
+            with self._locked(mirror_path):
+                self._update_locked(repository_url, mirror_path)
+                commit, _ = self._resolve_locked(mirror_path, ref)
+                self._prefetch_locked(mirror_path, commit)
+                # Taken under the mirror lock, so eviction cannot slip in before the lease
+                if fcntl:
+                    fcntl.flock(lease_file, fcntl.LOCK_SH)
+            try:
+                yield mirror_path
+            finally:
+                if fcntl:
+                    fcntl.flock(lease_file, fcntl.LOCK_UN)
+        self.evict(keep=mirror_path)
+    
+    def _update_locked(self, repository_url: str, mirror_path: str):
+        if os.path.isdir(mirror_path):
+            self._git("-C", mirror_path, "fetch", "--prune", "origin")
+        else:
+            partial_path = f"{mirror_path}.partial"
+            shutil.rmtree(partial_path, ignore_errors=True)
+            # Branches and tags only: a --mirror clone would also take every pull
+            # request ref. Blobs are fetched per commit as checkouts need them.
+            self._git("clone", "--bare", "--filter=blob:none", repository_url, partial_path)
+            self._git("-C", partial_path, "config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+            self._git("-C", partial_path, "config", "--add", "remote.origin.fetch", "+refs/tags/*:refs/tags/*")
+            # Objects are borrowed by worktrees; never prune them behind their back
+            self._git("-C", partial_path, "config", "gc.auto", "0")
+            os.rename(partial_path, mirror_path)
+    
+    def _prefetch_locked(self, mirror_path: str, commit: str):
+        """Fetch the blobs of commit's tree that the mirror lacks, in one request
+        
+        Otherwise every blob read through the object database (git cat-file, ls-tree -l)
+        would be fetched from the remote on its own.
+        """
+        listing = self._git("-C", mirror_path, "rev-list", "--objects", "--no-walk", "--missing=print", commit)
+        missing = [line[1:] for line in listing.splitlines() if line.startswith("?")]
+        if missing:
+            self._git(
+                "-C", mirror_path, "-c", "fetch.negotiationAlgorithm=noop", "fetch", "origin",
+                "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none", "--stdin",
+                input="\n".join(missing) + "\n"
+            )
+    
+    def checkout(self, repository_url: str, ref: Optional[str] = None, destination: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch the mirror and add a detached worktree at ref (default: the remote HEAD)"""
+        mirror_path = self.mirror_path(repository_url)
+        destination = destination or f"/tmp/codebase_genius_{datetime.datetime.now().timestamp()}"
+        
+        with self._locked(mirror_path):
+            self._update_locked(repository_url, mirror_path)
+            commit, branch = self._resolve_locked(mirror_path, ref)
+            self._git("-C", mirror_path, "worktree", "add", "--detach", destination, commit)
+        
+        self.evict(keep=mirror_path)
+        return {
+            "clone_path": destination,
+            "mirror_path": mirror_path,
+            "commit_hash": commit,
+            "branch": branch
+        }
+    
+    def snapshot(self, repository_url: str, ref: Optional[str] = None) -> GitObjectReader:
+        """Fetch the mirror and open a GitObjectReader on ref's commit, without a checkout
+        
+        The reader holds a lease on the mirror until it is closed.
+        """
+        mirror_path = self.mirror_path(repository_url)
+        with self._locked(mirror_path):
+            self._update_locked(repository_url, mirror_path)
+            commit, branch = self._resolve_locked(mirror_path, ref)
+            self._prefetch_locked(mirror_path, commit)
+            # Taken under the mirror lock, so eviction cannot slip in before the lease
+            reader = GitObjectReader(mirror_path, commit, branch, f"{mirror_path}.readers", self.git_timeout)
+        
+        self.evict(keep=mirror_path)
+        return reader
+    
+    def _resolve_locked(self, mirror_path: str, ref: Optional[str]) -> Tuple[str, Optional[str]]:
+        """(commit hash, branch name or None) of ref, default the remote HEAD"""
+        target = ref or "HEAD"
+        try:
+            commit = self._git("-C", mirror_path, "rev-parse", "--verify", f"{target}^{{commit}}")
+        except RuntimeError:
+            if not ref:
+                raise
+            # Commits outside the mirrored refs (e.g. from pull requests) are fetched explicitly
+            self._git("-C", mirror_path, "fetch", "origin", ref)
+            commit = self._git("-C", mirror_path, "rev-parse", "--verify", "FETCH_HEAD^{commit}")
+        if not ref:
+            branch = self._git("-C", mirror_path, "symbolic-ref", "--short", "HEAD")
+        else:
+            branch = None if COMMIT_HASH_PATTERN.fullmatch(ref) else ref
+        return commit, branch
+    
+    def owns(self, checkout_path: str) -> Optional[str]:
+        """Mirror path a worktree was checked out from, or None if it is not one of ours"""
+        git_file = os.path.join(checkout_path, ".git")
+        if not os.path.isfile(git_file):
+            return None
+        with open(git_file, 'r', encoding='utf-8') as f:
+            gitdir = f.read().strip().partition("gitdir:")[2].strip()
+        # <mirror>/worktrees/<name>
+        mirror_path = os.path.dirname(os.path.dirname(gitdir))
+        if os.path.dirname(os.path.abspath(mirror_path)) != os.path.abspath(self.root_dir):
+            return None
+        return mirror_path
+    
+    def release(self, checkout_path: str) -> bool:
+        """Remove a worktree created by checkout(); False if the path is not one"""
+        mirror_path = self.owns(checkout_path)
+        if mirror_path is None:
+            return False
+        with self._locked(mirror_path):
+            try:
+                self._git("-C", mirror_path, "worktree", "remove", "--force", checkout_path)
+            except RuntimeError:
+                shutil.rmtree(checkout_path, ignore_errors=True)
+                self._git("-C", mirror_path, "worktree", "prune")
+        return True
+    
+    def _has_live_worktrees(self, mirror_path: str) -> bool:
+        # Entries whose checkout directory is gone (e.g. a crashed workflow) do not count
+        worktrees_dir = os.path.join(mirror_path, "worktrees")
+        if not os.path.isdir(worktrees_dir):
+            return False
+        for name in os.listdir(worktrees_dir):
+            try:
+                with open(os.path.join(worktrees_dir, name, "gitdir"), 'r', encoding='utf-8') as f:
+                    if os.path.exists(f.read().strip()):
+                        return True
+            except OSError:
+                continue
+        return False
+    
+    def _mirror_size(self, mirror_path: str) -> int:
+        total = 0
+        for root, _, filenames in os.walk(mirror_path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(root, filename))
+                except OSError:
+                    pass
+        return total
+    
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Drop stale mirrors, then least recently used ones until under max_bytes"""
+        mirrors = []
+        now = time.time()
+        for name in os.listdir(self.root_dir):
+            mirror_path = os.path.join(self.root_dir, name)
+            if name.endswith((".git.lock", ".git.readers")) and not os.path.exists(mirror_path.rpartition(".")[0]):
+                # Left behind by an evicted mirror or a clone that failed; every use
+                # touches the lock file, so only long-idle ones are removed
+                with contextlib.suppress(OSError):
+                    if now - os.path.getmtime(mirror_path) > self.max_age_seconds:
+                        os.remove(mirror_path)
+                continue
+            if not name.endswith(".git") or mirror_path == keep:
+                continue
+            if self._has_live_worktrees(mirror_path):
+                continue  # In use by a checkout
+            try:
+                last_used = os.path.getmtime(f"{mirror_path}.lock")
+            except OSError:
+                last_used = os.path.getmtime(mirror_path)
+            mirrors.append((last_used, mirror_path, self._mirror_size(mirror_path)))
+        
+        total = sum(size for _, _, size in mirrors)
+        if keep and os.path.isdir(keep):
+            total += self._mirror_size(keep)
+        
+        evicted = []
+        for last_used, mirror_path, size in sorted(mirrors):
+            if now - last_used <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            with open(f"{mirror_path}.lock", "a") as lock_file, open(f"{mirror_path}.readers", "a") as lease_file:
+                if fcntl:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        fcntl.flock(lease_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # Another workflow is fetching or reading it right now
+                # checkout() adds worktrees under the mirror lock, so this check is final
+                if self._has_live_worktrees(mirror_path):
+                    continue
+                shutil.rmtree(mirror_path, ignore_errors=True)
+                # The lock and lease files stay: a waiter may already have them open, and
+                # unlinking would hand it a lock nobody else sees. The sweep above removes
+                # them once they have gone unused for max_age_seconds.
+            total -= size
+            evicted.append(mirror_path)
+        return evicted
+
+_mirror_store: Optional[MirrorStore] = None
+
+def get_mirror_store() -> MirrorStore:
+    """Process-wide MirrorStore (created on first use)"""
+    global _mirror_store
+    if _mirror_store is None:
+        _mirror_store = MirrorStore()
+    return _mirror_store
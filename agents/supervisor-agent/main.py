@@ -3,6 +3,8 @@
 
 import json
 import datetime
+import os
+import sys
 import pathlib
 import re
 import typing
@@ -13,6 +15,22 @@ import queue
 import threading
 from typing import Dict, List, Optional, Any, Union
 
+# Modules shared by the agents live in agents/shared
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+from agents.shared.loader import load_agent_module
+
+# In-process agents, for workflows that run the pipeline locally instead of over HTTP
+try:
+    RepositoryMapperAgent = load_agent_module("repository-mapper").RepositoryMapperAgent
+    CodeAnalyzerAgent = load_agent_module("code-analyzer").CodeAnalyzerAgent
+    DocGenieAgent = load_agent_module("docgenie-agent").DocGenieAgent
+    LOCAL_AGENTS_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Local agents not available: {e}")
+    LOCAL_AGENTS_AVAILABLE = False
+
 ## Data Classes for Workflow Management
 class WorkflowStatus:
     def __init__(self):
@@ -59,6 +77,124 @@ class AggregatedResult:
         self.processing_time: float = 0.0
         self.agent_results: dict = {}
 
+## Streaming Pipeline
+# Mapping, analysis and documentation overlap instead of running back to back: the
+# mapper walks the commit in a producer thread and puts each source file on a
+# bounded queue, the analyzer's workers parse files as they arrive, and DocGenie
+# renders each module's section as soon as that file's result is in. Only the
+# repository-wide sections wait for the whole analysis.
+class StreamingPipeline:
+    def __init__(self, mapper, analyzer, docgenie, queue_size: int = 256):
+        self.mapper = mapper
+        self.analyzer = analyzer
+        self.docgenie = docgenie
+        self.queue_size: int = queue_size  # Bounds how far the walk may run ahead of parsing
+        self.progress_callback: Optional[typing.Callable[[float, str], None]] = None
+    
+    def report_progress(self, progress: float, message: str):
+        """Forward a progress update to progress_callback, if set"""
+        print(f"[Supervisor] Pipeline {progress * 100:.0f}%: {message}")
+        if self.progress_callback:
+            self.progress_callback(progress, message)
+    
+    def run(self, repository_url: str, ref: Optional[str] = None, analysis_depth: str = "full", max_file_size: int = 10485760) -> dict:
+        """Map, analyze and document one repository commit with the three stages overlapped"""
+        start_time = datetime.datetime.now()
+        self.report_progress(0.1, "Opening repository snapshot")
+        
+        snapshot = self.mapper.snapshot_from_mirror(repository_url, ref)
+        if "error" in snapshot:
+            return {"status": "failed", "error": f"Clone failed: {snapshot['error']}"}
+        object_reader = snapshot.pop("object_reader")
+        git_dir = snapshot["clone_path"]
+        
+        source_queue = queue.Queue(maxsize=self.queue_size)
+        stopped = threading.Event()
+        mapping = {}
+        
+        def enqueue(item) -> bool:
+            # Stop waiting once the consumer has given up, e.g. after an analysis error
+            while not stopped.is_set():
+                try:
+                    source_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def on_node(node):
+            if node.type == "file" and not node.is_ignored:
+                task = self.analyzer.source_task(node.object_id, node.path, node.size)
+                if task and not enqueue(task):
+                    raise RuntimeError("Analysis stopped")
+        
+        def produce():
+            try:
+                mapping["file_tree"] = self.mapper.generate_file_tree(git_dir, max_file_size, object_reader=object_reader, node_callback=on_node)
+                mapping["readme_summary"] = self.mapper.summarize_readme(git_dir, object_reader=object_reader)
+            except Exception as e:
+                mapping["error"] = str(e)
+            finally:
+                enqueue(None)
+        
+        module_sections = []
+        files_analyzed = collections.Counter()
+        
+        def on_file_result(result):
+            files_analyzed[result["status"]] += 1
+            if sum(files_analyzed.values()) % 100 == 0:
+                self.report_progress(0.3, f"Analyzed {sum(files_analyzed.values())} files")
+            if result["status"] == "success" and len(result["elements"]):
+                module_sections.append(self.docgenie.build_module_section(
+                    result["file_path"], result["language"],
+                    result["elements"].to_dicts(), result["relationships"].to_dicts()
+                ))
+        
+        producer = threading.Thread(target=produce, name="pipeline-mapper", daemon=True)
+        try:
+            self.report_progress(0.2, "Mapping and analyzing repository")
+            # Filters in source_task read these before analyze_repository sets them
+            self.analyzer.max_file_size = max_file_size
+            self.analyzer.analysis_depth = analysis_depth
+            producer.start()
+            code_analysis = self.analyzer.analyze_repository(
+                git_dir, max_file_size, analysis_depth=analysis_depth, commit=object_reader.commit,
+                source_files=iter(source_queue.get, None), on_file_result=on_file_result,
+                repository_url=repository_url
+            )
+            stopped.set()
+            producer.join()
+            
+            # An analysis error stops the mapper too, so it is reported first
+            if code_analysis.get("status") != "success":
+                return {"status": "failed", "error": f"Analysis failed: {code_analysis.get('details', code_analysis.get('error'))}"}
+            if "error" in mapping or "error" in mapping.get("file_tree", {}):
+                return {"status": "failed", "error": f"Mapping failed: {mapping.get('error') or mapping['file_tree']['error']}"}
+            
+            repository_info = dict(snapshot["repository_info"], url=repository_url, clone_path=git_dir)
+            
+            self.report_progress(0.7, "Generating documentation")
+            module_sections.sort(key=lambda section: section.title)
+            documentation = self.docgenie.generate_documentation(code_analysis, repository_info, self.docgenie.config, module_sections)
+            if documentation.get("status") != "completed":
+                return {"status": "failed", "error": f"Documentation failed: {documentation.get('error')}"}
+            
+            return {
+                "status": "completed",
+                "repository_info": repository_info,
+                "file_tree": mapping["file_tree"],
+                "readme_summary": mapping["readme_summary"],
+                "code_analysis": code_analysis,
+                "documentation": documentation,
+                "processing_time": (datetime.datetime.now() - start_time).total_seconds()
+            }
+        
+        finally:
+            stopped.set()
+            if producer.is_alive():
+                producer.join()
+            object_reader.close()
+
 ## Supervisor Agent Class
 class SupervisorAgent:
     def __init__(self):
@@ -650,6 +786,51 @@ class SupervisorAgent:
                 "partial_results": {}
             }
 
+    def execute_streaming_workflow(self, task_request: TaskRequest) -> dict:
+        """Execute the workflow in-process with mapping, analysis and documentation overlapped"""
+        print("🚀 Supervisor Agent: Starting streaming workflow...")
+        
+        start_time = datetime.datetime.now()
+        self.workflow_id = f"workflow_{start_time.strftime('%Y%m%d_%H%M%S')}"
+        self.task_request = task_request
+        
+        try:
+            if not LOCAL_AGENTS_AVAILABLE:
+                raise RuntimeError("Local agents are not available for the streaming workflow")
+            self.validate_repository()
+            
+            pipeline = StreamingPipeline(RepositoryMapperAgent(), CodeAnalyzerAgent(), DocGenieAgent())
+            result = pipeline.run(
+                task_request.repository_url,
+                ref=task_request.analysis_options.get("ref"),
+                analysis_depth=task_request.analysis_options.get("analysis_depth", "full")
+            )
+            if result["status"] != "completed":
+                raise RuntimeError(result["error"])
+            
+            total_time = (datetime.datetime.now() - start_time).total_seconds()
+            print(f"✅ Supervisor Agent: Streaming workflow completed in {total_time:.2f} seconds")
+            return {
+                "status": "completed",
+                "workflow_id": self.workflow_id,
+                "total_time": total_time,
+                "result": result,
+                "final_output": {
+                    "status": "completed",
+                    "generated_files": result["documentation"]["output_files"],
+                    "quality_score": result["documentation"]["quality_metrics"]["quality_score"],
+                    "processing_time": total_time
+                }
+            }
+            
+        except Exception as e:
+            print(f"❌ Supervisor Agent: Streaming workflow failed with error: {e}")
+            return {
+                "status": "failed",
+                "workflow_id": self.workflow_id,
+                "error": str(e)
+            }
+
 ## API Gateway Functions for external requests
 def process_api_request(request_data: dict, response_format: str = "json") -> dict:
     """Process external API request"""
@@ -672,7 +853,10 @@ def process_api_request(request_data: dict, response_format: str = "json") -> di
     
     # Execute workflow
     supervisor = SupervisorAgent()
-    result = supervisor.execute_complete_workflow(task_request)
+    if task_request.analysis_options.get("streaming"):
+        result = supervisor.execute_streaming_workflow(task_request)
+    else:
+        result = supervisor.execute_complete_workflow(task_request)
     
     # Format response based on requested format
     if response_format == "json":
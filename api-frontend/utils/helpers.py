@@ -14,11 +14,19 @@ import mimetypes;
 from typing import Dict, List, Optional, Any, Tuple;
 from datetime import datetime, timedelta;
 import logging;
+import sys;
 
 # Configure logging
 logging.basicConfig(level=logging.INFO);
 logger = logging.getLogger(__name__);
 
+# Shared bare mirrors of remote repositories: the repository mapper's MirrorStore,
+# so both sides lock, lease and evict the same way
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))));
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT);
+from agents.shared.mirrors import MIRROR_DIR, MIRROR_MAX_AGE_HOURS, MIRROR_MAX_BYTES, MirrorStore;
+
 ## Repository Utilities
 
 def validate_repository_url(url: str) -> Tuple[bool, str]:
@@ -106,15 +114,65 @@ def extract_repository_info(url: str) -> Dict[str, str]:
             
     return info;
 
-def clone_repository(url: str, target_dir: str, branch: str = 'main', depth: int = 1) -> bool:
+def get_mirror_store(timeout: int = 300) -> MirrorStore:
+    """MirrorStore configured from the frontend's mirror settings"""
+    return MirrorStore(MIRROR_DIR, MIRROR_MAX_BYTES, MIRROR_MAX_AGE_HOURS * 3600, timeout);
+
+def get_mirror_path(url: str) -> str:
+    """Path of the bare mirror for a repository URL"""
+    return get_mirror_store().mirror_path(url);
+
+def update_mirror(url: str, timeout: int = 300) -> Optional[str]:
+    """
+    Create or incrementally fetch the local bare mirror of a repository
+    
+    Args:
+        url: Repository URL
+        timeout: Timeout for each git command in seconds
+        
+    Returns:
+        Mirror path, or None if the mirror could not be updated
+    """
+    try:
+        store = get_mirror_store(timeout);
+        mirror_path = store.update(url);
+        store.evict(keep=mirror_path);
+        return mirror_path;
+        
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        logger.error(f"Error updating mirror for {url}: {str(e)}");
+        return None;
+
+def evict_mirrors(max_bytes: int = MIRROR_MAX_BYTES, max_age_hours: int = MIRROR_MAX_AGE_HOURS, keep: Optional[str] = None) -> int:
+    """
+    Remove mirrors unused for max_age_hours, then least recently used ones until under max_bytes
+    
+    Mirrors with live worktrees, open readers or a fetch in progress are skipped
+    (see MirrorStore.evict).
+    
+    Returns:
+        Number of mirrors removed
+    """
+    if not os.path.isdir(MIRROR_DIR):
+        return 0;
+    
+    return len(MirrorStore(MIRROR_DIR, max_bytes, max_age_hours * 3600).evict(keep=keep));
+
+def clone_repository(url: str, target_dir: str, branch: str = 'main', depth: int = 1, use_mirror: bool = True) -> bool:
     """
     Clone repository to target directory
     
+    With use_mirror the shared local mirror is fetched first (blobless, plus the
+    blobs of the branch's head) and the clone of the given depth is made from it,
+    so only objects pushed since the last run cross the network. Falls back to a
+    direct shallow clone if the mirror cannot be used.
+    
     Args:
         url: Repository URL
         target_dir: Target directory path
         branch: Branch to clone
         depth: Clone depth (1 for shallow clone)
+        use_mirror: Clone through the local mirror store
         
     Returns:
         True if successful, False otherwise
@@ -123,6 +181,28 @@ def clone_repository(url: str, target_dir: str, branch: str = 'main', depth: int
         # Ensure target directory exists
         os.makedirs(target_dir, exist_ok=True);
         
+        if use_mirror:
+            try:
+                # The lease keeps the mirror from being evicted while it is cloned
+                with get_mirror_store().leased(url, branch) as mirror_path:
+                    # file:// goes through upload-pack, which honours --depth (a plain path would not)
+                    result = subprocess.run(
+                        ['git', 'clone', '--depth', str(depth), '--branch', branch, f"file://{mirror_path}", target_dir],
+                        capture_output=True,
+                        text=True,
+                        timeout=300
+                    );
+                if result.returncode == 0:
+                    subprocess.run(['git', '-C', target_dir, 'remote', 'set-url', 'origin', url], capture_output=True);
+                    logger.info(f"Cloned repository from local mirror: {url}");
+                    return True;
+                logger.warning(f"Mirror clone failed, cloning directly: {result.stderr}");
+            except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+                logger.warning(f"Mirror unavailable, cloning directly: {str(e)}");
+            # A failed or timed out clone may have left a partial checkout behind
+            shutil.rmtree(target_dir, ignore_errors=True);
+            os.makedirs(target_dir, exist_ok=True);
+        
         # Clone repository
         cmd = [
             'git', 'clone',
@@ -4,6 +4,7 @@ Supports both synchronous (quick) and asynchronous (webhook) modes
 """
 
 import os
+import abc
 import asyncio
 import json
 import traceback
@@ -14,15 +15,22 @@ import uuid
 import shutil
 import aiohttp
 import re
-import subprocess
+import functools
+import hashlib
+import collections
+import sqlite3
+import threading
+import time
+import concurrent.futures
 from typing import Dict, List, Optional, Any
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import sys
 
-# Add agents to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agents'))
+# Add the project root to path; the agent directories are hyphenated, so the
+# agents themselves are loaded from file (see agents/shared/loader.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,10 +38,13 @@ logger = logging.getLogger(__name__)
 
 # Try importing real agents
 try:
-    from agents.supervisor_agent.main import SupervisorAgent
-    from agents.repository_mapper.main import RepositoryMapperAgent
-    from agents.code_analyzer.main import CodeAnalyzerAgent
-    from agents.docgenie_agent.main import DocGenieAgent
+    from agents.shared.loader import load_agent_module
+    SupervisorAgent = load_agent_module("supervisor-agent").SupervisorAgent
+    StreamingPipeline = load_agent_module("supervisor-agent").StreamingPipeline
+    RepositoryMapperAgent = load_agent_module("repository-mapper").RepositoryMapperAgent
+    get_mirror_store = load_agent_module("repository-mapper").get_mirror_store
+    CodeAnalyzerAgent = load_agent_module("code-analyzer").CodeAnalyzerAgent
+    DocGenieAgent = load_agent_module("docgenie-agent").DocGenieAgent
     AGENTS_AVAILABLE = True
     logger.info("Real AI agents imported successfully")
 except Exception as e:
@@ -73,59 +84,388 @@ class WorkflowResponse(BaseModel):
     estimated_completion: Optional[int] = None
     mode: str = "quick"
 
+# Workflow Stores
+# Records are plain JSON-able dicts. Results larger than RESULT_INLINE_BYTES (whole
+# file lists, documentation content) are spooled to results_dir and read back on
+# access, so neither backend holds them in memory between requests. Finished
+# workflows are dropped after the retention period.
+WORKFLOW_STORE = os.getenv("WORKFLOW_STORE", "memory")  # memory, sqlite
+WORKFLOW_RESULTS_DIR = os.getenv("WORKFLOW_RESULTS_DIR", "/tmp/codebase_genius_results")
+WORKFLOW_CACHE_SIZE = int(os.getenv("WORKFLOW_CACHE_SIZE", "1000"))
+WORKFLOW_RETENTION_DAYS = int(os.getenv("WORKFLOW_RETENTION_DAYS", "7"))
+CLEANUP_INTERVAL_HOURS = int(os.getenv("CLEANUP_INTERVAL_HOURS", "24"))
+SQLITE_PATH = os.getenv("SQLITE_PATH", "./codebase_genius.db")
+RESULT_INLINE_BYTES = 65536
+TERMINAL_STATUSES = ('completed', 'failed')
+STATUS_FIELDS = ('status', 'progress', 'current_step', 'error_message', 'mode')  # Sent by the status stream
+STATUS_STREAM_KEEPALIVE = 15  # Seconds between store re-checks (and keepalives) on a quiet stream
+
+class WorkflowStore(abc.ABC):
+    """Base workflow store: out-of-line result spooling shared by the backends"""
+    
+    def __init__(self, results_dir: str = WORKFLOW_RESULTS_DIR):
+        self.results_dir = results_dir
+        self.lock = threading.Lock()  # Agent threads report progress concurrently
+        
+    def _result_path(self, workflow_id: str) -> str:
+        return os.path.join(self.results_dir, f"{workflow_id}.json")
+        
+    def _spool_result(self, workflow_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the record to keep, with a large result replaced by a reference to its file"""
+        result = record.get('result')
+        if result is None:
+            return record
+        payload = json.dumps(result, default=str)
+        if len(payload) <= RESULT_INLINE_BYTES:
+            return record
+        os.makedirs(self.results_dir, exist_ok=True)
+        path = self._result_path(workflow_id)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(f"{path}.tmp", path)
+        return dict(record, result=None, result_file=path)
+        
+    def _load_result(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the record with a spooled result read back in"""
+        if not record.get('result_file'):
+            return record
+        try:
+            with open(record['result_file'], encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Workflow result unavailable: {e}")
+            result = None
+        record = dict(record, result=result)
+        del record['result_file']
+        return record
+        
+    def _remove_result(self, workflow_id: str):
+        try:
+            os.remove(self._result_path(workflow_id))
+        except OSError:
+            pass
+    
+    @abc.abstractmethod
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        ...
+        
+    @abc.abstractmethod
+    def put(self, workflow_id: str, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Store a record; returns the records evicted to make room (with their results)"""
+        
+    @abc.abstractmethod
+    def delete(self, workflow_id: str):
+        ...
+        
+    @abc.abstractmethod
+    def list_ids(self, active: bool) -> List[str]:
+        """IDs of running (active=True) or finished workflows, oldest first"""
+        
+    @abc.abstractmethod
+    def expired_ids(self, cutoff: float) -> List[str]:
+        """IDs of finished workflows last updated before cutoff (epoch seconds)"""
+
+class InMemoryWorkflowStore(WorkflowStore):
+    """Per-process LRU store; finished workflows beyond max_entries are evicted"""
+    
+    def __init__(self, max_entries: int = WORKFLOW_CACHE_SIZE, results_dir: str = WORKFLOW_RESULTS_DIR):
+        super().__init__(results_dir)
+        self.max_entries = max_entries
+        self.records: "collections.OrderedDict[str, Dict[str, Any]]" = collections.OrderedDict()
+        
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            record = self.records.get(workflow_id)
+            if record is None:
+                return None
+            self.records.move_to_end(workflow_id)
+        return self._load_result(record)
+        
+    def put(self, workflow_id: str, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        record = self._spool_result(workflow_id, record)
+        with self.lock:
+            self.records[workflow_id] = record
+            self.records.move_to_end(workflow_id)
+            # Running workflows are never evicted; the least recently used finished ones go first
+            excess = len(self.records) - self.max_entries
+            evicted = [
+                wid for wid, r in self.records.items()
+                if r['status'] in TERMINAL_STATUSES and wid != workflow_id
+            ][:max(0, excess)]
+            evicted_records = [self.records.pop(wid) for wid in evicted]
+        # Results are read back first: the caller needs their output directories
+        evicted_records = [self._load_result(r) for r in evicted_records]
+        for wid in evicted:
+            self._remove_result(wid)
+        return evicted_records
+            
+    def delete(self, workflow_id: str):
+        with self.lock:
+            self.records.pop(workflow_id, None)
+        self._remove_result(workflow_id)
+        
+    def list_ids(self, active: bool) -> List[str]:
+        with self.lock:
+            records = sorted(self.records.items(), key=lambda item: item[1]['created_at'])
+        return [wid for wid, r in records if (r['status'] not in TERMINAL_STATUSES) == active]
+        
+    def expired_ids(self, cutoff: float) -> List[str]:
+        with self.lock:
+            return [wid for wid, r in self.records.items() if r['status'] in TERMINAL_STATUSES and r['updated_at'] < cutoff]
+
+class SQLiteWorkflowStore(WorkflowStore):
+    """Durable store shared by every process on the host (survives restarts)"""
+    
+    def __init__(self, path: str = SQLITE_PATH, results_dir: str = WORKFLOW_RESULTS_DIR):
+        super().__init__(results_dir)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS workflows (
+                workflow_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                record TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS workflows_status ON workflows (status, updated_at)")
+        
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT record FROM workflows WHERE workflow_id = ?", (workflow_id,)
+            ).fetchone()
+        return self._load_result(json.loads(row[0])) if row else None
+        
+    def put(self, workflow_id: str, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        record = self._spool_result(workflow_id, record)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO workflows (workflow_id, status, created_at, updated_at, record) VALUES (?, ?, ?, ?, ?)",
+                (workflow_id, record['status'], record['created_at'], record['updated_at'], json.dumps(record, default=str))
+            )
+        return []  # Bounded by retention only
+            
+    def delete(self, workflow_id: str):
+        with self.lock:
+            self.connection.execute("DELETE FROM workflows WHERE workflow_id = ?", (workflow_id,))
+        self._remove_result(workflow_id)
+        
+    def list_ids(self, active: bool) -> List[str]:
+        operator = "NOT IN" if active else "IN"
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT workflow_id FROM workflows WHERE status {operator} (?, ?) ORDER BY created_at",
+                TERMINAL_STATUSES
+            ).fetchall()
+        return [row[0] for row in rows]
+        
+    def expired_ids(self, cutoff: float) -> List[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT workflow_id FROM workflows WHERE status IN (?, ?) AND updated_at < ?",
+                TERMINAL_STATUSES + (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+def create_workflow_store(backend: str = WORKFLOW_STORE) -> WorkflowStore:
+    """Build the configured store, falling back to memory if SQLite cannot be opened"""
+    if backend == "sqlite":
+        try:
+            return SQLiteWorkflowStore()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"SQLite workflow store unavailable, keeping workflows in memory: {e}")
+    return InMemoryWorkflowStore()
+
 # Workflow Manager
 class WorkflowManager:
-    def __init__(self):
-        self.active_workflows: Dict[str, Dict[str, Any]] = {}
-        self.completed_workflows: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, store: Optional[WorkflowStore] = None):
+        self.store = store or create_workflow_store()
+        self.retention_seconds = WORKFLOW_RETENTION_DAYS * 86400
+        self.cleanup_interval = CLEANUP_INTERVAL_HOURS * 3600
+        self.last_cleanup = 0.0
+        # Status stream subscribers: (event loop, queue) pairs per workflow, fed by update_workflow
+        self.subscribers: Dict[str, List[Any]] = collections.defaultdict(list)
+        self.subscribers_lock = threading.Lock()
+        # Serialises read-modify-write of a record (updates also come from agent threads)
+        self.records_lock = threading.Lock()
         
     def create_workflow(self, request: RepositoryRequest) -> str:
         """Create a new analysis workflow"""
         workflow_id = str(uuid.uuid4())
+        self.schedule_cleanup()
         
-        self.active_workflows[workflow_id] = {
-            'request': request,
+        now = time.time()
+        self.put_workflow(workflow_id, {
+            'request': request.dict(),
             'status': 'pending',
             'progress': 0.0,
             'current_step': 'Initializing',
-            'created_at': asyncio.get_event_loop().time(),
+            'created_at': now,
+            'updated_at': now,
             'result': None,
             'error_message': None,
             'estimated_completion': 300,
             'mode': request.mode or "auto"
-        }
+        })
         
         logger.info(f"Created workflow {workflow_id} for {request.repository_url}")
         return workflow_id
         
+    def put_workflow(self, workflow_id: str, record: Dict[str, Any]):
+        """Store a record; output directories of records the store evicts are removed in the background"""
+        for evicted in self.store.put(workflow_id, record):
+            self.remove_output_directory(evicted, background=True)
+            
+    def remove_output_directory(self, workflow: Dict[str, Any], background: bool = False):
+        """Delete a workflow's output directory (e.g. /tmp/<id> with its ZIP)
+        
+        With background the delete is queued on agent_executor, for callers on the event loop.
+        """
+        output_directory = (workflow.get('result') or {}).get('output_directory')
+        if not output_directory:
+            return
+        if background:
+            agent_executor.submit(shutil.rmtree, output_directory, ignore_errors=True)
+        elif os.path.exists(output_directory):
+            shutil.rmtree(output_directory, ignore_errors=True)
+        
     def update_workflow(self, workflow_id: str, status: str, progress: float, 
                        current_step: str, result: Optional[Dict] = None, 
                        error_message: Optional[str] = None):
-        """Update workflow status"""
-        if workflow_id in self.active_workflows:
-            self.active_workflows[workflow_id].update({
+        """Update workflow status (blocking; coroutines use aupdate_workflow)"""
+        with self.records_lock:
+            workflow = self.store.get(workflow_id)
+            if workflow is None:
+                return
+            changes = {
                 'status': status,
                 'progress': progress,
                 'current_step': current_step,
-                'result': result,
                 'error_message': error_message
-            })
-            
-            if status in ['completed', 'failed']:
-                self.completed_workflows[workflow_id] = self.active_workflows.pop(workflow_id)
+            }
+            delta = {key: value for key, value in changes.items() if workflow.get(key) != value}
+            workflow.update(changes, result=result, updated_at=time.time())
+            self.put_workflow(workflow_id, workflow)
+        
+        # The result is only pushed once, with the final status
+        if status in TERMINAL_STATUSES:
+            delta['result'] = result
+        if delta:
+            self.publish(workflow_id, delta)
+    
+    # Coroutine variants: the store's SQLite queries and result spooling run on
+    # store_executor, never on the event loop
+    async def acreate_workflow(self, request: RepositoryRequest) -> str:
+        return await run_store_call(self.create_workflow, request)
+    
+    async def aupdate_workflow(self, workflow_id: str, status: str, progress: float,
+                               current_step: str, result: Optional[Dict] = None,
+                               error_message: Optional[str] = None):
+        await run_store_call(self.update_workflow, workflow_id, status, progress, current_step, result, error_message)
+    
+    async def aget_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        return await run_store_call(self.get_workflow_status, workflow_id)
+    
+    async def alist_workflows(self, active: Optional[bool] = None) -> List[str]:
+        return await run_store_call(self.list_workflows, active)
+                
+    def subscribe(self, workflow_id: str) -> asyncio.Queue:
+        """Queue receiving this workflow's status deltas (call from the event loop)"""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue())
+        with self.subscribers_lock:
+            self.subscribers[workflow_id].append(subscription)
+        return subscription[1]
+        
+    def unsubscribe(self, workflow_id: str, queue: asyncio.Queue):
+        with self.subscribers_lock:
+            subscriptions = self.subscribers.get(workflow_id, [])
+            subscriptions[:] = [s for s in subscriptions if s[1] is not queue]
+            if not subscriptions:
+                self.subscribers.pop(workflow_id, None)
+                
+    def publish(self, workflow_id: str, delta: Dict[str, Any]):
+        """Hand a delta to every subscriber; safe from agent worker threads"""
+        with self.subscribers_lock:
+            subscriptions = list(self.subscribers.get(workflow_id, []))
+        for loop, queue in subscriptions:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, delta)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                self.unsubscribe(workflow_id, queue)
                 
     def get_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """Get workflow status"""
-        return (self.active_workflows.get(workflow_id) or 
-                self.completed_workflows.get(workflow_id))
+        return self.store.get(workflow_id)
                 
-    def list_workflows(self) -> List[str]:
-        """List all workflow IDs"""
-        return list(self.active_workflows.keys()) + list(self.completed_workflows.keys())
+    def list_workflows(self, active: Optional[bool] = None) -> List[str]:
+        """List workflow IDs (running, finished, or both)"""
+        if active is None:
+            return self.store.list_ids(True) + self.store.list_ids(False)
+        return self.store.list_ids(active)
+        
+    def delete_workflow(self, workflow_id: str):
+        """Delete a workflow record, its spooled result and its output directory"""
+        with self.records_lock:
+            workflow = self.store.get(workflow_id)
+            if workflow is None:
+                return
+            self.store.delete(workflow_id)
+        self.remove_output_directory(workflow)
+        
+    def schedule_cleanup(self):
+        """Queue cleanup_expired on agent_executor once per cleanup interval
+        
+        Called on the event loop; the deletes themselves never run there.
+        """
+        now = time.time()
+        if now - self.last_cleanup < self.cleanup_interval:
+            return
+        self.last_cleanup = now
+        agent_executor.submit(self.cleanup_expired, True)
+        
+    def cleanup_expired(self, force: bool = False) -> int:
+        """Delete finished workflows past the retention period (at most once per cleanup interval)"""
+        now = time.time()
+        if not force and now - self.last_cleanup < self.cleanup_interval:
+            return 0
+        self.last_cleanup = now
+        expired = self.store.expired_ids(now - self.retention_seconds)
+        for workflow_id in expired:
+            self.delete_workflow(workflow_id)
+        if expired:
+            logger.info(f"Removed {len(expired)} workflows past the {WORKFLOW_RETENTION_DAYS}-day retention period")
+        return len(expired)
 
 # Global workflow manager
 workflow_manager = WorkflowManager()
 
+# Blocking agent work (git, mapping, parsing, rendering, file cleanup) runs on this
+# bounded pool, so the event loop keeps serving /api/status and /health while up to
+# MAX_CONCURRENT_WORKFLOWS workflows make progress; further stages queue for a thread.
+MAX_CONCURRENT_WORKFLOWS = int(os.getenv("MAX_CONCURRENT_WORKFLOWS", "5"))
+agent_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_WORKFLOWS, thread_name_prefix="agent-worker"
+)
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on agent_executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(agent_executor, functools.partial(func, *args, **kwargs))
+
+# Workflow store reads and writes get threads of their own, so status polls and
+# updates never queue behind agent work on agent_executor
+store_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="workflow-store")
+
+async def run_store_call(func, *args, **kwargs):
+    """Run a blocking workflow store call on store_executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(store_executor, functools.partial(func, *args, **kwargs))
+
 # Main FastAPI Application
 app = FastAPI(
     title="Codebase Genius API",
@@ -133,6 +473,159 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# Result Cache
+# Finished documentation packages are stored under a key derived from the repository
+# URL, the commit it resolved to and the options that shape the output, so a repeat
+# request for an unchanged repository is answered from the existing ZIP. Entries
+# expire after RESULT_CACHE_TTL_HOURS; beyond RESULT_CACHE_MAX_BYTES the least
+# recently used are evicted first.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "/tmp/codebase_genius_result_cache")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", "1073741824"))  # 1GB
+RESULT_CACHE_TTL_HOURS = int(os.getenv("RESULT_CACHE_TTL_HOURS", "24"))
+
+class ResultCache:
+    def __init__(self, cache_dir: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 ttl_seconds: int = RESULT_CACHE_TTL_HOURS * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        
+    @staticmethod
+    def make_key(repository_url: str, commit: str, mode: str, request: RepositoryRequest) -> str:
+        """Content address of one documentation package"""
+        url = repository_url.strip().rstrip('/')
+        if url.endswith('.git'):
+            url = url[:-4]
+        options = [url.lower(), commit, mode, request.analysis_depth, request.include_diagrams, request.format]
+        return hashlib.sha256(json.dumps(options).encode('utf-8')).hexdigest()
+        
+    def _paths(self, key: str):
+        return os.path.join(self.cache_dir, f"{key}.zip"), os.path.join(self.cache_dir, f"{key}.json")
+        
+    def lookup(self, key: str, output_dir: str) -> Optional[Dict[str, Any]]:
+        """Link a fresh cached package into output_dir and return its stored result, or None"""
+        zip_path, result_path = self._paths(key)
+        try:
+            if time.time() - os.path.getmtime(result_path) > self.ttl_seconds:
+                return None
+            with open(result_path, encoding='utf-8') as f:
+                result = json.load(f)
+            os.makedirs(output_dir, exist_ok=True)
+            target = os.path.join(output_dir, "documentation.zip")
+            if os.path.exists(target):
+                if os.path.samefile(zip_path, target):
+                    os.utime(zip_path)
+                    return result
+                os.remove(target)
+            try:
+                # A hard link keeps the download valid after the entry is evicted
+                os.link(zip_path, target)
+            except OSError:
+                shutil.copyfile(zip_path, target)
+            # Access time drives least-recently-used eviction
+            os.utime(zip_path)
+            return result
+        except (OSError, ValueError):
+            return None
+            
+    @staticmethod
+    def portable_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a workflow result without paths that belong to that workflow
+        
+        download_url, output_directory, the generated files' paths under
+        /tmp/<workflow id> and the checkout or mirror path all stop being valid
+        once the original workflow is deleted; only the ZIP is shared.
+        """
+        result = {k: v for k, v in result.items() if k not in ('download_url', 'output_directory')}
+        if isinstance(result.get('documentation'), dict):
+            result['documentation'] = {k: v for k, v in result['documentation'].items() if k != 'output_files'}
+        if isinstance(result.get('repository_info'), dict):
+            result['repository_info'] = {k: v for k, v in result['repository_info'].items() if k != 'clone_path'}
+        return result
+        
+    def store(self, key: str, zip_path: str, result: Dict[str, Any]):
+        """Add a finished package (see portable_result for what is kept), then evict"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached_zip, cached_result = self._paths(key)
+        shutil.copyfile(zip_path, f"{cached_zip}.tmp")
+        os.replace(f"{cached_zip}.tmp", cached_zip)
+        result = self.portable_result(result)
+        with open(f"{cached_result}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(result, f, default=str)
+        # The result file is written last: its presence marks a complete entry
+        os.replace(f"{cached_result}.tmp", cached_result)
+        self.evict()
+        
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used ones until under max_bytes"""
+        now = time.time()
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return 0
+        for name in names:
+            if not name.endswith('.zip'):
+                continue
+            key = name[:-4]
+            zip_path, result_path = self._paths(key)
+            try:
+                size = os.path.getsize(zip_path) + os.path.getsize(result_path)
+                entries.append((os.stat(zip_path).st_mtime, os.path.getmtime(result_path), size, key))
+            except OSError:
+                continue
+        
+        removed = 0
+        total = sum(size for _, _, size, _ in entries)
+        for last_used, created, size, key in sorted(entries):
+            if now - created <= self.ttl_seconds and total <= self.max_bytes:
+                continue
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+
+async def resolve_remote_commit(url: str, timeout: float = 10) -> Optional[str]:
+    """Commit the remote's HEAD points at, via git ls-remote (no objects are fetched)"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "git", "ls-remote", url, "HEAD",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+            env=dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        )
+    except OSError:
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+    fields = stdout.decode('utf-8', errors='ignore').split()
+    return fields[0] if process.returncode == 0 and fields else None
+
+async def cache_workflow_result(request: RepositoryRequest, mode: str, commit: Optional[str], result: Dict[str, Any]):
+    """Store a completed workflow's package in the result cache (failures only logged)
+    
+    commit is the one the workflow analysed, not the one resolved when the request came
+    in: a push in between must not file the newer commit's package under the older one.
+    """
+    if not commit or result_cache is None:
+        return
+    try:
+        cache_key = ResultCache.make_key(request.repository_url, commit, mode, request)
+        zip_path = os.path.join(result['output_directory'], "documentation.zip")
+        await run_blocking(result_cache.store, cache_key, zip_path, result)
+    except Exception as e:
+        logger.warning(f"Could not cache workflow result: {e}")
+
 # Utility Functions
 async def validate_repository_url(url: str) -> bool:
     """Validate repository URL format and accessibility"""
@@ -153,6 +646,61 @@ async def validate_repository_url(url: str) -> bool:
         logger.warning(f"Repository accessibility check failed: {e}")
         return False
 
+async def git_clone_shallow(url: str, target_dir: str, timeout: float):
+    """Shallow single-branch clone as an asyncio subprocess (killed on timeout)"""
+    process = await asyncio.create_subprocess_exec(
+        "git", "clone", "--depth", "1", "--single-branch", url, target_dir,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        # Private repositories fail straight away instead of waiting on a credential prompt
+        env=dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise Exception(f"git clone timed out after {timeout} seconds")
+    if process.returncode != 0:
+        raise Exception(f"git clone failed: {stderr.decode('utf-8', errors='ignore').strip()}")
+
+async def git_head_commit(repository_path: str) -> Optional[str]:
+    """Commit checked out in a clone, or None if git cannot tell"""
+    process = await asyncio.create_subprocess_exec(
+        "git", "-C", repository_path, "rev-parse", "HEAD",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        return None
+    return stdout.decode('utf-8', errors='ignore').strip() or None
+
+def scan_repository_files(repository_path: str) -> List[Dict[str, Any]]:
+    """List non-hidden files with their sizes (quick mode)"""
+    files = []
+    for root, dirs, filenames in os.walk(repository_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for filename in filenames:
+            if not filename.startswith('.'):
+                file_path = os.path.join(root, filename)
+                rel_path = os.path.relpath(file_path, repository_path)
+                files.append({
+                    'path': rel_path,
+                    'size': os.path.getsize(file_path)
+                })
+    return files
+
+def write_documentation_package(output_dir: str, documents: Dict[str, str], output_files: Optional[List[str]] = None) -> str:
+    """Write documents (archive name -> text) and output_files into output_dir/documentation.zip"""
+    os.makedirs(output_dir, exist_ok=True)
+    zip_path = os.path.join(output_dir, "documentation.zip")
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+        # Files are copied into the archive in chunks, never loaded whole
+        for output_file in output_files or []:
+            zipf.write(output_file, os.path.basename(output_file))
+        for name, content in documents.items():
+            zipf.writestr(name, content)
+    return zip_path
+
 def estimate_repository_size(url: str) -> str:
     """Estimate repository size to choose processing mode"""
     # Simple heuristic based on repository URL
@@ -160,19 +708,18 @@ def estimate_repository_size(url: str) -> str:
     return "small"  # small, medium, large
 
 async def generate_documentation_full_agents(workflow_id: str, request: RepositoryRequest):
-    """Generate documentation using actual AI agents"""
+    """Generate documentation using actual AI agents (stored in the result cache)"""
     try:
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "running", 0.05, "Initializing AI agents"
         )
         
         # Initialize agents
-        supervisor = SupervisorAgent()
         mapper = RepositoryMapperAgent()
         analyzer = CodeAnalyzerAgent()
         docgenie = DocGenieAgent()
         
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "running", 0.1, "Validating repository"
         )
         
@@ -180,94 +727,63 @@ async def generate_documentation_full_agents(workflow_id: str, request: Reposito
         is_valid = await validate_repository_url(request.repository_url)
         if not is_valid:
             raise Exception("Repository URL is invalid or inaccessible")
-            
-        workflow_manager.update_workflow(
-            workflow_id, "running", 0.2, "Cloning repository"
-        )
         
-        # Step 1: Repository Mapping
-        mapper.repository_url = request.repository_url
-        clone_result = mapper.clone_repository(request.repository_url)
-        
-        if "error" in clone_result:
-            raise Exception(f"Clone failed: {clone_result['error']}")
-            
-        clone_path = clone_result.get('clone_path')
+        output_dir = f"/tmp/{workflow_id}"
+        docgenie.config.output_dir = output_dir
+        docgenie.config.diagram_enabled = request.include_diagrams
         
-        workflow_manager.update_workflow(
-            workflow_id, "running", 0.4, "Mapping repository structure"
+        # Mapping, analysis and documentation run overlapped from the local mirror;
+        # nothing is checked out
+        mapper.repository_url = request.repository_url
+        pipeline = StreamingPipeline(mapper, analyzer, docgenie)
+        pipeline.progress_callback = lambda progress, step: workflow_manager.update_workflow(
+            workflow_id, "running", progress, step
         )
-        
-        # Generate file tree
-        file_tree = mapper.generate_file_tree(clone_path)
-        repository_info = {
-            'url': request.repository_url,
-            'clone_path': clone_path,
-            'file_tree': file_tree,
-            'stats': clone_result.get('repository_info', {})
-        }
-        
-        workflow_manager.update_workflow(
-            workflow_id, "running", 0.5, "Analyzing code structure"
+        pipeline_result = await run_blocking(
+            pipeline.run, request.repository_url, analysis_depth=request.analysis_depth
         )
+        if pipeline_result["status"] != "completed":
+            raise Exception(pipeline_result["error"])
         
-        # Step 2: Code Analysis
-        analyzer.repository_path = clone_path
-        analyzer.analysis_depth = request.analysis_depth
-        
-        # Parse code files
-        code_analysis = analyzer.analyze_repository(clone_path)
-        
-        workflow_manager.update_workflow(
-            workflow_id, "running", 0.7, "Generating documentation"
+        documentation = pipeline_result["documentation"]
+        repository_info = dict(
+            pipeline_result["repository_info"],
+            file_tree=pipeline_result["file_tree"],
+            readme_summary=pipeline_result["readme_summary"]
         )
         
-        # Step 3: Documentation Generation
-        docgenie.repository_info = repository_info
-        docgenie.ccg_data = code_analysis
-        docgenie.config.diagram_enabled = request.include_diagrams
-        
-        # Generate documentation
-        documentation = docgenie.generate_documentation()
-        
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "running", 0.9, "Finalizing output"
         )
         
-        # Create output package
-        output_dir = f"/tmp/{workflow_id}"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Save documentation
-        doc_file = os.path.join(output_dir, f"documentation.{request.format}")
-        with open(doc_file, 'w', encoding='utf-8') as f:
-            f.write(documentation.get('content', ''))
-            
         # Create ZIP
-        zip_path = os.path.join(output_dir, "documentation.zip")
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            zipf.write(doc_file, f"documentation.{request.format}")
-            zipf.writestr("metadata.json", json.dumps(documentation.get('metadata', {}), indent=2))
-            
-        # Cleanup clone
-        if clone_path and os.path.exists(clone_path):
-            shutil.rmtree(clone_path, ignore_errors=True)
+        await run_blocking(
+            write_documentation_package, output_dir,
+            {"metadata.json": json.dumps({
+                "quality_metrics": documentation["quality_metrics"],
+                "summary": documentation["summary"],
+                "processing_time": pipeline_result["processing_time"]
+            }, indent=2)},
+            documentation["output_files"]
+        )
             
         # Update workflow
-        workflow_manager.update_workflow(
+        result = {
+            'documentation': documentation,
+            'repository_info': repository_info,
+            'download_url': f"/api/download/{workflow_id}",
+            'output_directory': output_dir
+        }
+        await workflow_manager.aupdate_workflow(
             workflow_id, "completed", 1.0, "Documentation generated successfully",
-            result={
-                'documentation': documentation,
-                'repository_info': repository_info,
-                'download_url': f"/api/download/{workflow_id}",
-                'output_directory': output_dir
-            }
+            result=result
         )
+        await cache_workflow_result(request, "full", pipeline_result["repository_info"].get("commit_hash"), result)
         
     except Exception as e:
         logger.error(f"Full agent workflow {workflow_id} failed: {str(e)}")
         logger.error(traceback.format_exc())
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "failed", 0.0, "Generation failed",
             error_message=str(e)
         )
@@ -275,7 +791,7 @@ async def generate_documentation_full_agents(workflow_id: str, request: Reposito
 async def generate_documentation_quick(workflow_id: str, request: RepositoryRequest):
     """Quick documentation generation (simplified, fits in 10s timeout)"""
     try:
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "running", 0.1, "Validating repository"
         )
         
@@ -283,41 +799,47 @@ async def generate_documentation_quick(workflow_id: str, request: RepositoryRequ
         if not is_valid:
             raise Exception("Repository URL is invalid or inaccessible")
             
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "running", 0.3, "Fetching repository info"
         )
         
         # Quick analysis without full clone
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Shallow clone
-            subprocess.run([
-                "git", "clone", "--depth", "1", "--single-branch",
-                request.repository_url, temp_dir
-            ], check=True, capture_output=True, timeout=5)
+        temp_dir = await run_blocking(tempfile.mkdtemp)
+        checkout_path = temp_dir
+        mirror_store = get_mirror_store() if AGENTS_AVAILABLE else None
+        try:
+            if mirror_store and mirror_store.has_mirror(request.repository_url):
+                # Worktree of the local mirror: only objects pushed since the last run are fetched
+                checkout = await run_blocking(
+                    mirror_store.checkout, request.repository_url,
+                    destination=os.path.join(temp_dir, "checkout")
+                )
+                checkout_path = checkout["clone_path"]
+                commit = checkout["commit_hash"]
+            else:
+                # Shallow clone (a first-time full mirror would not fit the time budget)
+                mirror_store = None
+                await git_clone_shallow(request.repository_url, temp_dir, timeout=5)
+                commit = await git_head_commit(temp_dir)
             
-            workflow_manager.update_workflow(
+            await workflow_manager.aupdate_workflow(
                 workflow_id, "running", 0.6, "Analyzing structure"
             )
             
             # Quick file analysis
-            files = []
-            for root, dirs, filenames in os.walk(temp_dir):
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
-                for filename in filenames:
-                    if not filename.startswith('.'):
-                        file_path = os.path.join(root, filename)
-                        rel_path = os.path.relpath(file_path, temp_dir)
-                        files.append({
-                            'path': rel_path,
-                            'size': os.path.getsize(file_path)
-                        })
-            
-            workflow_manager.update_workflow(
-                workflow_id, "running", 0.9, "Generating documentation"
-            )
-            
-            # Quick documentation
-            doc_content = f"""# Repository Documentation
+            files = await run_blocking(scan_repository_files, checkout_path)
+        
+        finally:
+            if mirror_store and checkout_path != temp_dir:
+                await run_blocking(mirror_store.release, checkout_path)
+            await run_blocking(shutil.rmtree, temp_dir, ignore_errors=True)
+        
+        await workflow_manager.aupdate_workflow(
+            workflow_id, "running", 0.9, "Generating documentation"
+        )
+        
+        # Quick documentation
+        doc_content = f"""# Repository Documentation
 
 ## Overview
 Repository: {request.repository_url}
@@ -326,34 +848,31 @@ Analysis Date: {asyncio.get_event_loop().time()}
 
 ## Files
 """
-            for f in files[:20]:  # First 20 files
-                doc_content += f"- {f['path']} ({f['size']} bytes)\n"
-                
-            # Save output
-            output_dir = f"/tmp/{workflow_id}"
-            os.makedirs(output_dir, exist_ok=True)
+        for f in files[:20]:  # First 20 files
+            doc_content += f"- {f['path']} ({f['size']} bytes)\n"
             
-            doc_file = os.path.join(output_dir, f"documentation.{request.format}")
-            with open(doc_file, 'w', encoding='utf-8') as f:
-                f.write(doc_content)
-                
-            zip_path = os.path.join(output_dir, "documentation.zip")
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                zipf.write(doc_file, f"documentation.{request.format}")
-                
-            workflow_manager.update_workflow(
-                workflow_id, "completed", 1.0, "Quick documentation generated",
-                result={
-                    'documentation': {'content': doc_content},
-                    'files': files,
-                    'download_url': f"/api/download/{workflow_id}",
-                    'output_directory': output_dir
-                }
-            )
+        # Save output
+        output_dir = f"/tmp/{workflow_id}"
+        await run_blocking(
+            write_documentation_package, output_dir,
+            {f"documentation.{request.format}": doc_content}
+        )
+            
+        result = {
+            'documentation': {'content': doc_content},
+            'files': files,
+            'download_url': f"/api/download/{workflow_id}",
+            'output_directory': output_dir
+        }
+        await workflow_manager.aupdate_workflow(
+            workflow_id, "completed", 1.0, "Quick documentation generated",
+            result=result
+        )
+        await cache_workflow_result(request, "quick", commit, result)
             
     except Exception as e:
         logger.error(f"Quick workflow {workflow_id} failed: {str(e)}")
-        workflow_manager.update_workflow(
+        await workflow_manager.aupdate_workflow(
             workflow_id, "failed", 0.0, "Generation failed",
             error_message=str(e)
         )
@@ -379,8 +898,8 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": str(asyncio.get_event_loop().time()),
-        "active_workflows": len(workflow_manager.active_workflows),
-        "completed_workflows": len(workflow_manager.completed_workflows),
+        "active_workflows": len(await workflow_manager.alist_workflows(active=True)),
+        "completed_workflows": len(await workflow_manager.alist_workflows(active=False)),
         "agents_available": AGENTS_AVAILABLE,
         "mode": "full" if AGENTS_AVAILABLE else "quick"
     }
@@ -398,11 +917,39 @@ async def start_analysis(request: RepositoryRequest, background_tasks: Backgroun
                 mode = "full"
             else:
                 mode = "quick"
+        run_mode = "full" if mode == "full" and AGENTS_AVAILABLE else "quick"
+        
+        workflow_id = await workflow_manager.acreate_workflow(request)
         
-        workflow_id = workflow_manager.create_workflow(request)
+        # Same repository, commit and options as a cached run: serve its package
+        if result_cache is not None:
+            commit = await resolve_remote_commit(request.repository_url)
+            if commit:
+                output_dir = f"/tmp/{workflow_id}"
+                cached_result = await run_blocking(
+                    result_cache.lookup, ResultCache.make_key(request.repository_url, commit, run_mode, request), output_dir
+                )
+                if cached_result is not None:
+                    await workflow_manager.aupdate_workflow(
+                        workflow_id, "completed", 1.0, "Documentation served from cache",
+                        result=dict(
+                            cached_result,
+                            commit=commit,
+                            cache_hit=True,
+                            download_url=f"/api/download/{workflow_id}",
+                            output_directory=output_dir
+                        )
+                    )
+                    return WorkflowResponse(
+                        workflow_id=workflow_id,
+                        status="completed",
+                        message=f"Documentation for commit {commit[:12]} served from cache",
+                        estimated_completion=0,
+                        mode=mode
+                    )
         
         # Start background task
-        if mode == "full" and AGENTS_AVAILABLE:
+        if run_mode == "full":
             background_tasks.add_task(generate_documentation_full_agents, workflow_id, request)
             estimated_time = 300
         else:
@@ -424,7 +971,7 @@ async def start_analysis(request: RepositoryRequest, background_tasks: Backgroun
 @app.get("/api/status/{workflow_id}", response_model=WorkflowStatus)
 async def get_workflow_status(workflow_id: str):
     """Get workflow status"""
-    workflow = workflow_manager.get_workflow_status(workflow_id)
+    workflow = await workflow_manager.aget_workflow_status(workflow_id)
     
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
@@ -439,21 +986,74 @@ async def get_workflow_status(workflow_id: str):
         mode=workflow.get('mode', 'quick')
     )
 
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_workflow_events(workflow_id: str, workflow: Dict[str, Any]):
+    """Server-sent events for one workflow: its current state, then only the fields that change"""
+    queue = workflow_manager.subscribe(workflow_id)
+    try:
+        # Re-read after subscribing so no update falls between the snapshot and the queue
+        workflow = await workflow_manager.aget_workflow_status(workflow_id) or workflow
+        state = {key: workflow.get(key) for key in STATUS_FIELDS}
+        finished = state['status'] in TERMINAL_STATUSES
+        yield format_sse("status", dict(state, workflow_id=workflow_id, result=workflow.get('result') if finished else None))
+        
+        while not finished:
+            try:
+                delta = await asyncio.wait_for(queue.get(), STATUS_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Workflows run by another process only reach a shared (SQLite) store
+                workflow = await workflow_manager.aget_workflow_status(workflow_id)
+                if workflow is None:
+                    yield format_sse("deleted", {"workflow_id": workflow_id})
+                    return
+                delta = {key: workflow.get(key) for key in STATUS_FIELDS if workflow.get(key) != state[key]}
+                if not delta:
+                    yield ": keepalive\n\n"
+                    continue
+                if workflow['status'] in TERMINAL_STATUSES:
+                    delta['result'] = workflow.get('result')
+            
+            state.update((key, value) for key, value in delta.items() if key in state)
+            finished = state['status'] in TERMINAL_STATUSES
+            yield format_sse("status", delta)
+    
+    finally:
+        workflow_manager.unsubscribe(workflow_id, queue)
+
+@app.get("/api/status/{workflow_id}/stream")
+async def stream_workflow_status(workflow_id: str):
+    """Push workflow progress as server-sent events instead of polling /api/status"""
+    workflow = await workflow_manager.aget_workflow_status(workflow_id)
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+        
+    return StreamingResponse(
+        stream_workflow_events(workflow_id, workflow),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/workflows")
 async def list_workflows():
     """List all workflows"""
+    active_workflows = await workflow_manager.alist_workflows(active=True)
+    completed_workflows = await workflow_manager.alist_workflows(active=False)
     return {
-        "active_workflows": list(workflow_manager.active_workflows.keys()),
-        "completed_workflows": list(workflow_manager.completed_workflows.keys()),
-        "total_active": len(workflow_manager.active_workflows),
-        "total_completed": len(workflow_manager.completed_workflows),
+        "active_workflows": active_workflows,
+        "completed_workflows": completed_workflows,
+        "total_active": len(active_workflows),
+        "total_completed": len(completed_workflows),
         "agents_available": AGENTS_AVAILABLE
     }
 
 @app.get("/api/download/{workflow_id}")
 async def download_documentation(workflow_id: str):
     """Download generated documentation"""
-    workflow = workflow_manager.get_workflow_status(workflow_id)
+    workflow = await workflow_manager.aget_workflow_status(workflow_id)
     
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
@@ -479,19 +1079,12 @@ async def download_documentation(workflow_id: str):
 @app.delete("/api/workflows/{workflow_id}")
 async def delete_workflow(workflow_id: str):
     """Delete workflow and cleanup files"""
-    workflow = workflow_manager.get_workflow_status(workflow_id)
+    workflow = await workflow_manager.aget_workflow_status(workflow_id)
     
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
         
-    result = workflow.get('result', {})
-    if 'output_directory' in result and os.path.exists(result['output_directory']):
-        shutil.rmtree(result['output_directory'], ignore_errors=True)
-        
-    if workflow_id in workflow_manager.active_workflows:
-        del workflow_manager.active_workflows[workflow_id]
-    if workflow_id in workflow_manager.completed_workflows:
-        del workflow_manager.completed_workflows[workflow_id]
+    await run_blocking(workflow_manager.delete_workflow, workflow_id)
         
     return {"message": f"Workflow {workflow_id} deleted successfully"}
 
@@ -505,6 +1098,7 @@ async def get_api_config():
         "analysis_depth_options": ["basic", "full", "comprehensive"],
         "estimated_analysis_time": "30 seconds (quick) / 2-5 minutes (full)",
         "modes": ["auto", "quick", "full", "webhook"],
+        "max_concurrent_workflows": MAX_CONCURRENT_WORKFLOWS,
         "agents_available": AGENTS_AVAILABLE,
         "current_mode": "full" if AGENTS_AVAILABLE else "quick"
     }
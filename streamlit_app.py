@@ -250,23 +250,27 @@ def show_repository_form():
             else:
                 st.error(f"Failed to start analysis: {response.get('error', 'Unknown error')}")
 
-def show_workflow_status():
-    """Display current workflow status"""
-    if not st.session_state.workflow_id:
-        return
-        
-    workflow_id = st.session_state.workflow_id
-    
-    st.markdown('<div class="section-header">Analysis Status</div>', unsafe_allow_html=True)
-    
-    status_response = call_api(f"/api/status/{workflow_id}")
-    
-    if not status_response.get("success", True):
-        st.error(f"Failed to get status: {status_response.get('error', 'Unknown error')}")
-        return
-        
-    status_data = status_response.get("data", status_response)
-    
+def stream_workflow_events(workflow_id: str):
+    """Yield (event, data) pairs from the workflow's server-sent event stream"""
+    url = f"{API_BASE_URL}/api/status/{workflow_id}/stream"
+    headers = {"Accept": "text/event-stream"}
+    with requests.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                continue
+            # A blank line ends the event; ":" comment lines are keepalives
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
+def render_workflow_status(status_data: Dict[str, Any]):
+    """Render status cards, progress bar and error for one status snapshot"""
     status = status_data.get("status", "unknown")
     progress = status_data.get("progress", 0.0)
     current_step = status_data.get("current_step", "Unknown")
@@ -299,14 +303,46 @@ def show_workflow_status():
     
     if error_message:
         st.error(f"Error: {error_message}")
+
+def show_workflow_status():
+    """Display current workflow status"""
+    if not st.session_state.workflow_id:
+        return
+        
+    workflow_id = st.session_state.workflow_id
+    
+    st.markdown('<div class="section-header">Analysis Status</div>', unsafe_allow_html=True)
+    
+    status_response = call_api(f"/api/status/{workflow_id}")
+    
+    if not status_response.get("success", True):
+        st.error(f"Failed to get status: {status_response.get('error', 'Unknown error')}")
+        return
+        
+    status_data = status_response.get("data", status_response)
+    status = status_data.get("status", "unknown")
+    
+    status_placeholder = st.empty()
+    with status_placeholder.container():
+        render_workflow_status(status_data)
         
     if status == "completed" and "result" in status_data:
         st.session_state.analysis_results = status_data["result"]
         show_analysis_results()
         
+    # Live updates for running workflows: the API pushes only the fields that change
     if status in ["pending", "running"]:
-        st.info("Refreshing status every 5 seconds...")
-        time.sleep(5)
+        try:
+            for event, delta in stream_workflow_events(workflow_id):
+                status_data.update(delta)
+                with status_placeholder.container():
+                    render_workflow_status(status_data)
+                if event == "deleted" or status_data.get("status") not in ["pending", "running"]:
+                    break
+        except (requests.exceptions.RequestException, ValueError):
+            # Backends without the status stream are polled instead
+            st.info("Refreshing status every 5 seconds...")
+            time.sleep(5)
         st.rerun()
 
 def show_analysis_results():